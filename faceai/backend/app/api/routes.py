@@ -1,27 +1,133 @@
-from fastapi import APIRouter, File, HTTPException, UploadFile, Form
+import asyncio
+import hmac
+import os
+import tempfile
+import time
+from typing import List, Union
 
-from app.models.schemas import AnalyzeResponse, HealthResponse
-from app.services.facemesh import analyze_images
+from fastapi import (
+    APIRouter,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.models.schemas import (
+    AnalyzeResponse,
+    CompactAnalyzeResponse,
+    HealthResponse,
+    LandmarksResponse,
+    ModelsResponse,
+    ModelVariantOut,
+    ParseResponse,
+    PreflightResponse,
+    ProfileResponse,
+    TimingsOut,
+    TrichionResponse,
+    VideoAnalyzeResponse,
+)
+from app.services.compact import COMPACT_MEDIA_TYPE
+from app.services.facemesh import OVERLAY_MODES, RESPONSE_FORMATS, NoFaceError, analyze_images
+from app.services.live import DEFAULT_BUDGET_MS, LatestFrame, LiveSession, claim_live_session, release_live_session
+from app.services.model_registry import REGISTRY, model_for_tier
+from app.services.planner import plan_analysis
+from app.services.preflight import PREFLIGHT_VIEWS, PreflightError
+from app.services.qos import POLICY, select_degradation
+from app.services.single_image import (
+    MASK_ENCODINGS,
+    ParsingUnavailableError,
+    landmarks_for_image,
+    parse_image,
+    preflight_image,
+    trichion_for_image,
+)
+from app.services.video import analyze_video
+from app.utils.cancellation import CancelToken, DeadlineExceeded, RequestCancelled, cancel_scope
+from app.utils.concurrency import run_analysis
+from app.utils.metrics import annotate, record_outcome, request_timings, stage
+from app.utils.profiler import capture_window
+from app.utils.serialization import dumps_model
 
 router = APIRouter()
 
+DISCONNECT_POLL_S = 0.1
+SPOOL_CHUNK = 1024 * 1024
+
 
 @router.get("/health", response_model=HealthResponse)
 def health() -> HealthResponse:
     return HealthResponse(ok=True)
 
 
-@router.post("/analyze", response_model=AnalyzeResponse)
+def _require_admin(token: str | None) -> None:
+    expected = get_settings().admin_token
+    if expected is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if token is None or not hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _id_list(value: str | None) -> List[str] | None:
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _timeout_ms(requested: int | None) -> int | None:
+    configured = get_settings().request_timeout_ms or None
+    if requested is None:
+        return configured
+    return min(requested, configured) if configured else requested
+
+
+async def _watch_disconnect(request: Request, token: CancelToken) -> None:
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_S)
+
+
+@router.post("/analyze", response_model=Union[AnalyzeResponse, CompactAnalyzeResponse])
 async def analyze(
+    request: Request,
     front_image: UploadFile = File(...),
-    side_image: UploadFile = File(...),
+    side_image: UploadFile | None = File(None),
     tr_x: float | None = Form(None),
     tr_y: float | None = Form(None),
     gender: str | None = Form(None),
-) -> AnalyzeResponse:
+    overlay_mode: str = Form("raster"),
+    include_timings: bool = Form(False),
+    measurements: str | None = Form(None),
+    ratios: str | None = Form(None),
+    artifacts: str | None = Form(None),
+    tier: str | None = Form(None),
+    response_format: str | None = Query(None, alias="format"),
+    accept: str | None = Header(None),
+    x_request_timeout_ms: int | None = Header(None),
+) -> Response:
     if front_image.content_type is None or not front_image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="front_image must be an image file")
-    if side_image.content_type is None or not side_image.content_type.startswith("image/"):
+    try:
+        plan = plan_analysis(_id_list(measurements), _id_list(ratios), _id_list(artifacts))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    try:
+        parsing_model = model_for_tier(tier)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if side_image is None and plan.side:
+        raise HTTPException(status_code=400, detail="side_image is required for the requested outputs")
+    if side_image is not None and (side_image.content_type is None or not side_image.content_type.startswith("image/")):
         raise HTTPException(status_code=400, detail="side_image must be an image file")
     if tr_x is not None and not (0.0 <= tr_x <= 1.0):
         raise HTTPException(status_code=400, detail="tr_x must be between 0 and 1")
@@ -31,11 +137,270 @@ async def analyze(
         allowed = {"male", "female", "nonbinary", "prefer_not_to_say"}
         if gender not in allowed:
             raise HTTPException(status_code=400, detail="gender must be a valid option")
+    if overlay_mode not in OVERLAY_MODES:
+        raise HTTPException(status_code=400, detail="overlay_mode must be one of: raster, svg, layer")
+    if response_format is None:
+        response_format = "compact" if accept and COMPACT_MEDIA_TYPE in accept else "full"
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be one of: full, compact")
+    if x_request_timeout_ms is not None and x_request_timeout_ms <= 0:
+        raise HTTPException(status_code=400, detail="X-Request-Timeout-Ms must be positive")
+
+    with request_timings() as timings, cancel_scope(_timeout_ms(x_request_timeout_ms)) as token:
+        with stage("upload_read"):
+            front_bytes = await front_image.read()
+            side_bytes = await side_image.read() if side_image is not None else b""
+        annotate("upload_bytes", len(front_bytes) + len(side_bytes))
+
+        watcher = asyncio.create_task(_watch_disconnect(request, token))
+        degradation = select_degradation()
+        started = time.perf_counter()
+        try:
+            result = await run_analysis(
+                analyze_images,
+                front_bytes,
+                side_bytes,
+                tr_x=tr_x,
+                tr_y=tr_y,
+                gender=gender,
+                overlay_mode=overlay_mode,
+                response_format=response_format,
+                degradation=degradation,
+                plan=plan,
+                parsing_model=parsing_model,
+            )
+        except RequestCancelled as exc:
+            record_outcome(exc.reason)
+            # 499 is nginx's "client closed request"; nobody reads it, but it keeps access logs honest.
+            raise HTTPException(status_code=504 if isinstance(exc, DeadlineExceeded) else 499, detail=str(exc)) from exc
+        except PreflightError as exc:
+            record_outcome("preflight")
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        except NoFaceError as exc:
+            record_outcome("no_face")
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        except ValueError as exc:
+            record_outcome("invalid")
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        except Exception:
+            record_outcome("error")
+            raise
+        finally:
+            watcher.cancel()
+            # Failed and abandoned analyses are often the slowest, so they count towards the load signal too.
+            POLICY.observe((time.perf_counter() - started) * 1000.0)
+
+        if include_timings:
+            result.timings = TimingsOut.model_construct(**timings.as_dict())
+        with stage("serialize"):
+            body = dumps_model(result)
+        return Response(
+            content=body,
+            media_type=COMPACT_MEDIA_TYPE if response_format == "compact" else "application/json",
+            headers={"Server-Timing": timings.server_timing(), "Timing-Allow-Origin": "*", "Vary": "Accept"},
+        )
+
 
-    front_bytes = await front_image.read()
-    side_bytes = await side_image.read()
+def _spool(source, target, limit: int) -> int:
+    # Returns the bytes copied; stops one chunk past the limit so an oversized upload is never fully written.
+    copied = 0
+    while copied <= limit:
+        chunk = source.read(SPOOL_CHUNK)
+        if not chunk:
+            break
+        target.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+@router.post("/analyze-video", response_model=VideoAnalyzeResponse)
+async def analyze_video_upload(
+    video: UploadFile = File(...),
+    stride: int = Form(1),
+) -> VideoAnalyzeResponse:
+    if video.content_type is None or not video.content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="video must be a video file")
+    if stride < 1:
+        raise HTTPException(status_code=400, detail="stride must be at least 1")
+
+    limit = get_settings().max_video_mb * 1024 * 1024
+    if video.size is not None and video.size > limit:
+        raise HTTPException(status_code=413, detail=f"video must be at most {get_settings().max_video_mb} MB")
+
+    suffix = os.path.splitext(video.filename or "")[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as handle:
+        path = handle.name
+        # Spooling a large upload is blocking file I/O; keep it off the event loop.
+        copied = await run_in_threadpool(_spool, video.file, handle, limit)
+    if copied > limit:
+        os.unlink(path)
+        raise HTTPException(status_code=413, detail=f"video must be at most {get_settings().max_video_mb} MB")
 
     try:
-        return analyze_images(front_bytes, side_bytes, tr_x=tr_x, tr_y=tr_y, gender=gender)
+        return await run_analysis(analyze_video, path, stride=stride)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
+    finally:
+        os.unlink(path)
+
+
+async def _single_image(upload: UploadFile, func, **kwargs) -> Response:
+    if upload.content_type is None or not upload.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="image must be an image file")
+
+    with request_timings() as timings:
+        with stage("upload_read"):
+            image_bytes = await upload.read()
+        annotate("upload_bytes", len(image_bytes))
+        try:
+            result = await run_analysis(func, image_bytes, **kwargs)
+        except ParsingUnavailableError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        with stage("serialize"):
+            body = dumps_model(result)
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"Server-Timing": timings.server_timing(), "Timing-Allow-Origin": "*"},
+        )
+
+
+@router.post("/landmarks", response_model=LandmarksResponse)
+async def landmarks(image: UploadFile = File(...)) -> Response:
+    return await _single_image(image, landmarks_for_image)
+
+
+@router.post("/parse", response_model=ParseResponse)
+async def parse(
+    image: UploadFile = File(...),
+    encoding: str = Form("rle"),
+    tier: str | None = Form(None),
+) -> Response:
+    if encoding not in MASK_ENCODINGS:
+        raise HTTPException(status_code=400, detail="encoding must be one of: rle, png")
+    try:
+        model = model_for_tier(tier)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return await _single_image(image, parse_image, encoding=encoding, model=model)
+
+
+@router.post("/trichion", response_model=TrichionResponse)
+async def trichion(image: UploadFile = File(...)) -> Response:
+    return await _single_image(image, trichion_for_image)
+
+
+@router.post("/preflight", response_model=PreflightResponse)
+async def preflight(image: UploadFile = File(...), view: str = Form("front")) -> Response:
+    if view not in PREFLIGHT_VIEWS:
+        raise HTTPException(status_code=400, detail="view must be one of: front, side")
+    return await _single_image(image, preflight_image, view=view)
+
+
+@router.websocket("/live")
+async def live_preview(websocket: WebSocket, budget_ms: float = DEFAULT_BUDGET_MS) -> None:
+    await websocket.accept()
+    # Each session holds its own FaceMesh, so their number is capped per worker.
+    if not claim_live_session(get_settings().max_live_sessions):
+        await websocket.close(code=1013, reason="Too many live sessions")
+        return
+    try:
+        session = LiveSession(budget_ms=budget_ms)
+    except Exception:
+        release_live_session()
+        raise
+    latest = LatestFrame()
+    frame_ready = asyncio.Event()
+    inflight: list = []
+
+    async def receive() -> None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            data = message.get("bytes")
+            if data is None:
+                await websocket.close(code=1003, reason="Frames must be binary images")
+                return
+            if latest.put(data):
+                session.dropped += 1
+            frame_ready.set()
+
+    async def respond() -> None:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            data = latest.take()
+            if data is None:
+                continue
+            # Frames share the bounded analysis executor (and its thread budget) with HTTP analyses. Shielded so that
+            # a disconnect never closes the mesh under a running frame.
+            job = asyncio.ensure_future(run_analysis(session.process, data))
+            inflight[:] = [job]
+            result = await asyncio.shield(job)
+            await websocket.send_json(result)
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(respond())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            exc = task.exception()
+            if exc is not None and not isinstance(exc, WebSocketDisconnect):
+                raise exc
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *inflight, return_exceptions=True)
+        session.close()
+        release_live_session()
+
+
+@router.post("/admin/profile", response_model=ProfileResponse)
+async def profile_window(
+    seconds: float = 10.0,
+    x_admin_token: str | None = Header(None),
+) -> ProfileResponse:
+    _require_admin(x_admin_token)
+    if not (0.0 < seconds <= 120.0):
+        raise HTTPException(status_code=400, detail="seconds must be between 0 and 120")
+
+    path = await run_in_threadpool(capture_window, seconds)
+    return ProfileResponse(ok=path is not None, path=str(path) if path else None, seconds=seconds)
+
+
+@router.get("/admin/models", response_model=ModelsResponse)
+def list_models(x_admin_token: str | None = Header(None)) -> ModelsResponse:
+    _require_admin(x_admin_token)
+    settings = get_settings()
+    models = []
+    resident_bytes = 0
+    for variant, entry, resident in REGISTRY.snapshot():
+        if resident:
+            resident_bytes += entry.nbytes
+        models.append(
+            ModelVariantOut(
+                name=variant.name,
+                backbone=variant.backbone,
+                engine=variant.engine,
+                precision=variant.precision,
+                input_size=variant.input_size,
+                fused=variant.fused,
+                sha256=entry.sha256 if entry else variant.sha256,
+                resident=resident,
+                bytes=entry.nbytes if entry else None,
+                load_ms=entry.load_ms if entry else None,
+                cold_ms=entry.cold_ms if entry else None,
+                warm_ms=entry.warm_ms if entry else None,
+                calls=entry.calls if entry else 0,
+            )
+        )
+    return ModelsResponse(
+        ok=True,
+        default=settings.parsing_model,
+        tiers=settings.model_tiers,
+        memory_limit_mb=settings.model_memory_mb,
+        resident_bytes=resident_bytes,
+        models=models,
+    )
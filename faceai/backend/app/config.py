@@ -0,0 +1,153 @@
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+PREFLIGHT_MODES = ("off", "warn", "reject")
+
+
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def _env_choice(name: str, default: str, choices: Tuple[str, ...]) -> str:
+    value = (os.environ.get(name) or default).strip().lower()
+    if value not in choices:
+        raise ValueError(f"{name} must be one of: {', '.join(choices)} (got {value!r})")
+    return value
+
+
+def _env_ints(name: str, default: Tuple[int, ...]) -> Tuple[int, ...]:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return tuple(int(item) for item in value.split(",") if item.strip())
+
+
+def _env_map(name: str, default: Dict[str, str]) -> Dict[str, str]:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return dict(default)
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {key.strip(): item.strip() for key, item in pairs}
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Total cores this container may use, shared by all uvicorn workers.
+    cpu_budget: int
+    workers: int
+    # Concurrent analyses per worker; each gets an equal slice of the worker's cores.
+    max_concurrency: int
+    # Threads shared by all analyses for running independent stages of one request side by side (<=1 runs them inline).
+    stage_threads: Optional[int]
+    pin_cpus: bool
+    torch_threads: Optional[int]
+    torch_interop_threads: Optional[int]
+    cv2_threads: Optional[int]
+    ort_threads: Optional[int]
+    # Sampling profiler: every Nth analysis and/or any analysis slower than profile_slow_ms (0 disables either).
+    profile_every_n: int
+    profile_slow_ms: int
+    profile_interval_ms: int
+    profile_dir: str
+    profile_keep: int
+    admin_token: Optional[str]
+    # Default analysis deadline in ms (0 disables); clients may ask for a shorter one with X-Request-Timeout-Ms.
+    request_timeout_ms: int
+    # Load shedding: the Nth entry is the queue depth / smoothed latency at which degradation level N+1 starts.
+    qos_max_level: int
+    qos_queue_steps: Tuple[int, ...]
+    qos_latency_steps_ms: Tuple[int, ...]
+    qos_parsing_size: int
+    qos_parsing_model: str
+    # Segmentation model registry: deployment default, per-request tiers and the memory cap for loaded models (0 = none).
+    parsing_model: str
+    model_tiers: Dict[str, str]
+    model_checksums: Dict[str, str]
+    model_memory_mb: int
+    # Unix socket of the shared parsing server (None runs segmentation in-process) and its batching limits.
+    parsing_socket: Optional[str]
+    parsing_batch_size: int
+    parsing_batch_wait_ms: int
+    # Load every configured model at startup (in the gunicorn master before fork when preloading the app).
+    preload_models: bool
+    # Run without torch: no in-process segmentation, so Tr comes from the parsing server, manual input or geometry.
+    lite: bool
+    # Cheap front-image quality gate: "off", "warn" (failed checks become warnings) or "reject" (422 before parsing).
+    preflight: str
+    # Largest accepted /api/analyze-video upload.
+    max_video_mb: int
+    # Concurrent /api/live connections per worker; each holds its own FaceMesh.
+    max_live_sessions: int
+    # Experimental tiered Tr (off by default): a cheap midline-strip estimate is used when its confidence reaches this;
+    # segmentation runs otherwise.
+    trichion_strip: bool
+    trichion_confidence: float
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings(
+        cpu_budget=_env_int("FACEAI_CPU_BUDGET", available_cpus()),
+        workers=max(1, _env_int("FACEAI_WORKERS", 1)),
+        max_concurrency=max(1, _env_int("FACEAI_MAX_CONCURRENCY", 2)),
+        stage_threads=_env_int("FACEAI_STAGE_THREADS"),
+        pin_cpus=_env_bool("FACEAI_PIN_CPUS"),
+        torch_threads=_env_int("FACEAI_TORCH_THREADS"),
+        torch_interop_threads=_env_int("FACEAI_TORCH_INTEROP_THREADS"),
+        cv2_threads=_env_int("FACEAI_CV2_THREADS"),
+        ort_threads=_env_int("FACEAI_ORT_THREADS"),
+        profile_every_n=_env_int("FACEAI_PROFILE_EVERY_N", 0),
+        profile_slow_ms=_env_int("FACEAI_PROFILE_SLOW_MS", 0),
+        profile_interval_ms=max(1, _env_int("FACEAI_PROFILE_INTERVAL_MS", 10)),
+        profile_dir=os.environ.get("FACEAI_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "faceai-profiles"),
+        profile_keep=max(1, _env_int("FACEAI_PROFILE_KEEP", 20)),
+        admin_token=os.environ.get("FACEAI_ADMIN_TOKEN") or None,
+        request_timeout_ms=max(0, _env_int("FACEAI_REQUEST_TIMEOUT_MS", 60000)),
+        qos_max_level=max(0, _env_int("FACEAI_QOS_MAX_LEVEL", 5)),
+        qos_queue_steps=_env_ints("FACEAI_QOS_QUEUE_STEPS", (4, 6, 8, 10, 12)),
+        qos_latency_steps_ms=_env_ints("FACEAI_QOS_LATENCY_STEPS_MS", (4000, 6000, 8000, 10000, 15000)),
+        qos_parsing_size=_env_int("FACEAI_QOS_PARSING_SIZE", 384),
+        qos_parsing_model=os.environ.get("FACEAI_QOS_PARSING_MODEL") or "bisenet_resnet18",
+        parsing_model=os.environ.get("FACEAI_PARSING_MODEL") or "bisenet_resnet34",
+        model_tiers=_env_map(
+            "FACEAI_MODEL_TIERS", {"interactive": "bisenet_resnet18", "batch": "bisenet_resnet34"}
+        ),
+        model_checksums=_env_map("FACEAI_MODEL_SHA256", {}),
+        model_memory_mb=max(0, _env_int("FACEAI_MODEL_MEMORY_MB", 512)),
+        parsing_socket=os.environ.get("FACEAI_PARSING_SOCKET") or None,
+        parsing_batch_size=max(1, _env_int("FACEAI_PARSING_BATCH_SIZE", 4)),
+        parsing_batch_wait_ms=max(0, _env_int("FACEAI_PARSING_BATCH_WAIT_MS", 5)),
+        preload_models=_env_bool("FACEAI_PRELOAD_MODELS"),
+        lite=_env_bool("FACEAI_LITE"),
+        preflight=_env_choice("FACEAI_PREFLIGHT", "warn", PREFLIGHT_MODES),
+        max_video_mb=max(1, _env_int("FACEAI_MAX_VIDEO_MB", 200)),
+        max_live_sessions=max(1, _env_int("FACEAI_MAX_LIVE_SESSIONS", 4)),
+        trichion_strip=_env_bool("FACEAI_TRICHION_STRIP"),
+        trichion_confidence=_env_float("FACEAI_TRICHION_CONFIDENCE", 0.6),
+    )
@@ -1,9 +1,34 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router
+from app.config import get_settings
+from app.services.model_registry import validate_settings
+from app.utils.concurrency import configure_threads
+from app.utils.memory import describe_memory, record_memory
+from app.utils.metrics import render_metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    validate_settings()
+    plan = configure_threads()
+    logger.info("FaceAI thread plan: %s", plan.describe())
+    if get_settings().preload_models:
+        from app.services.hairline import preload_models
 
-app = FastAPI(title="FaceAI API", version="0.1.0")
+        # A no-op under gunicorn --preload: the master already loaded them before forking this worker.
+        logger.info("FaceAI preloaded models: %s", ", ".join(preload_models()) or "none")
+    logger.info("FaceAI worker memory: %s", describe_memory(record_memory(force=True)))
+    yield
+
+
+app = FastAPI(title="FaceAI API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,6 +36,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 app.include_router(router, prefix="/api")
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    record_memory(force=True)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 from pydantic import BaseModel
 
@@ -7,6 +7,37 @@ class HealthResponse(BaseModel):
     ok: bool
 
 
+class ProfileResponse(BaseModel):
+    ok: bool
+    path: Optional[str]
+    seconds: float
+
+
+class ModelVariantOut(BaseModel):
+    name: str
+    backbone: str
+    engine: str
+    precision: str
+    input_size: int
+    fused: bool
+    sha256: Optional[str]
+    resident: bool
+    bytes: Optional[int]
+    load_ms: Optional[float]
+    cold_ms: Optional[float]
+    warm_ms: Optional[float]
+    calls: int
+
+
+class ModelsResponse(BaseModel):
+    ok: bool
+    default: str
+    tiers: Dict[str, str]
+    memory_limit_mb: int
+    resident_bytes: int
+    models: List[ModelVariantOut]
+
+
 class Point2D(BaseModel):
     x: float
     y: float
@@ -43,6 +74,12 @@ class RatioOut(BaseModel):
     note: Optional[str]
 
 
+class TimingsOut(BaseModel):
+    total_ms: float
+    stages_ms: Dict[str, float]
+    info: Dict[str, Union[str, int]]
+
+
 class AnalyzeResponse(BaseModel):
     ok: bool
     all_landmarks_count: int
@@ -52,3 +89,122 @@ class AnalyzeResponse(BaseModel):
     ratios: List[RatioOut]
     annotated_images: Dict[str, str]
     warnings: List[str]
+    timings: Optional[TimingsOut] = None
+
+
+class LandmarkTableOut(BaseModel):
+    # Parallel arrays, one entry per label; missing landmarks are null in every column but label.
+    label: List[str]
+    index: List[Optional[int]]
+    x: List[Optional[float]]
+    y: List[Optional[float]]
+    nx: List[Optional[float]]
+    ny: List[Optional[float]]
+    nz: List[Optional[float]]
+
+
+class MeshOut(BaseModel):
+    # base64 of count x 3 little-endian float32 (normalized x, y, z per landmark).
+    count: int
+    width: int
+    height: int
+    dtype: str
+    data: str
+
+
+class TableOut(BaseModel):
+    columns: List[str]
+    rows: List[List[Union[str, float, None]]]
+
+
+class CompactAnalyzeResponse(BaseModel):
+    ok: bool
+    format: str
+    all_landmarks_count: int
+    gender: Optional[str]
+    landmarks: LandmarkTableOut
+    meshes: Dict[str, Optional[MeshOut]]
+    measurements: TableOut
+    ratios: TableOut
+    warnings: List[str]
+    timings: Optional[TimingsOut] = None
+
+
+class LandmarksResponse(BaseModel):
+    ok: bool
+    width: int
+    height: int
+    faces: int
+    landmarks: LandmarkTableOut
+    mesh: MeshOut
+    warnings: List[str]
+
+
+class RleMaskOut(BaseModel):
+    # Row-major runs over the height x width class-id mask.
+    values: List[int]
+    counts: List[int]
+
+
+class ParseResponse(BaseModel):
+    ok: bool
+    width: int
+    height: int
+    encoding: str
+    classes: List[str]
+    rle: Optional[RleMaskOut]
+    png: Optional[str]
+
+
+class TrichionResponse(BaseModel):
+    ok: bool
+    width: int
+    height: int
+    method: str
+    point: Optional[LandmarkOut]
+    warnings: List[str]
+
+
+class PreflightCheckOut(BaseModel):
+    name: str
+    passed: bool
+    value: Optional[float]
+
+
+class PreflightResponse(BaseModel):
+    ok: bool
+    passed: bool
+    view: str
+    width: int
+    height: int
+    checks: List[PreflightCheckOut]
+    yaw: Optional[float]
+    pitch: Optional[float]
+    roll: Optional[float]
+    warnings: List[str]
+
+
+class FrameQualityOut(BaseModel):
+    index: int
+    timestamp_ms: float
+    face: bool
+    sharpness: float
+    face_size: float
+    yaw: Optional[float]
+    pitch: Optional[float]
+    roll: Optional[float]
+    quality: float
+
+
+class VideoAnalyzeResponse(BaseModel):
+    ok: bool
+    frames_read: int
+    frames_with_face: int
+    best_front_frame: Optional[FrameQualityOut]
+    best_side_frame: Optional[FrameQualityOut]
+    frames: List[FrameQualityOut]
+    mandatory_landmarks: List[LandmarkOut]
+    landmark_spread: Dict[str, float]
+    measurements: List[MeasurementOut]
+    ratios: List[RatioOut]
+    warnings: List[str]
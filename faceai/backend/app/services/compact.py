@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import base64
+from typing import List, Optional
+
+import numpy as np
+
+from app.models.schemas import LandmarkOut, LandmarkTableOut, MeasurementOut, MeshOut, RatioOut, RleMaskOut, TableOut
+
+COMPACT_MEDIA_TYPE = "application/vnd.faceai.compact+json"
+MESH_DTYPE = "<f4"
+MEASUREMENT_COLUMNS = ["id", "label", "image", "point_a", "point_b", "value", "unit", "note"]
+RATIO_COLUMNS = ["id", "numerator", "denominator", "value", "note"]
+
+
+def landmark_table(landmarks: List[LandmarkOut]) -> LandmarkTableOut:
+    columns = {name: [] for name in ("label", "index", "x", "y", "nx", "ny", "nz")}
+    for landmark in landmarks:
+        pixel = landmark.pixel
+        normalized = landmark.normalized
+        columns["label"].append(landmark.label)
+        columns["index"].append(landmark.index)
+        columns["x"].append(pixel.x if pixel else None)
+        columns["y"].append(pixel.y if pixel else None)
+        columns["nx"].append(normalized.x if normalized else None)
+        columns["ny"].append(normalized.y if normalized else None)
+        columns["nz"].append(normalized.z if normalized else None)
+    return LandmarkTableOut.model_construct(**columns)
+
+
+def mesh_out(coords: Optional[np.ndarray], width: int, height: int) -> Optional[MeshOut]:
+    if coords is None:
+        return None
+    packed = np.ascontiguousarray(coords, dtype=MESH_DTYPE)
+    return MeshOut.model_construct(
+        count=int(packed.shape[0]),
+        width=width,
+        height=height,
+        dtype=MESH_DTYPE,
+        data=base64.b64encode(packed).decode("ascii"),
+    )
+
+
+def measurement_table(measurements: List[MeasurementOut]) -> TableOut:
+    rows = [[m.id, m.label, m.image, m.points[0], m.points[1], m.value, m.unit, m.note] for m in measurements]
+    return TableOut.model_construct(columns=MEASUREMENT_COLUMNS, rows=rows)
+
+
+def ratio_table(ratios: List[RatioOut]) -> TableOut:
+    rows = [[r.id, r.numerator, r.denominator, r.value, r.note] for r in ratios]
+    return TableOut.model_construct(columns=RATIO_COLUMNS, rows=rows)
+
+
+def rle_encode(mask: np.ndarray) -> RleMaskOut:
+    flat = mask.ravel()
+    if flat.size == 0:
+        return RleMaskOut.model_construct(values=[], counts=[])
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    counts = np.diff(np.append(starts, flat.size))
+    return RleMaskOut.model_construct(values=flat[starts].tolist(), counts=counts.tolist())
@@ -1,18 +1,49 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 import cv2
-import mediapipe as mp
 import numpy as np
 
-from app.models.schemas import AnalyzeResponse, LandmarkOut, MeasurementOut, RatioOut
-from app.services.hairline import estimate_trichion
+from app.config import get_settings
+from app.models.schemas import (
+    AnalyzeResponse,
+    CompactAnalyzeResponse,
+    LandmarkOut,
+    MeasurementOut,
+    MeshOut,
+    Point2D,
+    Point3D,
+    RatioOut,
+)
+from app.services.compact import landmark_table, measurement_table, mesh_out, ratio_table
+from app.services.hairline import (
+    FALLBACK_WARNINGS,
+    _predict_mask,
+    estimate_trichion,
+    midline_x,
+    parsing_legend_png,
+    trichion_tier,
+)
+from app.services.hairline_strip import NO_ESTIMATE, StripEstimate, draw_strip_estimate, strip_trichion
 from app.services.measurements import compute_measurements, compute_ratios
-from app.services.overlay import draw_landmarks, draw_all_landmarks
-from app.utils.image_io import read_image, to_base64_png
+from app.services.overlay import draw_all_landmarks, draw_landmarks, draw_midline, overlay_layer, render_svg
+from app.services.pipeline import StageGraph
+from app.services.planner import FULL_PLAN, TRICHION_LABELS, AnalysisPlan
+from app.services.preflight import PreflightError, PreflightReport, assess
+from app.services.qos import FULL_QUALITY, Degradation
+from app.utils.concurrency import stage_executor
+from app.utils.image_io import read_image, to_base64_png, to_base64_svg
 from app.utils.landmarks_map import load_landmark_map
+from app.utils.metrics import PREFLIGHT_FAILURES, TRICHION_TIER, annotate, cached_call, record_outcome, stage
+
+OVERLAY_MODES = ("raster", "svg", "layer")
+RESPONSE_FORMATS = ("full", "compact")
+
+
+class NoFaceError(ValueError):
+    pass
 
 
 @dataclass
@@ -50,20 +81,30 @@ def _select_best_face(landmark_lists: List, image_w: int, image_h: int) -> Optio
     return best
 
 
-def _extract_landmarks(image_bgr: np.ndarray) -> Tuple[List, int]:
-    rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+def _create_face_mesh(static_image_mode: bool = True, max_num_faces: int = 5):
+    # Imported here rather than at module load: it adds ~1 s to startup and only meshing needs it.
+    import mediapipe as mp
+
     if not hasattr(mp, "solutions"):
         raise RuntimeError(
             "MediaPipe 'solutions' module not available. "
             "Pin mediapipe to a version that includes solutions (e.g. 0.10.11) "
             "and reinstall backend dependencies."
         )
-    with mp.solutions.face_mesh.FaceMesh(
-        static_image_mode=True,
-        max_num_faces=5,
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=static_image_mode,
+        max_num_faces=max_num_faces,
         refine_landmarks=False,
         min_detection_confidence=0.5,
-    ) as face_mesh:
+    )
+
+
+def _extract_landmarks(image_bgr: np.ndarray, face_mesh=None) -> Tuple[List, int]:
+    rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+    if face_mesh is None:
+        with _create_face_mesh() as face_mesh:
+            results = face_mesh.process(rgb)
+    else:
         results = face_mesh.process(rgb)
 
     if not results.multi_face_landmarks:
@@ -72,6 +113,10 @@ def _extract_landmarks(image_bgr: np.ndarray) -> Tuple[List, int]:
     return results.multi_face_landmarks, len(results.multi_face_landmarks[0].landmark)
 
 
+def _landmarks_array(landmarks: List) -> np.ndarray:
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float32).reshape(-1, 3)
+
+
 def _points_from_map(landmarks: List, mapping: Dict[str, Optional[int]], width: int, height: int) -> Dict[str, Dict]:
     points: Dict[str, Dict] = {}
     for label, index in mapping.items():
@@ -125,108 +170,414 @@ def _tr_from_normalized(tr_x: float, tr_y: float, width: int, height: int) -> Di
     }
 
 
-def analyze_images(
-    front_bytes: bytes,
-    side_bytes: bytes,
-    tr_x: float | None = None,
-    tr_y: float | None = None,
-    gender: str | None = None,
-) -> AnalyzeResponse:
-    front_image, front_w, front_h = read_image(front_bytes)
-    side_image, side_w, side_h = read_image(side_bytes)
-
-    front_faces, front_count = _extract_landmarks(front_image)
-    side_faces, side_count = _extract_landmarks(side_image)
-
-    if not front_faces:
-        raise ValueError("No face detected in front image")
-    side_missing = False
-    if not side_faces:
-        side_missing = True
-
-    front_selection = _select_best_face(front_faces, front_w, front_h)
-    side_selection = _select_best_face(side_faces, side_w, side_h) if not side_missing else None
-
-    if front_selection is None:
-        raise ValueError("No face detected in front image")
-    if side_selection is None and not side_missing:
-        raise ValueError("No face detected in side image")
-
-    mapping = load_landmark_map()
-
-    front_points = _points_from_map(front_selection.landmarks, mapping, front_w, front_h)
-    side_points = (
-        _points_from_map(side_selection.landmarks, mapping, side_w, side_h)
-        if side_selection is not None
-        else {}
-    )
-    tr_method = "none"
-    trichion = None
-    tr_debug = {}
-    if tr_x is not None and tr_y is not None:
-        trichion = _tr_from_normalized(tr_x, tr_y, front_w, front_h)
-        tr_method = "manual"
-    else:
-        trichion, tr_debug, tr_method = estimate_trichion(
-            front_image, front_points, landmarks=front_selection.landmarks, debug=True
-        )
-    trichion_available = trichion is not None
-    if trichion:
-        front_points["Tr_R"] = trichion
-        front_points["Tr_L"] = trichion
-
+def _mandatory_landmarks(
+    mapping: Dict[str, Optional[int]], front_points: Dict[str, Dict], side_points: Dict[str, Dict]
+) -> List[LandmarkOut]:
     mandatory_landmarks: List[LandmarkOut] = []
     for label, index in mapping.items():
         entry = front_points.get(label) or side_points.get(label)
         if entry:
             mandatory_landmarks.append(
-                LandmarkOut(
+                LandmarkOut.model_construct(
                     label=label,
                     index=entry["index"],
-                    pixel=entry["pixel"],
-                    normalized=entry["normalized"],
+                    pixel=Point2D.model_construct(**entry["pixel"]),
+                    normalized=Point3D.model_construct(**entry["normalized"]),
                 )
             )
         else:
-            mandatory_landmarks.append(LandmarkOut(label=label, index=index, pixel=None, normalized=None))
+            mandatory_landmarks.append(LandmarkOut.model_construct(label=label, index=index, pixel=None, normalized=None))
+
+    return mandatory_landmarks
+
+
+def _render_points(
+    overlay_mode: str, image: np.ndarray, points: Dict[str, Dict], midline_x: Optional[float], artifact: str
+) -> str:
+    height, width = image.shape[:2]
+    # Timed per artifact: front and side render concurrently and would otherwise share one stage.
+    with stage(f"render_landmarks_{artifact}"):
+        if overlay_mode == "svg":
+            svg = render_svg(width, height, points=points, midline_x=midline_x)
+        elif overlay_mode == "layer":
+            annotated = draw_landmarks(overlay_layer(width, height), points)
+            if midline_x is not None:
+                draw_midline(annotated, int(midline_x))
+        else:
+            annotated = draw_landmarks(image.copy(), points) if points else image.copy()
+    if overlay_mode == "svg":
+        return to_base64_svg(svg, artifact)
+    return to_base64_png(annotated, artifact)
+
+
+def _render_mesh(overlay_mode: str, image: np.ndarray, landmarks: Optional[List], artifact: str) -> str:
+    height, width = image.shape[:2]
+    with stage(f"render_landmarks_{artifact}"):
+        if overlay_mode == "svg":
+            svg = render_svg(width, height, landmarks=landmarks)
+        elif overlay_mode == "layer":
+            annotated = draw_all_landmarks(overlay_layer(width, height), landmarks or [])
+        else:
+            annotated = draw_all_landmarks(image.copy(), landmarks) if landmarks is not None else image.copy()
+    if overlay_mode == "svg":
+        return to_base64_svg(svg, artifact)
+    return to_base64_png(annotated, artifact)
 
-    measurements: List[MeasurementOut] = compute_measurements(front_points, side_points)
-    ratios: List[RatioOut] = compute_ratios(measurements)
 
-    annotated_front = draw_landmarks(front_image.copy(), front_points)
-    annotated_side = draw_landmarks(side_image.copy(), side_points) if side_points else side_image.copy()
-    annotated_front_all = draw_all_landmarks(front_image.copy(), front_selection.landmarks)
-    annotated_side_all = (
-        draw_all_landmarks(side_image.copy(), side_selection.landmarks) if side_selection is not None else side_image.copy()
+@dataclass
+class DecodedImage:
+    image: np.ndarray
+    width: int
+    height: int
+
+
+@dataclass
+class ViewPoints:
+    faces: List
+    landmarks_count: int
+    selection: Optional[FaceSelection]
+    points: Dict[str, Dict]
+
+
+@dataclass
+class TrichionResult:
+    point: Optional[Dict]
+    debug: Dict[str, np.ndarray]
+    method: str
+
+
+@dataclass
+class ParsingResult:
+    # mask is None when segmentation was skipped or failed; failed tells the two apart for the Tr warning.
+    mask: Optional[np.ndarray]
+    failed: bool = False
+
+
+NO_PARSING = ParsingResult(None)
+TR_DEBUG_KEYS = ("tr_hair_mask", "tr_overlay", "tr_parsing")
+
+
+def _decode(data: bytes) -> DecodedImage:
+    return DecodedImage(*read_image(data))
+
+
+def _locate_face(view: str, decoded: DecodedImage) -> ViewPoints:
+    with stage(f"facemesh_{view}"):
+        faces, count = _extract_landmarks(decoded.image)
+    selection = _select_best_face(faces, decoded.width, decoded.height)
+    if selection is None:
+        if view == "front":
+            raise NoFaceError("No face detected in front image")
+        return ViewPoints(faces, count, None, {})
+    points = _points_from_map(selection.landmarks, load_landmark_map(), decoded.width, decoded.height)
+    return ViewPoints(faces, count, selection, points)
+
+
+def _predict_parsing(decoded: DecodedImage, degradation: Degradation, model: Optional[str] = None) -> ParsingResult:
+    if degradation.measurements_only:
+        return NO_PARSING
+    try:
+        return ParsingResult(_predict_mask(decoded.image, degradation.parsing_size, degradation.parsing_model or model))
+    except Exception:
+        return ParsingResult(None, failed=True)
+
+
+def _strip_estimate(decoded: DecodedImage, front: ViewPoints) -> StripEstimate:
+    if front.selection is None:
+        return NO_ESTIMATE
+    with stage("trichion_strip"):
+        estimate = strip_trichion(decoded.image, front.selection.landmarks, midline_x(front.points, decoded.width))
+    annotate("strip_confidence", f"{estimate.confidence:.2f}")
+    return estimate
+
+
+def _strip_confident(strip: StripEstimate) -> bool:
+    return strip.point is not None and strip.confidence >= get_settings().trichion_confidence
+
+
+def _tiered_parsing(
+    decoded: DecodedImage, strip: StripEstimate, degradation: Degradation, model: Optional[str] = None
+) -> ParsingResult:
+    # Segmentation is the second tier: skipped whenever the strip estimate is already confident.
+    if _strip_confident(strip):
+        return NO_PARSING
+    return _predict_parsing(decoded, degradation, model)
+
+
+def _tiered_trichion(
+    decoded: DecodedImage, front: ViewPoints, parsing: ParsingResult, strip: StripEstimate, debug: bool = False
+) -> TrichionResult:
+    if _strip_confident(strip):
+        TRICHION_TIER.labels("strip").inc()
+        debug_images = {"tr_overlay": draw_strip_estimate(decoded.image, strip)} if debug else {}
+        return TrichionResult(strip.point, debug_images, "strip")
+    point, debug_images, method = estimate_trichion(
+        decoded.image,
+        front.points,
+        landmarks=front.selection.landmarks,
+        debug=debug,
+        parsing=parsing.mask,
+        use_model=False,
+        parsing_failed=parsing.failed,
     )
+    TRICHION_TIER.labels(trichion_tier(method)).inc()
+    return TrichionResult(point, debug_images, method)
+
+
+def _preflight(decoded: DecodedImage, front: ViewPoints, mode: str) -> PreflightReport:
+    with stage("preflight"):
+        report = assess(decoded.image, _landmarks_array(front.selection.landmarks), "front")
+    for check in report.failures():
+        PREFLIGHT_FAILURES.labels(check.name).inc()
+    annotate("preflight_result", "pass" if report.passed else "fail")
+    if mode == "reject" and not report.passed:
+        raise PreflightError(" ".join(report.warnings()))
+    return report
+
+
+def _with_trichion(points: Dict[str, Dict], trichion: TrichionResult) -> Dict[str, Dict]:
+    if not trichion.point:
+        return points
+    return {**points, **{label: trichion.point for label in TRICHION_LABELS}}
+
+
+def _measure(front: ViewPoints, side: ViewPoints, trichion: TrichionResult, plan: AnalysisPlan) -> Tuple:
+    front_points = _with_trichion(front.points, trichion)
+    mandatory_landmarks = _mandatory_landmarks(load_landmark_map(), front_points, side.points)
+    with stage("measurements"):
+        measurements: List[MeasurementOut] = compute_measurements(front_points, side.points, only=plan.measurement_ids)
+        ratios: List[RatioOut] = compute_ratios(measurements, only=plan.ratio_ids)
+    return mandatory_landmarks, measurements, ratios
+
+
+SKIPPED_VIEW = ViewPoints([], 0, None, {})
+SKIPPED_TRICHION = TrichionResult(None, {}, "skipped")
+
+
+def _build_graph(
+    front_bytes: bytes,
+    side_bytes: bytes,
+    tr_x: float | None,
+    tr_y: float | None,
+    overlay_mode: str,
+    render: bool = True,
+    degradation: Degradation = FULL_QUALITY,
+    plan: AnalysisPlan = FULL_PLAN,
+    preflight: str = "off",
+    parsing_model: Optional[str] = None,
+) -> StageGraph:
+    # Front and side only meet at measurements. Parsing needs just the decoded front image, so it
+    # overlaps both meshes, and every artifact renders and encodes independently. Views, Tr and
+    # artifacts the plan does not ask for get no stages at all. In warn mode preflight runs alongside
+    # the side mesh; in reject mode the side image and parsing wait for the front to pass its checks.
+    manual_tr = tr_x is not None and tr_y is not None
+    render = render and not degradation.measurements_only
+    artifacts = plan.artifacts if render else frozenset()
+    debug = "tr_debug" in artifacts and overlay_mode == "raster" and not degradation.skip_debug_images
+    gate: Tuple[str, ...] = ()
+    graph = StageGraph()
+    if plan.front:
+        graph.add("decode_front", lambda: _decode(front_bytes))
+        graph.add("front", lambda decoded: _locate_face("front", decoded), "decode_front")
+        if preflight != "off":
+            graph.add("preflight", lambda decoded, front: _preflight(decoded, front, preflight), "decode_front", "front")
+            if preflight == "reject":
+                gate = ("preflight",)
+    else:
+        graph.add("front", lambda: SKIPPED_VIEW)
+    if plan.side:
+        graph.add("decode_side", lambda *_: _decode(side_bytes), *gate)
+        graph.add("side", lambda decoded: _locate_face("side", decoded), "decode_side")
+    else:
+        graph.add("side", lambda: SKIPPED_VIEW)
+
+    if manual_tr and plan.front:
+        graph.add(
+            "trichion",
+            lambda decoded: TrichionResult(_tr_from_normalized(tr_x, tr_y, decoded.width, decoded.height), {}, "manual"),
+            "decode_front",
+        )
+    elif plan.trichion:
+        if get_settings().trichion_strip:
+            # Parsing now waits for the mesh, but only runs when the cheap strip estimate is not confident.
+            graph.add("strip", _strip_estimate, "decode_front", "front")
+            graph.add(
+                "parsing",
+                lambda decoded, strip, *_: _tiered_parsing(decoded, strip, degradation, parsing_model),
+                "decode_front",
+                "strip",
+                *gate,
+            )
+        else:
+            graph.add("strip", lambda: NO_ESTIMATE)
+            graph.add(
+                "parsing",
+                lambda decoded, *_: _predict_parsing(decoded, degradation, parsing_model),
+                "decode_front",
+                *gate,
+            )
+        graph.add(
+            "trichion",
+            lambda decoded, front, parsing, strip: _tiered_trichion(decoded, front, parsing, strip, debug),
+            "decode_front",
+            "front",
+            "parsing",
+            "strip",
+        )
+    else:
+        graph.add("trichion", lambda: SKIPPED_TRICHION)
+
+    graph.add("measurements", lambda front, side, trichion: _measure(front, side, trichion, plan), "front", "side", "trichion")
+
+    def render_front(decoded: DecodedImage, front: ViewPoints, trichion: TrichionResult) -> str:
+        midline_x = trichion.point["pixel"]["x"] if trichion.point and trichion.method != "manual" else None
+        return _render_points(overlay_mode, decoded.image, _with_trichion(front.points, trichion), midline_x, "front")
+
+    if "front" in artifacts:
+        graph.add("render_front", render_front, "decode_front", "front", "trichion")
+    if "side" in artifacts:
+        graph.add(
+            "render_side",
+            lambda decoded, side: _render_points(overlay_mode, decoded.image, side.points, None, "side"),
+            "decode_side",
+            "side",
+        )
+    if "front_all" in artifacts and not degradation.skip_mesh_renders:
+        graph.add(
+            "render_front_all",
+            lambda decoded, front: _render_mesh(overlay_mode, decoded.image, front.selection.landmarks, "front_all"),
+            "decode_front",
+            "front",
+        )
+    if "side_all" in artifacts and not degradation.skip_mesh_renders:
+        graph.add(
+            "render_side_all",
+            lambda decoded, side: _render_mesh(
+                overlay_mode, decoded.image, side.selection.landmarks if side.selection else None, "side_all"
+            ),
+            "decode_side",
+            "side",
+        )
+    if debug:
+        for key in TR_DEBUG_KEYS:
+            graph.add(
+                f"render_{key}",
+                lambda trichion, key=key: to_base64_png(trichion.debug[key], key) if key in trichion.debug else None,
+                "trichion",
+            )
+    return graph
+
+
+def _view_mesh(view: ViewPoints, decoded: Optional[DecodedImage]) -> Optional[MeshOut]:
+    if view.selection is None or decoded is None:
+        return None
+    return mesh_out(_landmarks_array(view.selection.landmarks), decoded.width, decoded.height)
+
+
+def analyze_images(
+    front_bytes: bytes,
+    side_bytes: bytes,
+    tr_x: float | None = None,
+    tr_y: float | None = None,
+    gender: str | None = None,
+    overlay_mode: str = "raster",
+    response_format: str = "full",
+    degradation: Degradation = FULL_QUALITY,
+    plan: AnalysisPlan = FULL_PLAN,
+    preflight: Optional[str] = None,
+    parsing_model: Optional[str] = None,
+) -> Union[AnalyzeResponse, CompactAnalyzeResponse]:
+    if overlay_mode not in OVERLAY_MODES:
+        raise ValueError(f"overlay_mode must be one of: {', '.join(OVERLAY_MODES)}")
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"response_format must be one of: {', '.join(RESPONSE_FORMATS)}")
+
+    # Compact clients draw their own overlays from the mesh, so nothing is rendered for them.
+    compact = response_format == "compact"
+    results = _build_graph(
+        front_bytes,
+        side_bytes,
+        tr_x,
+        tr_y,
+        overlay_mode,
+        render=not compact,
+        degradation=degradation,
+        plan=plan,
+        preflight=get_settings().preflight if preflight is None else preflight,
+        parsing_model=parsing_model,
+    ).run(stage_executor())
+
+    front_decoded: Optional[DecodedImage] = results.get("decode_front")
+    side_decoded: Optional[DecodedImage] = results.get("decode_side")
+    if front_decoded is not None:
+        annotate("front_size", f"{front_decoded.width}x{front_decoded.height}")
+    if side_decoded is not None:
+        annotate("side_size", f"{side_decoded.width}x{side_decoded.height}")
+
+    front: ViewPoints = results["front"]
+    side: ViewPoints = results["side"]
+    front_faces, front_count = front.faces, front.landmarks_count
+    side_faces = side.faces
+    side_missing = plan.side and side.selection is None
+    trichion = results["trichion"].point
+    tr_method = results["trichion"].method
+    mandatory_landmarks, measurements, ratios = results["measurements"]
 
     warnings: List[str] = []
+    if results.get("preflight") is not None:
+        warnings.extend(results["preflight"].warnings())
     if len(front_faces) > 1:
         warnings.append("Multiple faces detected in front image; selected the most central/largest face.")
     if len(side_faces) > 1:
         warnings.append("Multiple faces detected in side image; selected the most central/largest face.")
     if side_missing:
         warnings.append("No face detected in side image; side measurements are unavailable.")
-    if not trichion_available:
+    # Under measurements_only, segmentation was skipped on purpose; the degradation warning already says so.
+    geometric_tr = tr_method in FALLBACK_WARNINGS and not degradation.measurements_only
+    if trichion is None and tr_method != "skipped":
         warnings.append("Trichion (Tr) unavailable; hairline segmentation did not return a result.")
-    elif tr_method == "fallback":
-        warnings.append("Trichion (Tr) estimated with geometric fallback (no hair detected).")
+    elif geometric_tr:
+        warnings.append(FALLBACK_WARNINGS[tr_method])
     elif tr_method == "manual":
         warnings.append("Trichion (Tr) set manually.")
+    warnings.extend(degradation.warnings())
+
+    if side_missing:
+        record_outcome("side_missing")
+    elif geometric_tr:
+        record_outcome("fallback_tr" if tr_method == "fallback" else "fallback_error")
+    else:
+        record_outcome("ok")
+
+    if compact:
+        return CompactAnalyzeResponse.model_construct(
+            ok=True,
+            format="compact",
+            all_landmarks_count=front_count,
+            gender=gender,
+            landmarks=landmark_table(mandatory_landmarks),
+            meshes={"front": _view_mesh(front, front_decoded), "side": _view_mesh(side, side_decoded)},
+            measurements=measurement_table(measurements),
+            ratios=ratio_table(ratios),
+            warnings=warnings,
+        )
+
+    # Fixed key order regardless of which stage finished first.
+    annotated_images = {}
+    for key in ("front", "side", "front_all", "side_all") + TR_DEBUG_KEYS:
+        if results.get(f"render_{key}") is not None:
+            annotated_images[key] = results[f"render_{key}"]
+    if "tr_parsing" in annotated_images:
+        annotated_images["tr_parsing_legend"] = cached_call("parsing_legend", parsing_legend_png)
 
-    return AnalyzeResponse(
+    # Everything below was produced by this module, so the response is built without re-validation.
+    return AnalyzeResponse.model_construct(
         ok=True,
         all_landmarks_count=front_count,
         gender=gender,
         mandatory_landmarks=mandatory_landmarks,
         measurements=measurements,
         ratios=ratios,
-        annotated_images={
-            "front": to_base64_png(annotated_front),
-            "side": to_base64_png(annotated_side),
-            "front_all": to_base64_png(annotated_front_all),
-            "side_all": to_base64_png(annotated_side_all),
-            **{key: to_base64_png(img) for key, img in tr_debug.items()},
-        },
+        annotated_images=annotated_images,
         warnings=warnings,
     )
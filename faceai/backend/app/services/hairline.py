@@ -1,29 +1,57 @@
 from __future__ import annotations
 
-import io
+import base64
+import importlib.util
 import sys
+import threading
+import time
 import zipfile
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
-import torch
-from PIL import Image
-from torch import nn
+
+from app.config import get_settings
+from app.services.model_registry import REGISTRY, LoadedModel, ModelVariant, get_variant, verify_weights
+from app.services.parsing_client import parsing_client
+from app.services.parsing_vis import SKIN_CLASS_ID, blend_mask, colorize_mask, legend_png_bytes
+from app.utils.concurrency import configure_torch
+from app.utils.metrics import PARSING_BACKEND, annotate, stage, timed
+
+if TYPE_CHECKING:
+    import torch
+    from torch import nn
 
 MODEL_REPO_ZIP = "https://github.com/yakhyo/face-parsing/archive/refs/heads/main.zip"
-MODEL_WEIGHTS_URL = "https://github.com/yakhyo/face-parsing/releases/download/weights/resnet34.pt"
+MODEL_WEIGHTS_URL = "https://github.com/yakhyo/face-parsing/releases/download/weights/{backbone}.pt"
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 CACHE_DIR = PROJECT_ROOT / "model_cache" / "face_parsing"
-WEIGHTS_PATH = CACHE_DIR / "weights" / "resnet34.pt"
+WEIGHTS_DIR = CACHE_DIR / "weights"
 REPO_DIR = CACHE_DIR / "face-parsing-main"
 
-HAIR_CLASS_ID = 1  # hair class (confirmed via debug)
+_BUFFERS = threading.local()
+LITE_MESSAGE = "Hair segmentation is disabled in lite mode (no parsing server configured)"
+
+
+@lru_cache(maxsize=1)
+def torch_installed() -> bool:
+    return importlib.util.find_spec("torch") is not None
+
 
-_MODEL: Optional[nn.Module] = None
-_DEVICE: Optional[torch.device] = None
+def local_parsing_enabled() -> bool:
+    # Lite deployments (FACEAI_LITE=1, or torch not installed) never load a model in the API process.
+    return not get_settings().lite and torch_installed()
+
+
+def _torch():
+    # torch costs ~2 s to import, so it is loaded on the first segmentation rather than at startup.
+    import torch
+
+    configure_torch(torch)
+    return torch
 
 
 def _download(url: str, dest: Path) -> None:
@@ -47,65 +75,153 @@ def _ensure_repo() -> None:
         archive.extractall(CACHE_DIR)
 
 
-def _ensure_weights() -> None:
-    if WEIGHTS_PATH.exists():
-        return
-    _download(MODEL_WEIGHTS_URL, WEIGHTS_PATH)
+def _weights_path(backbone: str) -> Path:
+    return WEIGHTS_DIR / f"{backbone}.pt"
 
 
-def _load_model() -> nn.Module:
-    global _MODEL, _DEVICE
+def _ensure_weights(backbone: str) -> None:
+    if _weights_path(backbone).exists():
+        return
+    _download(MODEL_WEIGHTS_URL.format(backbone=backbone), _weights_path(backbone))
 
-    if _MODEL is not None:
-        return _MODEL
 
+def _build_model(variant: ModelVariant) -> Tuple[nn.Module, torch.device, int, str]:
     _ensure_repo()
-    _ensure_weights()
+    _ensure_weights(variant.backbone)
+    sha256 = verify_weights(variant, _weights_path(variant.backbone))
 
-    sys.path.insert(0, str(REPO_DIR))
+    if str(REPO_DIR) not in sys.path:
+        sys.path.insert(0, str(REPO_DIR))
     try:
         from models.bisenet import BiSeNet  # type: ignore
     except Exception as exc:  # noqa: BLE001
         raise RuntimeError("Unable to import BiSeNet from downloaded face-parsing repo.") from exc
 
+    torch = _torch()
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = BiSeNet(19, "resnet34")  # type: ignore[call-arg]
-    state = torch.load(str(WEIGHTS_PATH), map_location=device)
-    model.load_state_dict(state, strict=False)
+    model = BiSeNet(19, variant.backbone)  # type: ignore[call-arg]
+    # Memory-mapped and assigned rather than copied: the weights stay in the page cache, so every worker process
+    # (forked or not) maps the same physical pages instead of holding its own copy.
+    state = torch.load(str(_weights_path(variant.backbone)), map_location=device, mmap=True)
+    model.load_state_dict(state, strict=False, assign=True)
+    if variant.fused:
+        from app.services.input_folding import fold_input
+
+        model = fold_input(model)
     model.to(device)
     model.eval()
 
-    _MODEL = model
-    _DEVICE = device
-    return model
+    nbytes = sum(tensor.numel() * tensor.element_size() for tensor in model.state_dict().values())
+    return model, device, nbytes, sha256
+
+
+def _load_model(name: Optional[str] = None) -> LoadedModel:
+    return REGISTRY.get(name or get_settings().parsing_model, _build_model)
+
+
+def preload_models() -> List[str]:
+    # The deployment default plus every tier model; failures are left for the first request to report.
+    settings = get_settings()
+    if not local_parsing_enabled():
+        return []
+    loaded: List[str] = []
+    for name in dict.fromkeys([settings.parsing_model, *settings.model_tiers.values()]):
+        try:
+            _load_model(name)
+        except Exception:  # noqa: BLE001
+            continue
+        loaded.append(name)
+    return loaded
 
 
-def _preprocess(image_bgr: np.ndarray) -> torch.Tensor:
+def _resize_rgb(image_bgr: np.ndarray, size: int) -> np.ndarray:
+    from PIL import Image
+
     image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
     pil = Image.fromarray(image_rgb)
-    pil = pil.resize((512, 512), Image.BILINEAR)
-    array = np.asarray(pil).astype(np.float32) / 255.0
+    pil = pil.resize((size, size), Image.BILINEAR)
+    annotate("parsing_input", f"{image_bgr.shape[1]}x{image_bgr.shape[0]}->{size}x{size}")
+    return np.asarray(pil)
+
+
+def _resize_bgr(image_bgr: np.ndarray, size: int) -> np.ndarray:
+    # Input for fused variants: one cv2 resize into a per-thread buffer that is reused across calls, with no colour
+    # conversion or float copies. Callers must be done with the result before the thread's next call.
+    buffer = getattr(_BUFFERS, "bgr", None)
+    if buffer is None or buffer.shape[0] != size:
+        buffer = np.empty((size, size, 3), dtype=np.uint8)
+        _BUFFERS.bgr = buffer
+    height, width = image_bgr.shape[:2]
+    interpolation = cv2.INTER_AREA if max(height, width) > size else cv2.INTER_LINEAR
+    cv2.resize(image_bgr, (size, size), dst=buffer, interpolation=interpolation)
+    annotate("parsing_input", f"{width}x{height}->{size}x{size}")
+    return buffer
+
+
+def _model_input(image_bgr: np.ndarray, variant: ModelVariant, size: int) -> np.ndarray:
+    # (size, size, 3) uint8 in the variant's channel order: BGR for fused variants, RGB otherwise.
+    if variant.fused:
+        return _resize_bgr(image_bgr, size)
+    return _resize_rgb(image_bgr, size)
+
+
+def _input_tensor(variant: ModelVariant, batch: np.ndarray) -> torch.Tensor:
+    if variant.fused:
+        return _torch().from_numpy(batch)
+    return _to_tensor(batch)
+
+
+def _to_tensor(batch_rgb: np.ndarray) -> torch.Tensor:
+    # (N, size, size, 3) uint8 RGB -> normalized (N, 3, size, size) float32.
+    array = batch_rgb.astype(np.float32) / 255.0
     mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
     std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
     array = (array - mean) / std
-    array = np.transpose(array, (2, 0, 1))
-    tensor = torch.from_numpy(array).unsqueeze(0)
-    return tensor
-
+    array = np.transpose(array, (0, 3, 1, 2))
+    return _torch().from_numpy(array)
 
-def _predict_mask(image_bgr: np.ndarray) -> np.ndarray:
-    model = _load_model()
-    device = _DEVICE or torch.device("cpu")
-    tensor = _preprocess(image_bgr).to(device)
 
+def _infer(entry: LoadedModel, tensor: torch.Tensor) -> np.ndarray:
+    torch = _torch()
+    started = time.perf_counter()
     with torch.no_grad():
-        outputs = model(tensor)
+        outputs = entry.model(tensor.to(entry.device))
+    REGISTRY.observe(entry, time.perf_counter() - started)
 
     # BiSeNet returns a tuple; first element is the main output
     if isinstance(outputs, (list, tuple)):
         outputs = outputs[0]
-    parsing = outputs.argmax(1).squeeze(0).cpu().numpy().astype(np.uint8)
-    return parsing
+    return outputs.argmax(1).cpu().numpy().astype(np.uint8)
+
+
+@timed("parsing")
+def _predict_mask(image_bgr: np.ndarray, size: Optional[int] = None, model: Optional[str] = None) -> np.ndarray:
+    client = parsing_client()
+    if client is None and not local_parsing_enabled():
+        raise RuntimeError(LITE_MESSAGE)
+    name = model or get_settings().parsing_model
+    annotate("parsing_model", name)
+    variant = get_variant(name)
+    pixels = _model_input(image_bgr, variant, size or variant.input_size)
+
+    if client is not None:
+        if client.available():
+            try:
+                mask = client.predict(pixels, name)
+            except OSError:
+                pass
+            else:
+                annotate("parsing_backend", "daemon")
+                PARSING_BACKEND.labels("daemon").inc()
+                return mask
+        if not local_parsing_enabled():
+            raise RuntimeError("Parsing server is unavailable and this lite worker has no local model")
+        # The daemon is down: run the model in this process rather than lose the hairline.
+        annotate("parsing_backend", "local")
+        PARSING_BACKEND.labels("fallback").inc()
+
+    entry = _load_model(name)
+    return _infer(entry, _input_tensor(entry.variant, pixels[None]))[0]
 
 
 def _resize_mask(mask: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
@@ -113,88 +229,59 @@ def _resize_mask(mask: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
     return cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
 
 
-def _colorize_parsing(parsing: np.ndarray) -> np.ndarray:
-    # 19 classes in CelebAMask-HQ for BiSeNet face parsing
-    palette = np.array(
-        [
-            [0, 0, 0],
-            [128, 0, 0],
-            [255, 0, 0],
-            [0, 85, 0],
-            [170, 0, 51],
-            [255, 85, 0],
-            [0, 0, 85],
-            [0, 119, 221],
-            [85, 85, 0],
-            [0, 85, 85],
-            [85, 51, 0],
-            [52, 86, 128],
-            [0, 128, 0],
-            [0, 0, 255],
-            [51, 170, 221],
-            [0, 255, 255],
-            [85, 255, 170],
-            [170, 255, 85],
-            [255, 255, 0],
-        ],
-        dtype=np.uint8,
-    )
-    colored = palette[parsing % len(palette)]
-    return colored
-
-
-def _legend_image() -> np.ndarray:
-    palette = _colorize_parsing(np.arange(19, dtype=np.uint8)).reshape(19, 1, 3)
-    row_h = 26
-    width = 260
-    height = row_h * 19 + 10
-    legend = np.zeros((height, width, 3), dtype=np.uint8)
-    legend[:] = (18, 18, 18)
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    for idx in range(19):
-        y = 5 + idx * row_h
-        color = tuple(int(v) for v in palette[idx, 0])
-        cv2.rectangle(legend, (8, y + 4), (32, y + 20), color, -1)
-        cv2.putText(legend, f"Class {idx}", (42, y + 18), font, 0.5, (220, 220, 220), 1, cv2.LINE_AA)
-    return legend
+@lru_cache(maxsize=1)
+def parsing_legend_png() -> str:
+    encoded = base64.b64encode(legend_png_bytes()).decode("utf-8")
+    return f"data:image/png;base64,{encoded}"
+
+
+def midline_x(front_points: Dict[str, Dict], width: int) -> int:
+    if "Prn" in front_points:
+        return int(front_points["Prn"]["pixel"]["x"])
+    if "N" in front_points:
+        return int(front_points["N"]["pixel"]["x"])
+    return width // 2
+
 
 def estimate_trichion(
     image_bgr: np.ndarray,
     front_points: Dict[str, Dict],
     landmarks: Optional[list] = None,
     debug: bool = False,
+    parsing: Optional[np.ndarray] = None,
+    use_model: bool = True,
+    parsing_failed: bool = False,
 ) -> Tuple[Optional[Dict[str, Dict]], Dict[str, np.ndarray], str]:
-    try:
-        parsing = _predict_mask(image_bgr)
-    except Exception:
-        parsing = None
+    # parsing_failed: the caller's segmentation raised or timed out, so a geometric Tr is "fallback_error".
+    if parsing is None and use_model:
+        try:
+            parsing = _predict_mask(image_bgr)
+        except Exception:
+            parsing = None
+            parsing_failed = True
 
     height, width = image_bgr.shape[:2]
-    hair_mask = None
+    skin_mask = None
     if parsing is not None:
         parsing = _resize_mask(parsing, (width, height))
-        hair_mask = parsing == HAIR_CLASS_ID
-
-    mid_x = None
-    if "Prn" in front_points:
-        mid_x = int(front_points["Prn"]["pixel"]["x"])
-    elif "N" in front_points:
-        mid_x = int(front_points["N"]["pixel"]["x"])
-
-    if mid_x is None:
-        mid_x = width // 2
+        skin_mask = parsing == SKIN_CLASS_ID
 
+    mid_x = midline_x(front_points, width)
     search_radius = max(3, int(width * 0.01))
     top_y = None
-    if hair_mask is not None:
-        for y in range(height):
-            x_start = max(0, mid_x - search_radius)
-            x_end = min(width - 1, mid_x + search_radius)
-            if hair_mask[y, x_start : x_end + 1].any():
-                top_y = y
-                break
-
-    method = "hair" if top_y is not None else "fallback"
+    if skin_mask is not None:
+        with stage("trichion_search"):
+            for y in range(height):
+                x_start = max(0, mid_x - search_radius)
+                x_end = min(width - 1, mid_x + search_radius)
+                if skin_mask[y, x_start : x_end + 1].any():
+                    top_y = y
+                    break
+
+    if top_y is not None:
+        method = "hair"
+    else:
+        method = "fallback_error" if parsing_failed else "fallback"
 
     if top_y is None and landmarks:
         # Use top-most mesh point near the midline as a fallback.
@@ -223,16 +310,29 @@ def estimate_trichion(
     debug_images: Dict[str, np.ndarray] = {}
     if debug:
         mask_vis = np.zeros_like(image_bgr)
-        if hair_mask is not None:
-            mask_vis[hair_mask] = (0, 200, 0)
-        overlay = cv2.addWeighted(image_bgr, 0.65, mask_vis, 0.35, 0)
+        if skin_mask is not None:
+            mask_vis[skin_mask] = (0, 200, 0)
+        overlay = blend_mask(image_bgr, mask_vis, 0.35)
         cv2.line(overlay, (mid_x, 0), (mid_x, height - 1), (255, 255, 0), 1)
         cv2.circle(overlay, (mid_x, top_y), 4, (0, 0, 255), -1)
         debug_images["tr_hair_mask"] = mask_vis
         debug_images["tr_overlay"] = overlay
         if parsing is not None:
-            parsing_vis = _colorize_parsing(parsing)
-            debug_images["tr_parsing"] = parsing_vis
-            debug_images["tr_parsing_legend"] = _legend_image()
+            debug_images["tr_parsing"] = colorize_mask(parsing)
 
     return trichion, debug_images, method
+
+
+FALLBACK_WARNINGS = {
+    "fallback": "Trichion (Tr) estimated with geometric fallback (no hair detected).",
+    "fallback_error": (
+        "Trichion (Tr) estimated with geometric fallback (hair segmentation unavailable, failed or timed out)."
+    ),
+}
+
+
+def trichion_tier(method: str) -> str:
+    # faceai_trichion_tier_total label for an estimate_trichion method.
+    if method == "hair":
+        return "segmentation"
+    return "geometric_error" if method == "fallback_error" else "geometric"
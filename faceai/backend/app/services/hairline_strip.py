@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# FaceMesh indices: top of the mesh on the forehead, between the brows, and the two upper cheeks.
+FOREHEAD_TOP = 10
+GLABELLA = 9
+CHEEKS = (117, 346)
+
+# Lab distances (OpenCV 8-bit scale) are divided by these per-channel tolerances: lighting moves L far more than a/b.
+COLOUR_SCALE = np.array([20.0, 8.0, 8.0], dtype=np.float32)
+# Smallest colour step between the windows above and below a row that counts as a skin -> hair edge.
+MIN_STEP = 1.5
+# Search from the brows up to this far (in face heights) above the top of the mesh.
+SEARCH_ABOVE = 0.45
+STRIP_HALF_WIDTH = 0.015
+WINDOW = 0.02
+BAND = 0.05
+# Left and right half-strip edges this far apart (in face heights) score zero agreement.
+MAX_DISAGREEMENT = 0.03
+# A forehead seed this far from the cheeks is not bare skin (bangs, a brim's shadow). Forehead and cheeks are often lit
+# differently, so lightness gets a much looser tolerance here.
+SEED_SCALE = np.array([60.0, 8.0, 8.0], dtype=np.float32)
+MAX_SEED_DISTANCE = 2.0
+
+
+@dataclass
+class StripEstimate:
+    point: Optional[Dict]
+    confidence: float
+    step: float = 0.0
+    consistency: float = 0.0
+    agreement: float = 0.0
+    texture: float = 0.0
+
+
+NO_ESTIMATE = StripEstimate(None, 0.0)
+
+
+def _distance(a: np.ndarray, b: np.ndarray, scale: np.ndarray = COLOUR_SCALE) -> np.ndarray:
+    return np.sqrt((((a - b) / scale) ** 2).sum(axis=-1))
+
+
+def _find_edge(rows: np.ndarray, window: int) -> Tuple[Optional[int], float]:
+    # rows: per-row mean Lab colour, top to bottom, ending at the skin seed. Walks up from the seed to the first row
+    # where the window above differs from the window below by MIN_STEP, then to the strongest step nearby. Returns
+    # the index of the topmost skin row.
+    count = len(rows)
+    if count < 2 * window + 1:
+        return None, 0.0
+    sums = np.vstack([np.zeros((1, 3), dtype=np.float64), np.cumsum(rows, axis=0, dtype=np.float64)])
+    index = np.arange(window, count - window + 1)
+    above = (sums[index] - sums[index - window]) / window
+    below = (sums[index + window] - sums[index]) / window
+    steps = _distance(above, below)
+    strong = np.flatnonzero(steps > MIN_STEP)
+    if not strong.size:
+        return None, 0.0
+    first = strong[-1]
+    nearby = slice(max(0, first - window + 1), first + 1)
+    best = nearby.start + int(np.argmax(steps[nearby]))
+    return int(index[best]), float(steps[best])
+
+
+def _mean_lab(image_bgr: np.ndarray, x: int, y: int, radius: int) -> np.ndarray:
+    height, width = image_bgr.shape[:2]
+    patch = image_bgr[max(0, y - radius) : min(height, y + radius + 1), max(0, x - radius) : min(width, x + radius + 1)]
+    if not patch.size:
+        return np.full(3, np.nan, dtype=np.float32)
+    return cv2.cvtColor(patch, cv2.COLOR_BGR2LAB).reshape(-1, 3).astype(np.float32).mean(axis=0)
+
+
+def strip_trichion(image_bgr: np.ndarray, landmarks: List, mid_x: int) -> StripEstimate:
+    # Cheap first tier: colour, gradient and texture statistics of a narrow midline strip above the forehead.
+    height, width = image_bgr.shape[:2]
+    ys = [lm.y for lm in landmarks]
+    xs = [lm.x for lm in landmarks]
+    face_h = (max(ys) - min(ys)) * height
+    face_w = (max(xs) - min(xs)) * width
+    if face_h < 32 or not 0 <= mid_x < width:
+        return NO_ESTIMATE
+
+    half = max(2, int(round(STRIP_HALF_WIDTH * face_w)))
+    seed_y = min(height - 1, int(landmarks[GLABELLA].y * height))
+    top = max(0, int(landmarks[FOREHEAD_TOP].y * height - SEARCH_ABOVE * face_h))
+    window = max(3, int(WINDOW * face_h))
+    if seed_y - top <= 2 * window:
+        return NO_ESTIMATE
+    x0, x1 = max(0, mid_x - half), min(width, mid_x + half + 1)
+    strip = image_bgr[top : seed_y + 1, x0:x1]
+    lab = cv2.cvtColor(strip, cv2.COLOR_BGR2LAB).astype(np.float32)
+    rows = lab.mean(axis=1)
+    edge, step = _find_edge(rows, window)
+    if edge is None:
+        return NO_ESTIMATE
+
+    cheeks = [_mean_lab(image_bgr, int(landmarks[i].x * width), int(landmarks[i].y * height), half) for i in CHEEKS]
+    seed = rows[-window:].mean(axis=0)
+    # NaN (a cheek outside the image) fails the comparison too.
+    if not float(_distance(seed, np.mean(cheeks, axis=0), SEED_SCALE)) <= MAX_SEED_DISTANCE:
+        return NO_ESTIMATE
+
+    band = max(window, int(BAND * face_h))
+    above = rows[max(0, edge - band) : edge]
+    below = rows[edge : edge + band]
+    # Hair keeps going above the edge; a shadow or a crease does not.
+    consistency = float((_distance(above, below.mean(axis=0)) > 1.0).mean())
+
+    middle = lab.shape[1] // 2
+    left, _ = _find_edge(lab[:, :middle].mean(axis=1), window)
+    right, _ = _find_edge(lab[:, middle:].mean(axis=1), window)
+    agreement = 0.0
+    if left is not None and right is not None:
+        agreement = max(0.0, 1.0 - abs(left - right) / (MAX_DISAGREEMENT * face_h))
+
+    # Strands make hair busier than skin; smooth dark regions above the brow are more often shadows or brims.
+    gray = cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    busy = np.abs(np.diff(gray, axis=1)).mean(axis=1) if gray.shape[1] > 1 else np.zeros(len(gray))
+    texture = float(busy[max(0, edge - band) : edge].mean() / max(float(busy[edge : edge + band].mean()), 1e-3))
+
+    confidence = min(1.0, (step - 1.0) / 2.0) * consistency * agreement * float(np.clip(texture, 0.5, 1.0))
+    y = float(top + edge)
+    x = float(mid_x)
+    point = {"index": None, "pixel": {"x": x, "y": y}, "normalized": {"x": x / width, "y": y / height, "z": 0.0}}
+    return StripEstimate(
+        point, round(confidence, 3), round(step, 3), round(consistency, 3), round(agreement, 3), round(texture, 3)
+    )
+
+
+def draw_strip_estimate(image_bgr: np.ndarray, estimate: StripEstimate) -> np.ndarray:
+    overlay = image_bgr.copy()
+    if estimate.point is None:
+        return overlay
+    x, y = int(estimate.point["pixel"]["x"]), int(estimate.point["pixel"]["y"])
+    cv2.line(overlay, (x, 0), (x, overlay.shape[0] - 1), (255, 255, 0), 1)
+    cv2.circle(overlay, (x, y), 4, (0, 0, 255), -1)
+    return overlay
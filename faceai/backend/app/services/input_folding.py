@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import copy
+from typing import Sequence
+
+import torch
+from torch import nn
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+BISENET_FIRST_CONV = "fpn.backbone.conv1"
+
+
+class FoldedConv2d(nn.Module):
+    # conv(((x / 255) - mean) / std) for raw 0-255 input. 1 / (255 * std) and the RGB -> BGR swap live in the weights.
+    # The mean stays a subtraction rather than a bias, so zero padding still means "mean colour" at the borders, exactly
+    # as in the unfolded model.
+    def __init__(
+        self,
+        conv: nn.Conv2d,
+        mean: Sequence[float] = IMAGENET_MEAN,
+        std: Sequence[float] = IMAGENET_STD,
+        bgr: bool = True,
+    ) -> None:
+        super().__init__()
+        dtype = conv.weight.dtype
+        scale = torch.tensor(std, dtype=dtype) * 255.0
+        offset = torch.tensor(mean, dtype=dtype) * 255.0
+        weight = conv.weight.detach() / scale.view(1, -1, 1, 1)
+        if bgr:
+            weight = weight.flip(1)
+            offset = offset.flip(0)
+        self.conv = copy.deepcopy(conv)
+        self.conv.weight = nn.Parameter(weight.contiguous(), requires_grad=False)
+        self.register_buffer("offset", offset.view(1, -1, 1, 1))
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.conv(x.to(self.offset.dtype) - self.offset)
+
+
+class FusedInput(nn.Module):
+    # Takes (N, H, W, 3) uint8 BGR straight from cv2; the permute to NCHW is a view, not a copy.
+    def __init__(self, model: nn.Module) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, x: torch.Tensor):
+        return self.model(x.permute(0, 3, 1, 2))
+
+
+def fold_input(
+    model: nn.Module,
+    first_conv: str = BISENET_FIRST_CONV,
+    mean: Sequence[float] = IMAGENET_MEAN,
+    std: Sequence[float] = IMAGENET_STD,
+) -> FusedInput:
+    parent_name, _, attr = first_conv.rpartition(".")
+    parent = model.get_submodule(parent_name)
+    setattr(parent, attr, FoldedConv2d(getattr(parent, attr), mean, std))
+    return FusedInput(model)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from app.services.facemesh import _create_face_mesh, _extract_landmarks, _landmarks_array, _points_from_map
+from app.services.measurements import compute_measurements
+from app.services.pose import estimate_head_pose
+from app.utils.landmarks_map import load_landmark_map
+
+DEFAULT_BUDGET_MS = 80.0
+MIN_BUDGET_MS = 10.0
+MAX_BUDGET_MS = 1000.0
+# Frames are downscaled before meshing when processing runs over budget.
+MIN_SCALE = 0.25
+MAX_SIDE = 1280
+
+_SESSIONS = 0
+_SESSIONS_LOCK = threading.Lock()
+
+
+def claim_live_session(limit: int) -> bool:
+    global _SESSIONS
+    with _SESSIONS_LOCK:
+        if _SESSIONS >= limit:
+            return False
+        _SESSIONS += 1
+        return True
+
+
+def release_live_session() -> None:
+    global _SESSIONS
+    with _SESSIONS_LOCK:
+        _SESSIONS = max(0, _SESSIONS - 1)
+
+
+class LiveSession:
+    def __init__(self, budget_ms: float = DEFAULT_BUDGET_MS) -> None:
+        self.budget_ms = max(MIN_BUDGET_MS, min(MAX_BUDGET_MS, budget_ms))
+        self.scale = 1.0
+        self.frames = 0
+        self.dropped = 0
+        self._mapping = load_landmark_map()
+        self._face_mesh = _create_face_mesh(static_image_mode=False, max_num_faces=1)
+
+    def close(self) -> None:
+        self._face_mesh.close()
+
+    def _adapt_scale(self, elapsed_ms: float) -> None:
+        if elapsed_ms > self.budget_ms:
+            self.scale = max(MIN_SCALE, self.scale * 0.8)
+        elif elapsed_ms < self.budget_ms * 0.5:
+            self.scale = min(1.0, self.scale * 1.1)
+
+    def process(self, frame_bytes: bytes) -> Dict:
+        started = time.perf_counter()
+        self.frames += 1
+        image = cv2.imdecode(np.frombuffer(frame_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return {"frame": self.frames, "error": "Unable to decode image"}
+
+        height, width = image.shape[:2]
+        scale = min(self.scale, MAX_SIDE / max(width, height))
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        faces, _ = _extract_landmarks(image, self._face_mesh)
+        result: Dict = {
+            "frame": self.frames,
+            "dropped": self.dropped,
+            "width": width,
+            "height": height,
+            "scale": round(scale, 3),
+            "face": bool(faces),
+        }
+        if faces:
+            landmarks = faces[0].landmark
+            coords = _landmarks_array(landmarks)
+            pose = estimate_head_pose(coords, width, height)
+            result["landmarks"] = np.round(coords[:, :2], 4).ravel().tolist()
+            result["pose"] = {"yaw": round(pose.yaw, 1), "pitch": round(pose.pitch, 1), "roll": round(pose.roll, 1)}
+
+            if (time.perf_counter() - started) * 1000.0 < self.budget_ms:
+                points = _points_from_map(landmarks, self._mapping, width, height)
+                result["measurements"] = {
+                    m.id: round(m.value, 2) for m in compute_measurements(points, {}) if m.value is not None
+                }
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self._adapt_scale(elapsed_ms)
+        result["elapsed_ms"] = round(elapsed_ms, 1)
+        result["over_budget"] = elapsed_ms > self.budget_ms
+        return result
+
+
+class LatestFrame:
+    # Single-slot mailbox: a newer frame replaces one that was never processed.
+    def __init__(self) -> None:
+        self._data: Optional[bytes] = None
+
+    def put(self, data: bytes) -> bool:
+        replaced = self._data is not None
+        self._data = data
+        return replaced
+
+    def take(self) -> Optional[bytes]:
+        data, self._data = self._data, None
+        return data
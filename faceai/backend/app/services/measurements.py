@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Collection, Dict, List, Optional
 
 from app.models.schemas import MeasurementOut, RatioOut
 
@@ -25,11 +25,15 @@ def _load_catalog() -> List[Dict]:
         return json.load(handle)
 
 
-def compute_measurements(front_points: Dict[str, Dict], side_points: Dict[str, Dict]) -> List[MeasurementOut]:
+def compute_measurements(
+    front_points: Dict[str, Dict], side_points: Dict[str, Dict], only: Optional[Collection[str]] = None
+) -> List[MeasurementOut]:
     catalog = _load_catalog()
     results: List[MeasurementOut] = []
 
     for entry in catalog:
+        if only is not None and entry["id"] not in only:
+            continue
         measurement_id = entry["id"]
         label = entry["label"]
         image = entry["image"]
@@ -45,7 +49,7 @@ def compute_measurements(front_points: Dict[str, Dict], side_points: Dict[str, D
             note = "Missing required landmarks for this measurement."
 
         results.append(
-            MeasurementOut(
+            MeasurementOut.model_construct(
                 id=measurement_id,
                 label=label,
                 image=image,
@@ -59,11 +63,13 @@ def compute_measurements(front_points: Dict[str, Dict], side_points: Dict[str, D
     return results
 
 
-def compute_ratios(measurements: List[MeasurementOut]) -> List[RatioOut]:
+def compute_ratios(measurements: List[MeasurementOut], only: Optional[Collection[str]] = None) -> List[RatioOut]:
     measurement_map = {m.id: m for m in measurements}
     ratios: List[RatioOut] = []
 
     for entry in RATIO_DEFS:
+        if only is not None and entry["id"] not in only:
+            continue
         numerator_id = entry["numerator"]
         denominator_id = entry["denominator"]
         numerator = measurement_map.get(numerator_id)
@@ -81,7 +87,7 @@ def compute_ratios(measurements: List[MeasurementOut]) -> List[RatioOut]:
             note = "Missing measurements for ratio."
 
         ratios.append(
-            RatioOut(
+            RatioOut.model_construct(
                 id=entry["id"],
                 numerator=numerator_id,
                 denominator=denominator_id,
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import Settings, get_settings
+from app.utils.metrics import MODEL_EVICTIONS, MODEL_INFERENCE_SECONDS, MODEL_LOAD_SECONDS, MODEL_RESIDENT_BYTES
+
+logger = logging.getLogger("faceai.models")
+
+WARM_ALPHA = 0.2
+
+
+@dataclass(frozen=True)
+class ModelVariant:
+    name: str
+    backbone: str
+    engine: str
+    precision: str
+    input_size: int
+    # Expected sha256 of the weights file; None until pinned with FACEAI_MODEL_SHA256.
+    sha256: Optional[str] = None
+    # Takes uint8 (N, H, W, 3) BGR: normalisation and the channel swap are folded into the first convolution.
+    fused: bool = False
+
+
+VARIANTS: Dict[str, ModelVariant] = {
+    variant.name: variant
+    for variant in (
+        ModelVariant("bisenet_resnet18", "resnet18", "torch", "fp32", 512),
+        ModelVariant("bisenet_resnet34", "resnet34", "torch", "fp32", 512),
+        ModelVariant("bisenet_resnet18_fused", "resnet18", "torch", "fp32", 512, fused=True),
+        ModelVariant("bisenet_resnet34_fused", "resnet34", "torch", "fp32", 512, fused=True),
+    )
+}
+DEFAULT_MODEL = "bisenet_resnet34"
+
+
+class ModelChecksumError(RuntimeError):
+    pass
+
+
+@dataclass
+class LoadedModel:
+    variant: ModelVariant
+    model: Any
+    device: Any
+    nbytes: int
+    sha256: str
+    load_ms: float
+    calls: int = 0
+    cold_ms: Optional[float] = None
+    warm_ms: Optional[float] = None
+
+
+# A loader builds the model for a variant and returns (model, device, resident bytes, weights sha256).
+Loader = Callable[[ModelVariant], Tuple[Any, Any, int, str]]
+
+
+def get_variant(name: str) -> ModelVariant:
+    variant = VARIANTS.get(name)
+    if variant is None:
+        raise ValueError(f"Unknown model {name!r}; available: {', '.join(VARIANTS)}")
+    pinned = get_settings().model_checksums.get(name)
+    return replace(variant, sha256=pinned) if pinned else variant
+
+
+def model_for_tier(tier: Optional[str]) -> str:
+    settings = get_settings()
+    if tier is None:
+        return settings.parsing_model
+    if tier not in settings.model_tiers:
+        raise ValueError(f"tier must be one of: {', '.join(settings.model_tiers)}")
+    return settings.model_tiers[tier]
+
+
+def validate_settings(settings: Optional[Settings] = None) -> None:
+    # Parsing failures fall back to geometric Tr per request, so a misspelt model name would otherwise go unnoticed.
+    settings = settings or get_settings()
+    configured = [
+        ("FACEAI_PARSING_MODEL", settings.parsing_model),
+        ("FACEAI_QOS_PARSING_MODEL", settings.qos_parsing_model),
+        *((f"FACEAI_MODEL_TIERS[{tier}]", name) for tier, name in settings.model_tiers.items()),
+        *((f"FACEAI_MODEL_SHA256[{name}]", name) for name in settings.model_checksums),
+    ]
+    unknown = [f"{source}={name!r}" for source, name in configured if name not in VARIANTS]
+    if unknown:
+        raise ValueError(f"Unknown parsing model in {', '.join(unknown)}; available: {', '.join(VARIANTS)}")
+
+
+def verify_weights(variant: ModelVariant, path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+    if variant.sha256 and sha256 != variant.sha256.lower():
+        raise ModelChecksumError(f"Weights for {variant.name} have sha256 {sha256}, expected {variant.sha256}")
+    return sha256
+
+
+class ModelRegistry:
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        # None reads FACEAI_MODEL_MEMORY_MB on every load; 0 means no cap.
+        self.max_bytes = max_bytes
+        self._resident: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._stats: Dict[str, LoadedModel] = {}
+        self._failed: Dict[str, ModelChecksumError] = {}
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _limit(self) -> int:
+        if self.max_bytes is not None:
+            return self.max_bytes
+        return get_settings().model_memory_mb * 1024 * 1024
+
+    def get(self, name: str, loader: Loader) -> LoadedModel:
+        with self._lock:
+            entry = self._resident.get(name)
+            if entry is not None:
+                self._resident.move_to_end(name)
+                return entry
+            if name in self._failed:
+                raise self._failed[name]
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        # Loads download and hash weights; only callers of the same model wait, resident models stay available.
+        with loading:
+            with self._lock:
+                entry = self._resident.get(name)
+                if entry is not None:
+                    self._resident.move_to_end(name)
+                    return entry
+                if name in self._failed:
+                    raise self._failed[name]
+            variant = get_variant(name)
+            started = time.perf_counter()
+            try:
+                model, device, nbytes, sha256 = loader(variant)
+            except ModelChecksumError as exc:
+                # A mismatch will not fix itself; remember it rather than re-hashing the file on every request.
+                logger.error("Refusing to load %s: %s", name, exc)
+                with self._lock:
+                    self._failed[name] = exc
+                raise
+            load_ms = (time.perf_counter() - started) * 1000.0
+
+            with self._lock:
+                previous = self._stats.get(name)
+                entry = LoadedModel(
+                    variant=variant,
+                    model=model,
+                    device=device,
+                    nbytes=nbytes,
+                    sha256=sha256,
+                    load_ms=load_ms,
+                    # A reload keeps the latency history; only the first call after a load is cold.
+                    warm_ms=previous.warm_ms if previous else None,
+                )
+                self._evict_for(nbytes)
+                self._resident[name] = entry
+                self._stats[name] = entry
+            MODEL_LOAD_SECONDS.labels(name).set(load_ms / 1000.0)
+            MODEL_RESIDENT_BYTES.labels(name).set(nbytes)
+            return entry
+
+    def _evict_for(self, nbytes: int) -> None:
+        # The model being loaded always stays, even if it alone exceeds the cap.
+        limit = self._limit()
+        if not limit:
+            return
+        while self._resident and sum(e.nbytes for e in self._resident.values()) + nbytes > limit:
+            name, _ = self._resident.popitem(last=False)
+            MODEL_EVICTIONS.labels(name).inc()
+            MODEL_RESIDENT_BYTES.labels(name).set(0)
+
+    def observe(self, entry: LoadedModel, seconds: float) -> None:
+        elapsed_ms = seconds * 1000.0
+        with self._lock:
+            entry.calls += 1
+            if entry.calls == 1:
+                entry.cold_ms = elapsed_ms
+                return
+            if entry.warm_ms is None:
+                entry.warm_ms = elapsed_ms
+            else:
+                entry.warm_ms += WARM_ALPHA * (elapsed_ms - entry.warm_ms)
+        MODEL_INFERENCE_SECONDS.labels(entry.variant.name).observe(seconds)
+
+    def resident(self) -> List[str]:
+        with self._lock:
+            return list(self._resident)
+
+    def snapshot(self) -> List[Tuple[ModelVariant, Optional[LoadedModel], bool]]:
+        with self._lock:
+            rows = []
+            for name in VARIANTS:
+                entry = self._stats.get(name)
+                rows.append((entry.variant if entry else get_variant(name), entry, name in self._resident))
+            return rows
+
+
+REGISTRY = ModelRegistry()
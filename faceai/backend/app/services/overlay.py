@@ -1,82 +1,215 @@
-from typing import Dict, List
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
 
 import cv2
 import numpy as np
 
+from app.utils.metrics import cached_call
 
-def draw_landmarks(image_bgr: np.ndarray, points: Dict[str, Dict]) -> np.ndarray:
-    height, width = image_bgr.shape[:2]
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = max(0.4, min(0.7, width / 1200.0))
-    thickness = 1
-
-    for label, data in points.items():
-        px = int(data["pixel"]["x"])
-        py = int(data["pixel"]["y"])
-
-        cv2.circle(image_bgr, (px, py), 3, (0, 255, 255), -1)
-        text = label
-        (tw, th), baseline = cv2.getTextSize(text, font, font_scale, thickness)
-        offset_x = 6
-        offset_y = -6
-        x1 = px + offset_x
-        y1 = py + offset_y - th - baseline
-        x2 = x1 + tw + 4
-        y2 = py + offset_y + 4
-
-        x1 = max(0, min(width - 1, x1))
-        y1 = max(0, min(height - 1, y1))
-        x2 = max(0, min(width - 1, x2))
-        y2 = max(0, min(height - 1, y2))
-
-        cv2.rectangle(image_bgr, (x1, y1), (x2, y2), (0, 0, 0), -1)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+MESH_POINT_COUNT = 468
+
+
+@dataclass(frozen=True)
+class LabelStyle:
+    # Box geometry relative to the text size and to the anchor point.
+    pad_w: int
+    pad_h: int
+    offset_x: int
+    offset_y: int
+    text_x: int
+    text_y: int
+
+
+LANDMARK_LABEL_STYLE = LabelStyle(pad_w=4, pad_h=4, offset_x=6, offset_y=-2, text_x=2, text_y=3)
+INDEX_LABEL_STYLE = LabelStyle(pad_w=2, pad_h=0, offset_x=2, offset_y=-2, text_x=1, text_y=2)
+
+
+class LabelAtlas:
+    def __init__(self, font_scale: float, style: LabelStyle, thickness: int = 1) -> None:
+        self.font_scale = font_scale
+        self.style = style
+        self.thickness = thickness
+        self._sprites: Dict[str, np.ndarray] = {}
+
+    def _render(self, text: str) -> np.ndarray:
+        style = self.style
+        (tw, th), baseline = cv2.getTextSize(text, FONT, self.font_scale, self.thickness)
+        sprite_w = tw + style.pad_w + 1
+        sprite_h = th + baseline + style.pad_h + 1
+        sprite = np.zeros((sprite_h, sprite_w, 3), dtype=np.uint8)
         cv2.putText(
-            image_bgr,
+            sprite,
             text,
-            (x1 + 2, y2 - 3),
-            font,
-            font_scale,
+            (style.text_x, sprite_h - 1 - style.text_y),
+            FONT,
+            self.font_scale,
             (255, 255, 255),
-            thickness,
+            self.thickness,
             cv2.LINE_AA,
         )
+        return sprite
 
-    return image_bgr
+    def preload(self, texts: Iterable[str]) -> "LabelAtlas":
+        for text in texts:
+            self.sprite(text)
+        return self
+
+    def sprite(self, text: str) -> np.ndarray:
+        sprite = self._sprites.get(text)
+        if sprite is None:
+            sprite = self._render(text)
+            self._sprites[text] = sprite
+        return sprite
+
+    def blit(self, image: np.ndarray, texts: List[str], anchors: np.ndarray) -> np.ndarray:
+        if not texts:
+            return image
+        height, width = image.shape[:2]
+        sprites = [self.sprite(text) for text in texts]
+        sizes = np.array([sprite.shape[:2] for sprite in sprites], dtype=np.int64)
+        anchors = np.asarray(anchors, dtype=np.int64).reshape(-1, 2)
+
+        # Destination boxes for every sprite, clipped against the image in one pass.
+        x1 = anchors[:, 0] + self.style.offset_x
+        y2 = anchors[:, 1] + self.style.offset_y + 1
+        y1 = y2 - sizes[:, 0]
+        x2 = x1 + sizes[:, 1]
+        cx1 = np.clip(x1, 0, width)
+        cy1 = np.clip(y1, 0, height)
+        cx2 = np.clip(x2, 0, width)
+        cy2 = np.clip(y2, 0, height)
+        sx1 = cx1 - x1
+        sy1 = cy1 - y1
+        visible = np.flatnonzero((cx2 > cx1) & (cy2 > cy1))
+
+        color_view = image[:, :, :3]
+        for i in visible.tolist():
+            sprite = sprites[i]
+            h = cy2[i] - cy1[i]
+            w = cx2[i] - cx1[i]
+            color_view[cy1[i] : cy2[i], cx1[i] : cx2[i]] = sprite[sy1[i] : sy1[i] + h, sx1[i] : sx1[i] + w]
+            if image.shape[2] == 4:
+                image[cy1[i] : cy2[i], cx1[i] : cx2[i], 3] = 255
+        return image
+
+
+@lru_cache(maxsize=32)
+def get_index_atlas(font_scale: float) -> LabelAtlas:
+    atlas = LabelAtlas(font_scale, INDEX_LABEL_STYLE)
+    return atlas.preload(str(index) for index in range(MESH_POINT_COUNT))
+
+
+@lru_cache(maxsize=32)
+def get_label_atlas(font_scale: float) -> LabelAtlas:
+    return LabelAtlas(font_scale, LANDMARK_LABEL_STYLE)
+
+
+def _font_scale(width: int, low: float, high: float, divisor: float) -> float:
+    # Rounded so that the atlas cache only ever holds a handful of scales.
+    return round(max(low, min(high, width / divisor)), 2)
+
+
+def _color(image_bgr: np.ndarray, color: Tuple[int, int, int]) -> Tuple[int, ...]:
+    if image_bgr.shape[2] == 4:
+        return (*color, 255)
+    return color
+
+
+def draw_landmarks(image_bgr: np.ndarray, points: Dict[str, Dict]) -> np.ndarray:
+    width = image_bgr.shape[1]
+    atlas = cached_call("label_atlas", get_label_atlas, _font_scale(width, 0.4, 0.7, 1200.0))
+    point_color = _color(image_bgr, (0, 255, 255))
+
+    labels = list(points.keys())
+    anchors = np.array(
+        [(int(data["pixel"]["x"]), int(data["pixel"]["y"])) for data in points.values()],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    for px, py in anchors.tolist():
+        cv2.circle(image_bgr, (px, py), 3, point_color, -1)
+
+    return atlas.blit(image_bgr, labels, anchors)
 
 
 def draw_all_landmarks(image_bgr: np.ndarray, landmarks: List) -> np.ndarray:
     height, width = image_bgr.shape[:2]
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = max(0.35, min(0.55, width / 1400.0))
-    thickness = 1
-
-    for index, lm in enumerate(landmarks):
-        px = int(lm.x * width)
-        py = int(lm.y * height)
-
-        cv2.circle(image_bgr, (px, py), 1, (0, 255, 0), -1)
-        text = str(index)
-        (tw, th), baseline = cv2.getTextSize(text, font, font_scale, thickness)
-        x1 = px + 2
-        y1 = py - 2 - th - baseline
-        x2 = x1 + tw + 2
-        y2 = py - 2
-
-        x1 = max(0, min(width - 1, x1))
-        y1 = max(0, min(height - 1, y1))
-        x2 = max(0, min(width - 1, x2))
-        y2 = max(0, min(height - 1, y2))
-
-        cv2.rectangle(image_bgr, (x1, y1), (x2, y2), (0, 0, 0), -1)
-        cv2.putText(
-            image_bgr,
-            text,
-            (x1 + 1, y2 - 2),
-            font,
-            font_scale,
-            (255, 255, 255),
-            thickness,
-            cv2.LINE_AA,
-        )
+    atlas = cached_call("index_atlas", get_index_atlas, _font_scale(width, 0.35, 0.55, 1400.0))
+    point_color = _color(image_bgr, (0, 255, 0))
+
+    coords = np.array([(lm.x, lm.y) for lm in landmarks], dtype=np.float64).reshape(-1, 2)
+    anchors = (coords * (width, height)).astype(np.int64)
+    for px, py in anchors.tolist():
+        cv2.circle(image_bgr, (px, py), 1, point_color, -1)
+
+    return atlas.blit(image_bgr, [str(index) for index in range(len(anchors))], anchors)
+
 
+def overlay_layer(width: int, height: int) -> np.ndarray:
+    return np.zeros((height, width, 4), dtype=np.uint8)
+
+
+def draw_midline(image_bgr: np.ndarray, x: int) -> np.ndarray:
+    height = image_bgr.shape[0]
+    cv2.line(image_bgr, (x, 0), (x, height - 1), _color(image_bgr, (255, 255, 0)), 1)
     return image_bgr
+
+
+def _svg_color(bgr: Tuple[int, int, int]) -> str:
+    b, g, r = bgr
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _svg_text(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render_svg(
+    width: int,
+    height: int,
+    points: Dict[str, Dict] | None = None,
+    landmarks: List | None = None,
+    midline_x: float | None = None,
+) -> str:
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif">'
+    ]
+    if midline_x is not None:
+        parts.append(
+            f'<line x1="{midline_x:.1f}" y1="0" x2="{midline_x:.1f}" y2="{height}" '
+            f'stroke="{_svg_color((255, 255, 0))}" stroke-width="1"/>'
+        )
+    if landmarks:
+        font_px = round(_font_scale(width, 0.35, 0.55, 1400.0) * 30, 1)
+        dots = []
+        labels = []
+        for index, lm in enumerate(landmarks):
+            px = lm.x * width
+            py = lm.y * height
+            dots.append(f'<circle cx="{px:.1f}" cy="{py:.1f}" r="1"/>')
+            labels.append(f'<text x="{px + 3:.1f}" y="{py - 4:.1f}">{index}</text>')
+        parts.append(f'<g fill="{_svg_color((0, 255, 0))}">{"".join(dots)}</g>')
+        parts.append(
+            f'<g fill="#ffffff" stroke="#000000" stroke-width="3" paint-order="stroke" '
+            f'font-size="{font_px}">{"".join(labels)}</g>'
+        )
+    if points:
+        font_px = round(_font_scale(width, 0.4, 0.7, 1200.0) * 30, 1)
+        dots = []
+        labels = []
+        for label, data in points.items():
+            px = data["pixel"]["x"]
+            py = data["pixel"]["y"]
+            dots.append(f'<circle cx="{px:.1f}" cy="{py:.1f}" r="3"/>')
+            labels.append(f'<text x="{px + 8:.1f}" y="{py - 5:.1f}">{_svg_text(label)}</text>')
+        parts.append(f'<g fill="{_svg_color((0, 255, 255))}">{"".join(dots)}</g>')
+        parts.append(
+            f'<g fill="#ffffff" stroke="#000000" stroke-width="4" paint-order="stroke" '
+            f'font-size="{font_px}">{"".join(labels)}</g>'
+        )
+    parts.append("</svg>")
+    return "".join(parts)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import socket
+import struct
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from app.config import get_settings
+
+MAGIC = b"FSEG"
+VERSION = 1
+# magic, version, input size, model name length; followed by the ascii name and size*size*3 uint8 pixels (RGB, or
+# BGR for fused-input models).
+REQUEST = struct.Struct("<4sBHB")
+# magic, version, status, payload length; followed by size*size uint8 class ids or a utf-8 error message.
+RESPONSE = struct.Struct("<4sBBI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+CONNECT_TIMEOUT_S = 0.5
+REQUEST_TIMEOUT_S = 30.0
+# After a failed call the daemon is skipped for a while instead of paying a connect timeout on every request.
+RETRY_AFTER_S = 5.0
+
+
+class ParsingServerError(RuntimeError):
+    pass
+
+
+class ParsingTimeoutError(ParsingServerError):
+    pass
+
+
+def recv_into_exact(sock: socket.socket, view: memoryview) -> None:
+    while len(view):
+        received = sock.recv_into(view)
+        if not received:
+            raise ConnectionError("Connection closed mid-message")
+        view = view[received:]
+
+
+class ParsingClient:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT_S)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(REQUEST_TIMEOUT_S)
+        return sock
+
+    def _drop(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _roundtrip(self, sock: socket.socket, header: bytes, pixels: np.ndarray) -> np.ndarray:
+        sock.sendall(header)
+        sock.sendall(pixels)
+        reply = bytearray(RESPONSE.size)
+        recv_into_exact(sock, memoryview(reply))
+        magic, version, status, length = RESPONSE.unpack(reply)
+        if magic != MAGIC or version != VERSION:
+            raise ConnectionError("Unexpected reply from parsing server")
+        payload = np.empty(length, dtype=np.uint8)
+        recv_into_exact(sock, memoryview(payload))
+        if status != STATUS_OK:
+            raise ParsingServerError(payload.tobytes().decode("utf-8", "replace"))
+        return payload
+
+    def _call(self, header: bytes, pixels: np.ndarray) -> np.ndarray:
+        if getattr(self._local, "sock", None) is None:
+            self._local.sock = self._socket()
+        try:
+            return self._roundtrip(self._local.sock, header, pixels)
+        except OSError:
+            self._drop()
+            raise
+
+    def predict(self, pixels: np.ndarray, model: str) -> np.ndarray:
+        # Raises OSError when the daemon cannot be reached (callers fall back), ParsingTimeoutError when it is up but
+        # too slow to answer and ParsingServerError when it answered with a failure of its own.
+        size = pixels.shape[0]
+        name = model.encode("ascii")
+        header = REQUEST.pack(MAGIC, VERSION, size, len(name)) + name
+        pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+
+        reused = getattr(self._local, "sock", None) is not None
+        try:
+            try:
+                payload = self._call(header, pixels)
+            except ConnectionError:
+                if not reused:
+                    raise
+                # Each thread keeps its connection open; the daemon may have restarted since.
+                payload = self._call(header, pixels)
+        except socket.timeout as exc:
+            # An overloaded daemon is not a dead one: retrying or loading the model in every worker would only add to
+            # the load, so the caller goes without segmentation for this request.
+            raise ParsingTimeoutError(f"No reply from the parsing server within {REQUEST_TIMEOUT_S:g} s") from exc
+        except OSError:
+            self._down_until = time.monotonic() + RETRY_AFTER_S
+            raise
+        return payload.reshape(size, size)
+
+
+_CLIENT: Optional[ParsingClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def parsing_client() -> Optional[ParsingClient]:
+    global _CLIENT
+    path = get_settings().parsing_socket
+    if path is None:
+        return None
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT.path != path:
+            _CLIENT = ParsingClient(path)
+    return _CLIENT
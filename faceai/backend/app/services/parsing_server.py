@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.hairline import _infer, _input_tensor, _load_model, preload_models
+from app.services.model_registry import VARIANTS, validate_settings
+from app.services.parsing_client import (
+    MAGIC,
+    REQUEST,
+    RESPONSE,
+    STATUS_ERROR,
+    STATUS_OK,
+    VERSION,
+    recv_into_exact,
+)
+from app.utils.concurrency import configure_threads
+from app.utils.metrics import (
+    PARSING_SERVER_BATCH_SIZE,
+    PARSING_SERVER_QUEUE_DEPTH,
+    PARSING_SERVER_REQUESTS,
+    PARSING_SERVER_WAIT_SECONDS,
+)
+
+logger = logging.getLogger("faceai.parsing_server")
+
+DEFAULT_SOCKET = "/tmp/faceai-parsing.sock"
+# Inputs are never larger than the largest model input, so a bigger header size is a bad or hostile request.
+MAX_INPUT_SIZE = max(variant.input_size for variant in VARIANTS.values())
+
+# (model name, (N, size, size, 3) uint8 in the model's channel order) -> (N, size, size) uint8 class ids.
+BatchInfer = Callable[[str, np.ndarray], np.ndarray]
+
+
+def _run_batch(model: str, pixels: np.ndarray) -> np.ndarray:
+    entry = _load_model(model)
+    return _infer(entry, _input_tensor(entry.variant, pixels))
+
+
+@dataclass
+class _Job:
+    model: str
+    pixels: np.ndarray
+    queued: float = field(default_factory=time.perf_counter)
+    done: threading.Event = field(default_factory=threading.Event)
+    mask: Optional[np.ndarray] = None
+    error: Optional[str] = None
+
+
+class Batcher:
+    # One inference thread: requests from every API worker queue here and run together when they share a model
+    # and input size.
+    def __init__(self, max_batch: int, max_wait_ms: int, infer: BatchInfer = _run_batch) -> None:
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.infer = infer
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="parsing-batcher", daemon=True)
+
+    def start(self) -> "Batcher":
+        self._thread.start()
+        return self
+
+    def submit(self, model: str, pixels: np.ndarray) -> _Job:
+        job = _Job(model, pixels)
+        PARSING_SERVER_QUEUE_DEPTH.inc()
+        self._queue.put(job)
+        job.done.wait()
+        return job
+
+    def _collect(self) -> List[_Job]:
+        jobs = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(jobs) < self.max_batch:
+            try:
+                jobs.append(self._queue.get(timeout=max(0.0, deadline - time.perf_counter())))
+            except queue.Empty:
+                break
+        PARSING_SERVER_QUEUE_DEPTH.dec(len(jobs))
+        return jobs
+
+    def _run(self) -> None:
+        while True:
+            groups: Dict[Tuple[str, int], List[_Job]] = {}
+            for job in self._collect():
+                groups.setdefault((job.model, job.pixels.shape[0]), []).append(job)
+            for (model, _), jobs in groups.items():
+                self._run_group(model, jobs)
+
+    def _run_group(self, model: str, jobs: List[_Job]) -> None:
+        started = time.perf_counter()
+        for job in jobs:
+            PARSING_SERVER_WAIT_SECONDS.observe(started - job.queued)
+        try:
+            masks = self.infer(model, np.stack([job.pixels for job in jobs]))
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Parsing batch failed for %s", model)
+            for job in jobs:
+                job.error = f"{type(exc).__name__}: {exc}"
+                job.done.set()
+            PARSING_SERVER_REQUESTS.labels("error").inc(len(jobs))
+            return
+        PARSING_SERVER_BATCH_SIZE.observe(len(jobs))
+        PARSING_SERVER_REQUESTS.labels("ok").inc(len(jobs))
+        for job, mask in zip(jobs, masks):
+            job.mask = np.ascontiguousarray(mask, dtype=np.uint8)
+            job.done.set()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        sock = self.request
+        header = bytearray(REQUEST.size)
+        # Connections are persistent: one request after another until the client hangs up.
+        while True:
+            try:
+                recv_into_exact(sock, memoryview(header))
+            except ConnectionError:
+                return
+            magic, version, size, name_length = REQUEST.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                logger.warning("Dropping connection with an unknown protocol header")
+                return
+            if not 0 < size <= MAX_INPUT_SIZE:
+                # The pixels are left unread, so the connection cannot be reused after the error.
+                logger.warning("Dropping connection asking for a %dpx input (limit %dpx)", size, MAX_INPUT_SIZE)
+                message = f"Input size {size} is outside 1..{MAX_INPUT_SIZE}".encode("utf-8")
+                sock.sendall(RESPONSE.pack(MAGIC, VERSION, STATUS_ERROR, len(message)) + message)
+                return
+            name = bytearray(name_length)
+            recv_into_exact(sock, memoryview(name))
+            pixels = np.empty(size * size * 3, dtype=np.uint8)
+            recv_into_exact(sock, memoryview(pixels))
+
+            model = name.decode("ascii", errors="replace")
+            if model not in VARIANTS:
+                # The whole request was read, so the connection stays usable after the error.
+                logger.warning("Rejecting a request for unknown model %r", model)
+                PARSING_SERVER_REQUESTS.labels("invalid").inc()
+                message = f"Unknown parsing model {model!r}".encode("utf-8")
+                sock.sendall(RESPONSE.pack(MAGIC, VERSION, STATUS_ERROR, len(message)) + message)
+                continue
+
+            job = self.server.batcher.submit(model, pixels.reshape(size, size, 3))
+            if job.error is not None:
+                message = job.error.encode("utf-8")
+                sock.sendall(RESPONSE.pack(MAGIC, VERSION, STATUS_ERROR, len(message)) + message)
+            else:
+                sock.sendall(RESPONSE.pack(MAGIC, VERSION, STATUS_OK, job.mask.size))
+                sock.sendall(job.mask)
+
+
+class ParsingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, batcher: Batcher) -> None:
+        if os.path.exists(path):
+            os.unlink(path)
+        self.batcher = batcher
+        super().__init__(path, _Handler)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    validate_settings(settings)
+    parser = argparse.ArgumentParser(description="Shared hair segmentation server for FaceAI API workers.")
+    parser.add_argument("--socket", default=settings.parsing_socket or DEFAULT_SOCKET)
+    parser.add_argument("--batch-size", type=int, default=settings.parsing_batch_size)
+    parser.add_argument("--batch-wait-ms", type=int, default=settings.parsing_batch_wait_ms)
+    parser.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus metrics on this port (0 = off)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # The only model owner on the host, so it gets the whole core budget.
+    plan = configure_threads(replace(settings, workers=1, max_concurrency=1))
+    logger.info("Thread plan: %s", plan.describe())
+    logger.info("Preloaded models: %s", ", ".join(preload_models()) or "none")
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(args.metrics_port)
+
+    batcher = Batcher(max(1, args.batch_size), max(0, args.batch_wait_ms)).start()
+    with ParsingServer(args.socket, batcher) as server:
+        logger.info("Listening on %s (batch size %d, wait %d ms)", args.socket, batcher.max_batch, args.batch_wait_ms)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Tr is the top edge of the skin region: the topmost class-1 (skin) row on the midline is where the hairline starts.
+SKIN_CLASS_ID = 1
+
+# CelebAMask-HQ labels in the upstream face-parsing order.
+CLASS_NAMES = [
+    "background",
+    "skin",
+    "l_brow",
+    "r_brow",
+    "l_eye",
+    "r_eye",
+    "eye_g",
+    "l_ear",
+    "r_ear",
+    "ear_r",
+    "nose",
+    "mouth",
+    "u_lip",
+    "l_lip",
+    "neck",
+    "neck_l",
+    "cloth",
+    "hair",
+    "hat",
+]
+
+COLOR_LIST = [
+    [0, 0, 0],
+    [255, 85, 0],
+    [255, 170, 0],
+    [255, 0, 85],
+    [255, 0, 170],
+    [0, 255, 0],
+    [85, 255, 0],
+    [170, 255, 0],
+    [0, 255, 85],
+    [0, 255, 170],
+    [0, 0, 255],
+    [85, 0, 255],
+    [170, 0, 255],
+    [0, 85, 255],
+    [0, 170, 255],
+    [255, 255, 0],
+    [255, 255, 85],
+    [255, 255, 170],
+    [255, 0, 255],
+]
+
+# Indexed by class id; ids outside COLOR_LIST map to black.
+COLOR_LUT = np.zeros((256, 3), dtype=np.uint8)
+COLOR_LUT[: len(COLOR_LIST)] = COLOR_LIST
+COLOR_LUT.flags.writeable = False
+
+
+def colorize_mask(mask: np.ndarray) -> np.ndarray:
+    return np.take(COLOR_LUT, mask.astype(np.uint8, copy=False), axis=0)
+
+
+def blend_mask(image_bgr: np.ndarray, color_mask: np.ndarray, alpha: float = 0.4) -> np.ndarray:
+    # Stays in uint8 throughout; no float copies of the image or mask.
+    return cv2.addWeighted(image_bgr, 1.0 - alpha, color_mask, alpha, 0)
+
+
+@lru_cache(maxsize=1)
+def legend_image() -> np.ndarray:
+    row_h = 26
+    width = 260
+    height = row_h * len(CLASS_NAMES) + 10
+    legend = np.full((height, width, 3), 18, dtype=np.uint8)
+    for idx, name in enumerate(CLASS_NAMES):
+        y = 5 + idx * row_h
+        color = tuple(int(v) for v in COLOR_LUT[idx])
+        cv2.rectangle(legend, (8, y + 4), (32, y + 20), color, -1)
+        cv2.putText(legend, f"{idx} {name}", (42, y + 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (220, 220, 220), 1, cv2.LINE_AA)
+    legend.flags.writeable = False
+    return legend
+
+
+@lru_cache(maxsize=1)
+def legend_png_bytes() -> bytes:
+    success, buffer = cv2.imencode(".png", legend_image())
+    if not success:
+        raise ValueError("Unable to encode legend image")
+    return buffer.tobytes()
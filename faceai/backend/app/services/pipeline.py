@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils.cancellation import checkpoint
+from app.utils.profiler import profiled_thread
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Any]
+    deps: Tuple[str, ...]
+
+
+class StageGraph:
+    # Each stage receives its dependencies' results as positional arguments, in the order they were declared.
+    def __init__(self) -> None:
+        self._stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[..., Any], *deps: str) -> None:
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dep}")
+        self._stages[name] = Stage(name, func, deps)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stages
+
+    def run(self, executor: Optional[Executor] = None) -> Dict[str, Any]:
+        if executor is None:
+            return self._run_inline()
+
+        results: Dict[str, Any] = {}
+        pending: Dict[str, Stage] = dict(self._stages)
+        running: Dict[Future, str] = {}
+        errors: Dict[str, BaseException] = {}
+
+        def submit_ready() -> None:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    del pending[name]
+                    args = [results[dep] for dep in stage.deps]
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, _call, name, stage.func, args)] = name
+
+        submit_ready()
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                exc = future.exception()
+                if exc is not None:
+                    errors[name] = exc
+                else:
+                    results[name] = future.result()
+            if errors:
+                # Let stages already on the pool finish, start nothing new.
+                pending.clear()
+                continue
+            submit_ready()
+
+        if errors:
+            # Deterministic: report the failure of the earliest declared stage.
+            first = next(name for name in self._stages if name in errors)
+            raise errors[first]
+        return results
+
+    def _run_inline(self) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        for stage in self._stages.values():
+            checkpoint(stage.name)
+            results[stage.name] = stage.func(*[results[dep] for dep in stage.deps])
+        return results
+
+
+def _call(name: str, func: Callable[..., Any], args: List[Any]) -> Any:
+    # Stages are never interrupted midway; a cancelled or late request just stops starting new ones.
+    checkpoint(name)
+    with profiled_thread():
+        return func(*args)
+
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from app.services.measurements import RATIO_DEFS, _load_catalog
+from app.utils.landmarks_map import load_landmark_map
+
+ARTIFACTS = ("front", "side", "front_all", "side_all", "tr_debug")
+TRICHION_LABELS = ("Tr_R", "Tr_L")
+# Filled in from neighbouring mesh points even when the map has no index for them.
+DERIVED_LABELS = ("Prn", "Sto")
+
+
+@dataclass(frozen=True)
+class AnalysisPlan:
+    # None means the whole catalog / every ratio.
+    measurement_ids: Optional[Tuple[str, ...]]
+    ratio_ids: Optional[Tuple[str, ...]]
+    artifacts: FrozenSet[str]
+    front: bool
+    side: bool
+    trichion: bool
+
+
+FULL_PLAN = AnalysisPlan(None, None, frozenset(ARTIFACTS), front=True, side=True, trichion=True)
+
+
+def _check_known(kind: str, requested: Iterable[str], known: Iterable[str]) -> None:
+    unknown = sorted(set(requested) - set(known))
+    if unknown:
+        raise ValueError(f"Unknown {kind}: {', '.join(unknown)}")
+
+
+def _resolvable(label: str, mapping: Dict[str, Optional[int]]) -> bool:
+    return mapping.get(label) is not None or label in DERIVED_LABELS or label in TRICHION_LABELS
+
+
+def plan_analysis(
+    measurement_ids: Optional[List[str]] = None,
+    ratio_ids: Optional[List[str]] = None,
+    artifacts: Optional[List[str]] = None,
+) -> AnalysisPlan:
+    if measurement_ids is None and ratio_ids is None and artifacts is None:
+        return FULL_PLAN
+
+    catalog = {entry["id"]: entry for entry in _load_catalog()}
+    ratios = {entry["id"]: entry for entry in RATIO_DEFS}
+    _check_known("measurements", measurement_ids or (), catalog)
+    _check_known("ratios", ratio_ids or (), ratios)
+    _check_known("artifacts", artifacts or (), ARTIFACTS)
+
+    needed: List[str] = list(measurement_ids or ())
+    for ratio_id in ratio_ids or ():
+        needed.extend((ratios[ratio_id]["numerator"], ratios[ratio_id]["denominator"]))
+    needed = list(dict.fromkeys(needed))
+    wanted = frozenset(artifacts or ())
+
+    # A measurement only pulls in its view (and Tr) when both of its points can actually be located.
+    mapping = load_landmark_map()
+    front = bool(wanted & {"front", "front_all", "tr_debug"})
+    side = bool(wanted & {"side", "side_all"})
+    trichion = bool(wanted & {"front", "tr_debug"})
+    for measurement_id in needed:
+        entry = catalog[measurement_id]
+        if not all(_resolvable(label, mapping) for label in entry["points"]):
+            continue
+        if entry["image"] == "front":
+            front = True
+            trichion = trichion or any(label in TRICHION_LABELS for label in entry["points"])
+        else:
+            side = True
+
+    return AnalysisPlan(
+        measurement_ids=tuple(needed),
+        ratio_ids=tuple(ratio_ids or ()),
+        artifacts=wanted,
+        front=front,
+        side=side,
+        trichion=trichion and front,
+    )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+# FaceMesh indices used for a coarse head pose estimate.
+CHEEK_RIGHT = 234
+CHEEK_LEFT = 454
+FOREHEAD = 10
+CHIN = 152
+EYE_OUTER_RIGHT = 33
+EYE_OUTER_LEFT = 263
+
+
+@dataclass
+class HeadPose:
+    yaw: float
+    pitch: float
+    roll: float
+
+
+def estimate_head_pose(coords: np.ndarray, width: int, height: int) -> HeadPose:
+    # coords are normalized FaceMesh points (N, 3); z shares the x scale.
+    points = coords.astype(np.float64) * (width, height, width)
+
+    cheek_r = points[CHEEK_RIGHT]
+    cheek_l = points[CHEEK_LEFT]
+    yaw = np.degrees(np.arctan2(cheek_l[2] - cheek_r[2], cheek_l[0] - cheek_r[0]))
+
+    top = points[FOREHEAD]
+    chin = points[CHIN]
+    pitch = np.degrees(np.arctan2(chin[2] - top[2], chin[1] - top[1]))
+
+    eye_r = points[EYE_OUTER_RIGHT]
+    eye_l = points[EYE_OUTER_LEFT]
+    roll = np.degrees(np.arctan2(eye_l[1] - eye_r[1], eye_l[0] - eye_r[0]))
+
+    return HeadPose(yaw=float(yaw), pitch=float(pitch), roll=float(roll))
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from app.services.pose import HeadPose, estimate_head_pose
+
+PREFLIGHT_VIEWS = ("front", "side")
+THUMBNAIL_SIZE = 128
+MIN_SHARPNESS = 0.3
+MIN_BRIGHTNESS = 50.0
+MAX_BRIGHTNESS = 215.0
+# Share of face pixels at pure black or pure white.
+MAX_CLIPPED = 0.25
+MIN_FACE_PX = 160
+FRONT_MAX_YAW = 20.0
+SIDE_MIN_YAW = 30.0
+MAX_PITCH = 30.0
+MAX_ROLL = 15.0
+
+
+class PreflightError(ValueError):
+    pass
+
+
+@dataclass
+class PreflightCheck:
+    name: str
+    passed: bool
+    value: Optional[float]
+    message: str = ""
+
+
+@dataclass
+class PreflightReport:
+    view: str
+    checks: List[PreflightCheck] = field(default_factory=list)
+    pose: Optional[HeadPose] = None
+
+    @property
+    def passed(self) -> bool:
+        return all(check.passed for check in self.checks)
+
+    def failures(self) -> List[PreflightCheck]:
+        return [check for check in self.checks if not check.passed]
+
+    def warnings(self) -> List[str]:
+        return [check.message for check in self.failures()]
+
+
+def face_thumbnail(image: np.ndarray, coords: np.ndarray) -> Optional[np.ndarray]:
+    # Grayscale face crop, at most THUMBNAIL_SIZE on its longest side.
+    height, width = image.shape[:2]
+    min_x, min_y = np.clip(coords[:, :2].min(axis=0), 0.0, 1.0)
+    max_x, max_y = np.clip(coords[:, :2].max(axis=0), 0.0, 1.0)
+    x1, x2 = int(min_x * width), int(max_x * width)
+    y1, y2 = int(min_y * height), int(max_y * height)
+    if x2 - x1 < 8 or y2 - y1 < 8:
+        return None
+    crop = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    scale = float(THUMBNAIL_SIZE) / max(crop.shape)
+    if scale < 1.0:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return crop
+
+
+def face_sharpness(thumbnail: np.ndarray) -> float:
+    variance = float(cv2.Laplacian(thumbnail, cv2.CV_64F).var())
+    return variance / (variance + 100.0)
+
+
+def _pose_check(view: str, pose: HeadPose) -> PreflightCheck:
+    label = view.capitalize()
+    if view == "side":
+        passed = abs(pose.yaw) >= SIDE_MIN_YAW
+        message = f"{label} image is not a profile (yaw {pose.yaw:.0f}°, needs at least {SIDE_MIN_YAW:.0f}°)."
+    else:
+        passed = abs(pose.yaw) <= FRONT_MAX_YAW and abs(pose.pitch) <= MAX_PITCH and abs(pose.roll) <= MAX_ROLL
+        message = (
+            f"{label} image head pose is too far from frontal "
+            f"(yaw {pose.yaw:.0f}°, pitch {pose.pitch:.0f}°, roll {pose.roll:.0f}°)."
+        )
+    return PreflightCheck("pose", passed, round(pose.yaw, 2), "" if passed else message)
+
+
+def assess(image: np.ndarray, coords: Optional[np.ndarray], view: str = "front") -> PreflightReport:
+    label = view.capitalize()
+    report = PreflightReport(view)
+    if coords is None:
+        report.checks.append(PreflightCheck("face", False, None, f"No face detected in {view} image."))
+        return report
+    report.checks.append(PreflightCheck("face", True, None))
+
+    height, width = image.shape[:2]
+    face_px = float(np.ptp(np.clip(coords[:, 1], 0.0, 1.0)) * height)
+    passed = face_px >= MIN_FACE_PX
+    message = f"{label} face is too small ({face_px:.0f}px tall, minimum {MIN_FACE_PX}px)."
+    report.checks.append(PreflightCheck("face_size", passed, round(face_px, 1), "" if passed else message))
+
+    thumbnail = face_thumbnail(image, coords)
+    if thumbnail is not None:
+        sharpness = face_sharpness(thumbnail)
+        passed = sharpness >= MIN_SHARPNESS
+        message = f"{label} image looks blurred (sharpness {sharpness:.2f}, minimum {MIN_SHARPNESS:.2f})."
+        report.checks.append(PreflightCheck("sharpness", passed, round(sharpness, 3), "" if passed else message))
+
+        brightness = float(thumbnail.mean())
+        clipped = float(np.count_nonzero((thumbnail <= 5) | (thumbnail >= 250))) / thumbnail.size
+        passed = MIN_BRIGHTNESS <= brightness <= MAX_BRIGHTNESS and clipped <= MAX_CLIPPED
+        if brightness < MIN_BRIGHTNESS:
+            message = f"{label} face is too dark (brightness {brightness:.0f})."
+        elif brightness > MAX_BRIGHTNESS:
+            message = f"{label} face is over-exposed (brightness {brightness:.0f})."
+        else:
+            message = f"{label} face lighting is too harsh ({clipped:.0%} of pixels clipped)."
+        report.checks.append(PreflightCheck("exposure", passed, round(brightness, 1), "" if passed else message))
+
+    report.pose = estimate_head_pose(coords, width, height)
+    report.checks.append(_pose_check(view, report.pose))
+    return report
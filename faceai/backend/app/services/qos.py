@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from app.config import Settings, get_settings
+from app.utils.concurrency import queue_depth
+from app.utils.metrics import DEGRADED_REQUESTS, annotate
+
+LEVEL_NAMES = (
+    "full",
+    "no_debug_images",
+    "no_mesh_renders",
+    "low_res_parsing",
+    "light_parsing",
+    "measurements_only",
+)
+EWMA_ALPHA = 0.2
+
+
+@dataclass(frozen=True)
+class Degradation:
+    level: int = 0
+    skip_debug_images: bool = False
+    skip_mesh_renders: bool = False
+    # None keeps the model's own input size / the model picked for the request.
+    parsing_size: Optional[int] = None
+    parsing_model: Optional[str] = None
+    measurements_only: bool = False
+
+    @property
+    def name(self) -> str:
+        return LEVEL_NAMES[self.level]
+
+    def warnings(self) -> List[str]:
+        notes: List[str] = []
+        if self.measurements_only:
+            return ["Reduced response under load: images and hair segmentation skipped, measurements only."]
+        if self.skip_debug_images:
+            notes.append("Reduced response under load: hairline debug images (tr_*) skipped.")
+        if self.skip_mesh_renders:
+            notes.append("Reduced response under load: full-mesh renders (front_all, side_all) skipped.")
+        if self.parsing_size is not None:
+            notes.append(f"Reduced response under load: hair segmentation ran at {self.parsing_size}px.")
+        if self.parsing_model is not None:
+            notes.append(f"Reduced response under load: hair segmentation used the {self.parsing_model} model.")
+        return notes
+
+
+FULL_QUALITY = Degradation()
+
+
+def degradation_for(level: int, settings: Optional[Settings] = None) -> Degradation:
+    # Levels are cumulative: each one keeps every cut made by the levels below it.
+    settings = settings or get_settings()
+    level = max(0, min(level, len(LEVEL_NAMES) - 1))
+    return Degradation(
+        level=level,
+        skip_debug_images=level >= 1,
+        skip_mesh_renders=level >= 2,
+        parsing_size=settings.qos_parsing_size if level >= 3 else None,
+        parsing_model=settings.qos_parsing_model if level >= 4 else None,
+        measurements_only=level >= 5,
+    )
+
+
+def _level_from_steps(value: float, steps: Sequence[int]) -> int:
+    return sum(1 for step in steps if value >= step)
+
+
+class QosPolicy:
+    def __init__(self, alpha: float = EWMA_ALPHA) -> None:
+        self.alpha = alpha
+        self.latency_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms: float) -> None:
+        with self._lock:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += self.alpha * (latency_ms - self.latency_ms)
+
+    def level(self, waiting: int, settings: Optional[Settings] = None) -> int:
+        settings = settings or get_settings()
+        by_queue = _level_from_steps(waiting, settings.qos_queue_steps)
+        by_latency = _level_from_steps(self.latency_ms or 0.0, settings.qos_latency_steps_ms)
+        return min(max(by_queue, by_latency), settings.qos_max_level)
+
+
+POLICY = QosPolicy()
+
+
+def select_degradation() -> Degradation:
+    level = POLICY.level(queue_depth())
+    if level:
+        degradation = degradation_for(level)
+        annotate("qos_level", degradation.name)
+        DEGRADED_REQUESTS.labels(degradation.name).inc()
+        return degradation
+    return FULL_QUALITY
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import get_settings
+from app.models.schemas import (
+    LandmarkOut,
+    LandmarksResponse,
+    ParseResponse,
+    Point2D,
+    Point3D,
+    PreflightCheckOut,
+    PreflightResponse,
+    TrichionResponse,
+)
+from app.services.compact import landmark_table, mesh_out, rle_encode
+from app.services.facemesh import (
+    DecodedImage,
+    NoFaceError,
+    ViewPoints,
+    _decode,
+    _landmarks_array,
+    _locate_face,
+    _mandatory_landmarks,
+    _predict_parsing,
+    _strip_estimate,
+    _tiered_parsing,
+    _tiered_trichion,
+)
+from app.services.hairline import FALLBACK_WARNINGS, _predict_mask, _resize_mask
+from app.services.hairline_strip import NO_ESTIMATE
+from app.services.parsing_vis import CLASS_NAMES
+from app.services.pipeline import StageGraph
+from app.services.preflight import PREFLIGHT_VIEWS, assess
+from app.services.qos import FULL_QUALITY
+from app.utils.concurrency import stage_executor
+from app.utils.image_io import to_base64_png
+from app.utils.landmarks_map import load_landmark_map
+from app.utils.metrics import annotate, stage
+
+MASK_ENCODINGS = ("rle", "png")
+
+
+class ParsingUnavailableError(RuntimeError):
+    pass
+
+
+def _face(decoded: DecodedImage) -> ViewPoints:
+    view = _locate_face("image", decoded)
+    if view.selection is None:
+        raise NoFaceError("No face detected in image")
+    return view
+
+
+def _face_warnings(view: ViewPoints) -> List[str]:
+    if len(view.faces) > 1:
+        return ["Multiple faces detected; selected the most central/largest face."]
+    return []
+
+
+def landmarks_for_image(image_bytes: bytes) -> LandmarksResponse:
+    decoded = _decode(image_bytes)
+    annotate("image_size", f"{decoded.width}x{decoded.height}")
+    view = _face(decoded)
+    return LandmarksResponse.model_construct(
+        ok=True,
+        width=decoded.width,
+        height=decoded.height,
+        faces=len(view.faces),
+        landmarks=landmark_table(_mandatory_landmarks(load_landmark_map(), view.points, {})),
+        mesh=mesh_out(_landmarks_array(view.selection.landmarks), decoded.width, decoded.height),
+        warnings=_face_warnings(view),
+    )
+
+
+def parse_image(image_bytes: bytes, encoding: str = "rle", model: Optional[str] = None) -> ParseResponse:
+    if encoding not in MASK_ENCODINGS:
+        raise ValueError(f"encoding must be one of: {', '.join(MASK_ENCODINGS)}")
+    decoded = _decode(image_bytes)
+    annotate("image_size", f"{decoded.width}x{decoded.height}")
+    try:
+        parsing = _predict_mask(decoded.image, model=model)
+    except Exception as exc:
+        raise ParsingUnavailableError("Face parsing model is unavailable") from exc
+    mask = np.ascontiguousarray(_resize_mask(parsing, (decoded.width, decoded.height)), dtype=np.uint8)
+
+    return ParseResponse.model_construct(
+        ok=True,
+        width=decoded.width,
+        height=decoded.height,
+        encoding=encoding,
+        classes=list(CLASS_NAMES),
+        rle=rle_encode(mask) if encoding == "rle" else None,
+        png=to_base64_png(mask, "parsing_mask") if encoding == "png" else None,
+    )
+
+
+def trichion_for_image(image_bytes: bytes) -> TrichionResponse:
+    graph = StageGraph()
+    graph.add("decode", lambda: _decode(image_bytes))
+    graph.add("face", _face, "decode")
+    if get_settings().trichion_strip:
+        # Parsing waits for the mesh so the strip tier can skip it.
+        graph.add("strip", _strip_estimate, "decode", "face")
+        graph.add("parsing", lambda decoded, strip: _tiered_parsing(decoded, strip, FULL_QUALITY), "decode", "strip")
+    else:
+        # Meshing and parsing only share the decoded image, so they run side by side.
+        graph.add("strip", lambda: NO_ESTIMATE)
+        graph.add("parsing", lambda decoded: _predict_parsing(decoded, FULL_QUALITY), "decode")
+    graph.add("trichion", _tiered_trichion, "decode", "face", "parsing", "strip")
+    results = graph.run(stage_executor())
+
+    decoded: DecodedImage = results["decode"]
+    annotate("image_size", f"{decoded.width}x{decoded.height}")
+    trichion, method = results["trichion"].point, results["trichion"].method
+    warnings = _face_warnings(results["face"])
+    if method in FALLBACK_WARNINGS:
+        warnings.append(FALLBACK_WARNINGS[method])
+
+    point = None
+    if trichion is not None:
+        point = LandmarkOut.model_construct(
+            label="Tr",
+            index=None,
+            pixel=Point2D.model_construct(**trichion["pixel"]),
+            normalized=Point3D.model_construct(**trichion["normalized"]),
+        )
+    return TrichionResponse.model_construct(
+        ok=True,
+        width=decoded.width,
+        height=decoded.height,
+        method=method,
+        point=point,
+        warnings=warnings,
+    )
+
+
+def preflight_image(image_bytes: bytes, view: str = "front") -> PreflightResponse:
+    if view not in PREFLIGHT_VIEWS:
+        raise ValueError(f"view must be one of: {', '.join(PREFLIGHT_VIEWS)}")
+    decoded = _decode(image_bytes)
+    annotate("image_size", f"{decoded.width}x{decoded.height}")
+    # A missing face is a failed check here, not an error: the UI shows it next to the others.
+    located = _locate_face("image", decoded)
+    coords = _landmarks_array(located.selection.landmarks) if located.selection is not None else None
+    with stage("preflight"):
+        report = assess(decoded.image, coords, view)
+
+    pose = report.pose
+    return PreflightResponse.model_construct(
+        ok=True,
+        passed=report.passed,
+        view=view,
+        width=decoded.width,
+        height=decoded.height,
+        checks=[PreflightCheckOut.model_construct(name=c.name, passed=c.passed, value=c.value) for c in report.checks],
+        yaw=pose.yaw if pose else None,
+        pitch=pose.pitch if pose else None,
+        roll=pose.roll if pose else None,
+        warnings=_face_warnings(located) + report.warnings(),
+    )
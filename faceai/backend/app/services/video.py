@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.config import get_settings
+from app.models.schemas import FrameQualityOut, VideoAnalyzeResponse
+from app.services.facemesh import (
+    _create_face_mesh,
+    _extract_landmarks,
+    _landmarks_array,
+    _mandatory_landmarks,
+    _points_from_map,
+    _tr_from_normalized,
+)
+from app.services.hairline import FALLBACK_WARNINGS, _predict_mask, estimate_trichion, midline_x, trichion_tier
+from app.services.hairline_strip import NO_ESTIMATE, strip_trichion
+from app.services.measurements import compute_measurements, compute_ratios
+from app.services.pose import HeadPose, estimate_head_pose
+from app.services.preflight import face_sharpness, face_thumbnail
+from app.utils.landmarks_map import load_landmark_map
+from app.utils.metrics import TRICHION_TIER
+
+FRAME_BUFFER = 8
+MAX_FRAMES = 600
+FRONT_MAX_YAW = 12.0
+SIDE_MIN_YAW = 55.0
+# Parsing is reused until this many processed frames (after the stride) pass or the face moves by more than
+# PARSING_MAX_SHIFT (normalized units, mean over mesh points).
+PARSING_INTERVAL = 15
+PARSING_MAX_SHIFT = 0.02
+# Frames below this fraction of the best frame's quality are left out of the aggregate.
+AGGREGATE_MIN_QUALITY = 0.5
+
+
+class MeshPoint(NamedTuple):
+    x: float
+    y: float
+    z: float
+
+
+@dataclass
+class _FrameResult:
+    quality: FrameQualityOut
+    coords: Optional[np.ndarray] = None
+    tr: Optional[Tuple[float, float]] = None
+    tr_method: str = "none"
+
+
+def _read_frames(path: str, buffer_size: int, stride: int, max_frames: int) -> Iterator[Tuple[int, float, np.ndarray]]:
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        capture.release()
+        raise ValueError("Unable to decode video")
+
+    frames: queue.Queue = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+    end = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        index = 0
+        emitted = 0
+        try:
+            while emitted < max_frames and capture.grab():
+                if index % stride == 0:
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        break
+                    if not put((index, float(capture.get(cv2.CAP_PROP_POS_MSEC)), frame)):
+                        return
+                    emitted += 1
+                index += 1
+        finally:
+            capture.release()
+            put(end)
+
+    reader = threading.Thread(target=produce, name="video-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = frames.get()
+            if item is end:
+                break
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+
+def _frame_quality(frame: np.ndarray, coords: np.ndarray) -> Tuple[float, float]:
+    min_y = np.clip(coords[:, 1].min(), 0.0, 1.0)
+    max_y = np.clip(coords[:, 1].max(), 0.0, 1.0)
+    face_size = float(max_y - min_y)
+
+    thumbnail = face_thumbnail(frame, coords)
+    if thumbnail is None:
+        return 0.0, face_size
+    return face_sharpness(thumbnail), face_size
+
+
+def _mean_shift(coords: np.ndarray, reference: Optional[np.ndarray]) -> float:
+    if reference is None:
+        return float("inf")
+    return float(np.abs(coords[:, :2] - reference[:, :2]).mean())
+
+
+def _frame_out(index: int, timestamp: float, sharpness: float, face_size: float, pose: Optional[HeadPose]) -> FrameQualityOut:
+    quality = sharpness * min(1.0, face_size / 0.35) if pose is not None else 0.0
+    return FrameQualityOut(
+        index=index,
+        timestamp_ms=timestamp,
+        face=pose is not None,
+        sharpness=round(sharpness, 4),
+        face_size=round(face_size, 4),
+        yaw=round(pose.yaw, 2) if pose else None,
+        pitch=round(pose.pitch, 2) if pose else None,
+        roll=round(pose.roll, 2) if pose else None,
+        quality=round(quality, 4),
+    )
+
+
+def _aggregate(frames: List[_FrameResult]) -> Optional[np.ndarray]:
+    if not frames:
+        return None
+    best = max(frame.quality.quality for frame in frames)
+    kept = [frame.coords for frame in frames if frame.quality.quality >= best * AGGREGATE_MIN_QUALITY]
+    return np.median(np.stack(kept), axis=0)
+
+
+def _spread(frames: List[_FrameResult], median: np.ndarray, mapping: Dict[str, Optional[int]], width: int, height: int) -> Dict[str, float]:
+    stack = np.stack([frame.coords[:, :2] for frame in frames]) * (width, height)
+    center = median[:, :2] * (width, height)
+    deviation = np.median(np.linalg.norm(stack - center, axis=2), axis=0)
+    spread: Dict[str, float] = {}
+    for label, index in mapping.items():
+        if index is not None and 0 <= index < len(deviation):
+            spread[label] = round(float(deviation[index]), 3)
+    return spread
+
+
+def analyze_video(
+    path: str,
+    stride: int = 1,
+    max_frames: int = MAX_FRAMES,
+    buffer_size: int = FRAME_BUFFER,
+    parsing_interval: int = PARSING_INTERVAL,
+) -> VideoAnalyzeResponse:
+    settings = get_settings()
+    mapping = load_landmark_map()
+    results: List[_FrameResult] = []
+    width = height = 0
+
+    parsing: Optional[np.ndarray] = None
+    parsing_coords: Optional[np.ndarray] = None
+    parsing_frame = 0
+    parsing_available = True
+
+    with _create_face_mesh(static_image_mode=False, max_num_faces=1) as face_mesh:
+        frames = _read_frames(path, buffer_size, max(1, stride), max_frames)
+        for processed, (index, timestamp, frame) in enumerate(frames):
+            height, width = frame.shape[:2]
+            faces, _ = _extract_landmarks(frame, face_mesh)
+            if not faces:
+                results.append(_FrameResult(_frame_out(index, timestamp, 0.0, 0.0, None)))
+                continue
+
+            landmarks = faces[0].landmark
+            coords = _landmarks_array(landmarks)
+            pose = estimate_head_pose(coords, width, height)
+            sharpness, face_size = _frame_quality(frame, coords)
+            result = _FrameResult(_frame_out(index, timestamp, sharpness, face_size, pose), coords)
+
+            if abs(pose.yaw) <= FRONT_MAX_YAW:
+                points = _points_from_map(landmarks, mapping, width, height)
+                strip = NO_ESTIMATE
+                if settings.trichion_strip:
+                    strip = strip_trichion(frame, landmarks, midline_x(points, width))
+                if strip.point is not None and strip.confidence >= settings.trichion_confidence:
+                    TRICHION_TIER.labels("strip").inc()
+                    trichion, method = strip.point, "strip"
+                else:
+                    stale = (
+                        parsing is None
+                        or processed - parsing_frame >= parsing_interval
+                        or _mean_shift(coords, parsing_coords) > PARSING_MAX_SHIFT
+                    )
+                    if stale and parsing_available:
+                        try:
+                            parsing = _predict_mask(frame)
+                        except Exception:
+                            parsing = None
+                            parsing_available = False
+                        parsing_coords = coords
+                        parsing_frame = processed
+                    trichion, _, method = estimate_trichion(
+                        frame,
+                        points,
+                        landmarks=landmarks,
+                        parsing=parsing,
+                        use_model=False,
+                        parsing_failed=not parsing_available,
+                    )
+                    TRICHION_TIER.labels(trichion_tier(method)).inc()
+                if trichion is not None:
+                    result.tr = (trichion["normalized"]["x"], trichion["normalized"]["y"])
+                    result.tr_method = method
+            results.append(result)
+
+    if not results:
+        raise ValueError("Unable to decode video")
+
+    with_face = [r for r in results if r.coords is not None]
+    front_frames = [r for r in with_face if abs(r.quality.yaw) <= FRONT_MAX_YAW]
+    side_frames = [r for r in with_face if abs(r.quality.yaw) >= SIDE_MIN_YAW]
+    if not front_frames:
+        raise ValueError("No frontal face found in video")
+
+    front_median = _aggregate(front_frames)
+    side_median = _aggregate(side_frames)
+    front_points = _points_from_map([MeshPoint(*p) for p in front_median.tolist()], mapping, width, height)
+    side_points = (
+        _points_from_map([MeshPoint(*p) for p in side_median.tolist()], mapping, width, height)
+        if side_median is not None
+        else {}
+    )
+
+    warnings: List[str] = []
+    hair_tr = [r.tr for r in front_frames if r.tr_method in ("hair", "strip")]
+    fallback_tr = [r.tr for r in front_frames if r.tr_method in FALLBACK_WARNINGS]
+    if hair_tr or fallback_tr:
+        tr_x, tr_y = np.median(np.array(hair_tr or fallback_tr), axis=0).tolist()
+        trichion = _tr_from_normalized(tr_x, tr_y, width, height)
+        front_points["Tr_R"] = trichion
+        front_points["Tr_L"] = trichion
+        if not hair_tr:
+            # Any failed segmentation is the likelier reason; otherwise the masks just had no skin at the midline.
+            failed = any(r.tr_method == "fallback_error" for r in front_frames)
+            warnings.append(FALLBACK_WARNINGS["fallback_error" if failed else "fallback"])
+    else:
+        warnings.append("Trichion (Tr) unavailable; hairline segmentation did not return a result.")
+    if not side_frames:
+        warnings.append("No profile frame found in video; side measurements are unavailable.")
+
+    measurements = compute_measurements(front_points, side_points)
+    best_front = max(front_frames, key=lambda r: r.quality.quality)
+    best_side = max(side_frames, key=lambda r: r.quality.quality) if side_frames else None
+
+    return VideoAnalyzeResponse(
+        ok=True,
+        frames_read=len(results),
+        frames_with_face=len(with_face),
+        best_front_frame=best_front.quality,
+        best_side_frame=best_side.quality if best_side else None,
+        frames=[r.quality for r in results],
+        mandatory_landmarks=_mandatory_landmarks(mapping, front_points, side_points),
+        landmark_spread=_spread(front_frames, front_median, mapping, width, height),
+        measurements=measurements,
+        ratios=compute_ratios(measurements),
+        warnings=warnings,
+    )
@@ -0,0 +1,16 @@
+from benchmarks.stages import _selected, compare
+
+
+def _results(medians):
+    return {"results": {key: {"median_ms": value} for key, value in medians.items()}}
+
+
+def test_compare_flags_regressions_and_stages_missing_from_the_run():
+    baseline = _results({"read_image@512": 10.0, "predict_mask@512": 40.0, "predict_mask@1024": 90.0})
+    current = _results({"read_image@512": 10.2})
+    assert compare(baseline, current, 0.2) == ["predict_mask@512", "predict_mask@1024"]
+    assert compare(baseline, current, 0.2, _selected([512], None)) == ["predict_mask@512"]
+    assert compare(baseline, current, 0.2, _selected([512, 1024], ["read_image"])) == []
+
+    slower = _results({"read_image@512": 20.0})
+    assert compare(baseline, slower, 0.2, _selected([512], ["read_image"])) == ["read_image@512"]
@@ -0,0 +1,34 @@
+import base64
+
+import numpy as np
+
+from app.models.schemas import LandmarkOut, Point2D, Point3D
+from app.services.compact import landmark_table, mesh_out, rle_encode
+
+
+def test_compact_tables_and_mesh_round_trip():
+    table = landmark_table(
+        [
+            LandmarkOut(label="N", index=168, pixel=Point2D(x=10.0, y=20.0), normalized=Point3D(x=0.1, y=0.2, z=0.0)),
+            LandmarkOut(label="Tr_R", index=None, pixel=None, normalized=None),
+        ]
+    )
+    assert table.label == ["N", "Tr_R"]
+    assert table.x == [10.0, None]
+    assert table.nz == [0.0, None]
+
+    coords = np.array([[0.25, 0.5, -0.125], [1.0, 0.0, 0.5]], dtype=np.float32)
+    mesh = mesh_out(coords, width=640, height=480)
+    decoded = np.frombuffer(base64.b64decode(mesh.data), dtype="<f4").reshape(mesh.count, 3)
+    assert mesh.count == 2
+    np.testing.assert_array_equal(decoded, coords)
+    assert mesh_out(None, 640, 480) is None
+
+
+def test_rle_round_trip():
+    mask = np.array([[0, 0, 1], [1, 1, 17]], dtype=np.uint8)
+    rle = rle_encode(mask)
+
+    assert rle.values == [0, 1, 17]
+    assert rle.counts == [2, 3, 1]
+    np.testing.assert_array_equal(np.repeat(rle.values, rle.counts).reshape(mask.shape), mask)
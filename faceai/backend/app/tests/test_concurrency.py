@@ -0,0 +1,41 @@
+from dataclasses import replace
+
+from app.config import Settings, get_settings
+from app.utils.concurrency import plan_threads
+
+
+def _settings(**overrides) -> Settings:
+    values = dict(
+        cpu_budget=16,
+        workers=4,
+        max_concurrency=2,
+        stage_threads=None,
+        pin_cpus=True,
+        torch_threads=None,
+        torch_interop_threads=None,
+        cv2_threads=None,
+        ort_threads=None,
+    )
+    values.update(overrides)
+    return replace(get_settings(), **values)
+
+
+def test_plan_splits_core_budget_across_workers_and_jobs():
+    plan = plan_threads(_settings(), worker_index=1, cpus=list(range(16)))
+
+    assert plan.worker_cores == 4
+    assert plan.cpus == [4, 5, 6, 7]
+    assert plan.torch_threads == 2
+    assert plan.cv2_threads == 2
+    assert plan.torch_interop_threads == 1
+    assert plan.stage_threads * plan.torch_threads <= plan.worker_cores
+
+    assert plan_threads(_settings(workers=1)).stage_threads == 2
+    assert plan_threads(_settings(workers=1, max_concurrency=8)).stage_threads == 8
+    assert plan_threads(_settings(workers=1, cv2_threads=16)).stage_threads == 1
+    assert plan_threads(_settings(workers=1, stage_threads=5)).stage_threads == 5
+
+    overridden = plan_threads(_settings(torch_threads=3, workers=32))
+    assert overridden.worker_cores == 1
+    assert overridden.torch_threads == 3
+    assert overridden.cpus is None
@@ -1,4 +1,13 @@
-from app.services.facemesh import _points_from_map
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services import facemesh, hairline
+from app.services.facemesh import DecodedImage, ViewPoints, _points_from_map, _predict_parsing, _tiered_trichion
+from app.services.hairline import FALLBACK_WARNINGS, estimate_trichion
+from app.services.hairline_strip import NO_ESTIMATE
+from app.services.parsing_client import ParsingTimeoutError
+from app.services.qos import FULL_QUALITY
 
 
 class _Lm:
@@ -26,3 +35,25 @@ def test_prn_midpoint_from_mesh_points():
     assert points["Prn"]["normalized"]["x"] == 0.4
     assert points["Prn"]["normalized"]["y"] == 0.5
     assert points["Prn"]["normalized"]["z"] == 0.3
+
+
+def test_failed_segmentation_is_not_reported_as_missing_hair(monkeypatch):
+    def broken(*_):
+        raise ParsingTimeoutError("No reply from the parsing server")
+
+    monkeypatch.setattr(hairline, "_predict_mask", broken)
+    monkeypatch.setattr(facemesh, "_predict_mask", broken)
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    landmarks = [_Lm(0.5, 0.2, 0.0), _Lm(0.5, 0.8, 0.0)]
+    points = _points_from_map(landmarks, {"N": 1}, width=100, height=100)
+
+    assert estimate_trichion(image, points, landmarks=landmarks)[2] == "fallback_error"
+    assert estimate_trichion(image, points, landmarks=landmarks, use_model=False)[2] == "fallback"
+
+    decoded = DecodedImage(image, 100, 100)
+    parsing = _predict_parsing(decoded, FULL_QUALITY)
+    assert parsing.mask is None and parsing.failed
+    front = ViewPoints([], 1, SimpleNamespace(landmarks=landmarks), points)
+    result = _tiered_trichion(decoded, front, parsing, NO_ESTIMATE)
+    assert result.method == "fallback_error" and result.point["pixel"]["y"] == 20.0
+    assert "failed" in FALLBACK_WARNINGS[result.method]
@@ -0,0 +1,40 @@
+import numpy as np
+
+from app.services.hairline_strip import CHEEKS, FOREHEAD_TOP, GLABELLA, NO_ESTIMATE, strip_trichion
+from app.services.video import MeshPoint
+
+SKIN = (150, 170, 210)
+HAIRLINE = 100
+
+
+def _landmarks():
+    rng = np.random.default_rng(0)
+    points = [MeshPoint(x, y, 0.0) for x, y in rng.uniform((0.3, 0.3), (0.7, 0.9), size=(468, 2))]
+    points[FOREHEAD_TOP] = MeshPoint(0.5, 0.3, 0.0)
+    points[GLABELLA] = MeshPoint(0.5, 0.45, 0.0)
+    points[CHEEKS[0]] = MeshPoint(0.4, 0.55, 0.0)
+    points[CHEEKS[1]] = MeshPoint(0.6, 0.55, 0.0)
+    return points
+
+
+def _image(hair: bool = True) -> np.ndarray:
+    image = np.empty((512, 512, 3), dtype=np.uint8)
+    image[:] = SKIN
+    if hair:
+        strands = np.random.default_rng(1).integers(20, 60, size=(HAIRLINE, 512, 1))
+        image[:HAIRLINE] = (strands * (0.6, 0.8, 1.0)).astype(np.uint8)
+    return image
+
+
+def test_strip_finds_a_clean_hairline():
+    estimate = strip_trichion(_image(), _landmarks(), 256)
+    assert estimate.confidence >= 0.6
+    assert abs(estimate.point["pixel"]["y"] - HAIRLINE) <= 3
+    assert estimate.point["pixel"]["x"] == 256
+
+
+def test_strip_gives_up_without_an_edge_or_on_a_covered_forehead():
+    assert strip_trichion(_image(hair=False), _landmarks(), 256) == NO_ESTIMATE
+    covered = _image()
+    covered[:240] = covered[:HAIRLINE].mean(axis=(0, 1)).astype(np.uint8)
+    assert strip_trichion(covered, _landmarks(), 256).point is None
@@ -0,0 +1,50 @@
+import copy
+from functools import partial
+
+import numpy as np
+import pytest
+import torch
+
+from app.services.hairline import REPO_DIR, _resize_bgr, _to_tensor
+from app.services.input_folding import fold_input
+
+
+def test_folded_model_matches_normalised_rgb_input():
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Conv2d(3, 8, 7, stride=2, padding=3), torch.nn.ReLU()).eval()
+    bgr = np.random.default_rng(0).integers(0, 256, size=(2, 32, 32, 3), dtype=np.uint8)
+
+    with torch.no_grad():
+        expected = model(_to_tensor(np.ascontiguousarray(bgr[..., ::-1])))
+        fused = fold_input(model, first_conv="0")
+        actual = fused(torch.from_numpy(bgr))
+
+    # Borders included: padding must still behave like the mean colour.
+    assert torch.allclose(actual, expected, atol=1e-4)
+
+
+def test_resize_bgr_reuses_its_buffer():
+    image = np.zeros((100, 80, 3), dtype=np.uint8)
+    first = _resize_bgr(image, 32)
+    second = _resize_bgr(np.full((40, 60, 3), 7, dtype=np.uint8), 32)
+    assert second is first and second.shape == (32, 32, 3)
+    assert (second == 7).all()
+
+
+def test_folded_bisenet_matches_the_unfused_path(monkeypatch):
+    pytest.importorskip("torchvision")
+    monkeypatch.syspath_prepend(str(REPO_DIR))
+    from models import bisenet, resnet  # type: ignore
+
+    # Random weights are enough for parity, so skip the ImageNet backbone download.
+    monkeypatch.setattr(bisenet, "resnet18", partial(resnet.resnet18, weights=None))
+    torch.manual_seed(0)
+    model = bisenet.BiSeNet(19, "resnet18").eval()
+    bgr = np.random.default_rng(0).integers(0, 256, size=(2, 64, 64, 3), dtype=np.uint8)
+
+    with torch.no_grad():
+        expected = model(_to_tensor(np.ascontiguousarray(bgr[..., ::-1])))[0]
+        actual = fold_input(copy.deepcopy(model))(torch.from_numpy(bgr))[0]
+
+    assert torch.allclose(actual, expected, atol=1e-3)
+    assert torch.equal(actual.argmax(1), expected.argmax(1))
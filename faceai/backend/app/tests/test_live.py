@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.config import get_settings
+from app.main import app
+from app.services import live
+from app.services.live import MAX_SIDE, MIN_SCALE, LatestFrame, LiveSession
+
+
+def test_latest_frame_keeps_only_the_newest_unprocessed_frame():
+    mailbox = LatestFrame()
+    assert mailbox.take() is None
+    assert mailbox.put(b"1") is False
+    assert mailbox.put(b"2") is True
+    assert mailbox.put(b"3") is True
+    assert mailbox.take() == b"3"
+    assert mailbox.take() is None
+    assert mailbox.put(b"4") is False
+
+
+@pytest.fixture
+def session(monkeypatch):
+    seen = []
+
+    def extract(image, face_mesh):
+        seen.append(image.shape[:2])
+        return [], 0
+
+    monkeypatch.setattr(live, "_create_face_mesh", lambda **_: SimpleNamespace(close=lambda: None))
+    monkeypatch.setattr(live, "_extract_landmarks", extract)
+    session = LiveSession(budget_ms=100.0)
+    session.seen = seen
+    yield session
+    session.close()
+
+
+def test_scale_shrinks_over_budget_and_recovers_under_half(session):
+    for _ in range(20):
+        session._adapt_scale(150.0)
+    assert session.scale == MIN_SCALE
+
+    session._adapt_scale(70.0)
+    assert session.scale == MIN_SCALE
+    for _ in range(20):
+        session._adapt_scale(10.0)
+    assert session.scale == 1.0
+
+
+def test_frames_are_meshed_at_the_current_scale(session):
+    frame = cv2.imencode(".png", np.zeros((400, 2 * MAX_SIDE, 3), np.uint8))[1].tobytes()
+    result = session.process(frame)
+    assert result["scale"] == 0.5 and result["width"] == 2 * MAX_SIDE
+    assert session.seen[-1] == (200, MAX_SIDE)
+
+    session.scale = 0.25
+    session.process(frame)
+    assert session.seen[-1] == (100, MAX_SIDE // 2)
+
+    assert session.process(b"not an image")["error"] == "Unable to decode image"
+    assert session.frames == 3
+
+
+def _send_text_and_expect_close(websocket):
+    # Ends the connection from the server side; TestClient cancels the handler outright on a client-side close.
+    websocket.send_text("hello")
+    with pytest.raises(WebSocketDisconnect) as closed:
+        websocket.receive_json()
+    assert closed.value.code == 1003
+
+
+def test_live_sessions_are_capped_and_text_frames_close_the_socket(monkeypatch, session):
+    monkeypatch.setenv("FACEAI_MAX_LIVE_SESSIONS", "1")
+    get_settings.cache_clear()
+    try:
+        client = TestClient(app)
+        frame = cv2.imencode(".png", np.zeros((32, 32, 3), np.uint8))[1].tobytes()
+        with client.websocket_connect("/api/live") as first:
+            first.send_bytes(frame)
+            assert first.receive_json()["face"] is False
+            with client.websocket_connect("/api/live") as second:
+                with pytest.raises(WebSocketDisconnect) as closed:
+                    second.receive_json()
+                assert closed.value.code == 1013
+            _send_text_and_expect_close(first)
+        # The slot is released once the first connection ends.
+        with client.websocket_connect("/api/live") as third:
+            third.send_bytes(frame)
+            assert third.receive_json()["frame"] == 1
+            _send_text_and_expect_close(third)
+    finally:
+        monkeypatch.delenv("FACEAI_MAX_LIVE_SESSIONS")
+        get_settings.cache_clear()
@@ -0,0 +1,13 @@
+import sys
+
+import pytest
+
+from app.utils.memory import process_memory
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/self/smaps_rollup")
+def test_process_memory_splits_private_and_shared_pages():
+    memory = process_memory()
+    assert memory is not None
+    assert memory["rss"] == memory["uss"] + memory["shared"]
+    assert memory["uss"] <= memory["pss"] <= memory["rss"]
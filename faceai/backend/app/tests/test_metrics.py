@@ -0,0 +1,65 @@
+import re
+from pathlib import Path
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.main import app
+from app.utils.metrics import annotate, request_timings, stage
+
+SAMPLE = Path(__file__).resolve().parents[2] / "model_cache/face_parsing/face-parsing-main/assets/images/1.jpg"
+ENTRY = re.compile(r'^[a-z0-9_]+;(dur=\d+\.\d|desc="[^"]*")$')
+OUTCOMES = ("ok", "no_face", "preflight", "side_missing", "fallback_tr", "fallback_error", "invalid", "error")
+
+
+def _entries(header: str):
+    return [entry.strip() for entry in header.split(",")]
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _outcomes():
+    return {outcome: _sample("faceai_analyze_requests_total", outcome=outcome) for outcome in OUTCOMES}
+
+
+def test_server_timing_lists_stages_then_info_then_total():
+    with request_timings() as timings:
+        with stage("decode"):
+            pass
+        with stage("decode"):
+            pass
+        annotate("image_size", "640x480")
+    annotate("outside", "ignored")
+
+    entries = _entries(timings.server_timing())
+    assert [entry.split(";")[0] for entry in entries] == ["decode", "image_size", "total"]
+    assert entries[1] == 'image_size;desc="640x480"'
+    assert all(ENTRY.match(entry) for entry in entries)
+
+
+def test_analyze_reports_unique_timings_and_counts_outcomes():
+    client = TestClient(app)
+    before = _outcomes()
+    preflights = _sample("faceai_stage_seconds_count", stage="preflight")
+
+    image = ("front.jpg", SAMPLE.read_bytes(), "image/jpeg")
+    response = client.post("/api/analyze", files={"front_image": image, "side_image": image})
+    assert response.status_code == 200
+    entries = _entries(response.headers["Server-Timing"])
+    names = [entry.split(";")[0] for entry in entries]
+    assert len(names) == len(set(names)) and names[-1] == "total"
+    assert all(ENTRY.match(entry) for entry in entries)
+    assert {"decode", "facemesh_front", "preflight", "preflight_result", "upload_bytes"} <= set(names)
+    assert _sample("faceai_stage_seconds_count", stage="preflight") == preflights + 1
+
+    blank = ("blank.png", cv2.imencode(".png", np.zeros((64, 64, 3), np.uint8))[1].tobytes(), "image/png")
+    assert client.post("/api/analyze", files={"front_image": blank, "side_image": blank}).status_code == 422
+
+    after = _outcomes()
+    changed = {outcome: after[outcome] - before[outcome] for outcome in OUTCOMES if after[outcome] != before[outcome]}
+    assert changed.pop("no_face") == 1
+    assert list(changed.values()) == [1] and set(changed) <= {"ok", "side_missing", "fallback_tr", "fallback_error"}
@@ -0,0 +1,99 @@
+import hashlib
+import threading
+from dataclasses import replace
+
+import pytest
+
+from app.config import get_settings
+from app.services.model_registry import (
+    VARIANTS,
+    ModelChecksumError,
+    ModelRegistry,
+    validate_settings,
+    verify_weights,
+)
+
+
+def test_registry_evicts_least_recently_used_and_tracks_latency():
+    sizes = {"bisenet_resnet18": 50, "bisenet_resnet34": 90}
+    loads = []
+
+    def loader(variant):
+        loads.append(variant.name)
+        return object(), "cpu", sizes[variant.name], "digest"
+
+    registry = ModelRegistry(max_bytes=120)
+    light = registry.get("bisenet_resnet18", loader)
+    assert registry.get("bisenet_resnet18", loader) is light
+    registry.observe(light, 0.5)
+    registry.observe(light, 0.1)
+    registry.observe(light, 0.2)
+    assert light.cold_ms == 500.0
+    assert light.warm_ms == pytest.approx(120.0)
+
+    registry.get("bisenet_resnet34", loader)
+    assert registry.resident() == ["bisenet_resnet34"]
+    reloaded = registry.get("bisenet_resnet18", loader)
+    assert registry.resident() == ["bisenet_resnet18"]
+    assert loads == ["bisenet_resnet18", "bisenet_resnet34", "bisenet_resnet18"]
+    assert reloaded.warm_ms == light.warm_ms and reloaded.calls == 0
+
+    with pytest.raises(ValueError):
+        registry.get("bisenet_resnet50", loader)
+
+
+def test_verify_weights_checks_pinned_sha256(tmp_path):
+    path = tmp_path / "weights.pt"
+    path.write_bytes(b"weights")
+    digest = hashlib.sha256(b"weights").hexdigest()
+    variant = VARIANTS["bisenet_resnet18"]
+
+    assert verify_weights(variant, path) == digest
+    assert verify_weights(replace(variant, sha256=digest.upper()), path) == digest
+    with pytest.raises(ModelChecksumError):
+        verify_weights(replace(variant, sha256="0" * 64), path)
+
+
+def test_loads_run_outside_the_registry_lock():
+    release = threading.Event()
+    started = threading.Event()
+
+    def loader(variant):
+        if variant.name == "bisenet_resnet34":
+            started.set()
+            release.wait(5)
+        return object(), "cpu", 10, "digest"
+
+    registry = ModelRegistry(max_bytes=0)
+    light = registry.get("bisenet_resnet18", loader)
+    slow = threading.Thread(target=registry.get, args=("bisenet_resnet34", loader))
+    slow.start()
+    assert started.wait(5)
+    # Served and observed while the other model is still loading.
+    assert registry.get("bisenet_resnet18", loader) is light
+    registry.observe(light, 0.1)
+    release.set()
+    slow.join(5)
+    assert registry.resident() == ["bisenet_resnet18", "bisenet_resnet34"]
+
+
+def test_checksum_failures_are_remembered():
+    calls = []
+
+    def loader(variant):
+        calls.append(variant.name)
+        raise ModelChecksumError("mismatch")
+
+    registry = ModelRegistry()
+    for _ in range(3):
+        with pytest.raises(ModelChecksumError):
+            registry.get("bisenet_resnet18", loader)
+    assert calls == ["bisenet_resnet18"]
+
+
+def test_configured_model_names_are_validated():
+    validate_settings(get_settings())
+    with pytest.raises(ValueError, match="FACEAI_PARSING_MODEL='bisenet_resnet43'"):
+        validate_settings(replace(get_settings(), parsing_model="bisenet_resnet43"))
+    with pytest.raises(ValueError, match=r"FACEAI_MODEL_TIERS\[batch\]"):
+        validate_settings(replace(get_settings(), model_tiers={"batch": "resnet34"}))
@@ -0,0 +1,92 @@
+import base64
+from xml.etree import ElementTree
+
+import cv2
+import numpy as np
+
+from app.services.facemesh import _points_from_map, _render_mesh, _render_points
+from app.services.overlay import MESH_POINT_COUNT, draw_all_landmarks, get_index_atlas
+from app.services.video import MeshPoint
+from app.utils.landmarks_map import load_landmark_map
+from app.utils.metrics import request_timings
+
+
+class _Lm:
+    def __init__(self, x: float, y: float) -> None:
+        self.x = x
+        self.y = y
+
+
+def test_index_labels_are_clipped_at_image_edges():
+    image = np.zeros((40, 60, 3), dtype=np.uint8)
+    landmarks = [_Lm(0.0, 0.0), _Lm(0.99, 0.99), _Lm(0.5, 0.5)]
+
+    result = draw_all_landmarks(image, landmarks)
+
+    assert result.shape == (40, 60, 3)
+    atlas = get_index_atlas(0.35)
+    sprite = atlas.sprite("2")
+    assert atlas.sprite("2") is sprite
+    # Label "2" sits up and to the right of its point, fully inside the image.
+    y2 = 20 - 2 + 1
+    x1 = 30 + 2
+    patch = result[y2 - sprite.shape[0] : y2, x1 : x1 + sprite.shape[1]]
+    assert np.array_equal(patch, sprite)
+
+
+def _decode(data_uri: str) -> bytes:
+    return base64.b64decode(data_uri.split(",", 1)[1])
+
+
+def _mesh():
+    coords = np.random.default_rng(0).uniform(0.2, 0.8, size=(MESH_POINT_COUNT, 2))
+    return [_Lm(x, y) for x, y in coords]
+
+
+def test_svg_overlays_have_one_element_per_point():
+    landmarks = _mesh()
+    points = _points_from_map([MeshPoint(lm.x, lm.y, 0.0) for lm in landmarks], load_landmark_map(), 320, 240)
+    image = np.zeros((240, 320, 3), dtype=np.uint8)
+    svg = "{http://www.w3.org/2000/svg}"
+
+    front = ElementTree.fromstring(_decode(_render_points("svg", image, points, 160.0, "front")))
+    assert front.get("width") == "320" and front.get("height") == "240"
+    assert len(front.findall(f".//{svg}circle")) == len(points)
+    assert [text.text for text in front.iter(f"{svg}text")] == list(points)
+    assert len(front.findall(f"{svg}line")) == 1
+
+    mesh = ElementTree.fromstring(_decode(_render_mesh("svg", image, landmarks, "front_all")))
+    assert len(mesh.findall(f".//{svg}circle")) == MESH_POINT_COUNT
+    assert len(mesh.findall(f".//{svg}text")) == MESH_POINT_COUNT
+
+
+def test_layer_overlays_are_transparent_pngs_of_the_image_size():
+    landmarks = _mesh()
+    points = _points_from_map([MeshPoint(lm.x, lm.y, 0.0) for lm in landmarks], load_landmark_map(), 320, 240)
+    image = np.full((240, 320, 3), 90, dtype=np.uint8)
+
+    for data_uri in (
+        _render_points("layer", image, points, 160.0, "front"),
+        _render_mesh("layer", image, landmarks, "front_all"),
+    ):
+        layer = cv2.imdecode(np.frombuffer(_decode(data_uri), np.uint8), cv2.IMREAD_UNCHANGED)
+        assert layer.shape == (240, 320, 4)
+        alpha = layer[..., 3]
+        assert alpha.min() == 0 and alpha.max() == 255
+        # Only the drawn marks are opaque; the photo itself is never part of the layer.
+        assert (layer[alpha == 0][:, :3] == 0).all()
+
+
+def test_front_and_side_renders_are_timed_separately():
+    landmarks = _mesh()
+    points = _points_from_map([MeshPoint(lm.x, lm.y, 0.0) for lm in landmarks], load_landmark_map(), 320, 240)
+    image = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    with request_timings() as timings:
+        _render_points("raster", image, points, 160.0, "front")
+        _render_points("svg", image, points, None, "side")
+        _render_mesh("raster", image, landmarks, "front_all")
+
+    rendered = sorted(name for name in timings.stages if name.startswith("render_"))
+    assert rendered == ["render_landmarks_front", "render_landmarks_front_all", "render_landmarks_side"]
+    assert {"encode_front", "encode_side", "encode_front_all"} <= set(timings.stages)
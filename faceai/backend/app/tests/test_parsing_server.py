@@ -0,0 +1,135 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.services import parsing_client
+from app.services.parsing_client import (
+    MAGIC,
+    REQUEST,
+    RESPONSE,
+    STATUS_ERROR,
+    STATUS_OK,
+    VERSION,
+    ParsingClient,
+    ParsingServerError,
+    ParsingTimeoutError,
+    recv_into_exact,
+)
+from app.services.parsing_server import MAX_INPUT_SIZE, Batcher, ParsingServer
+
+
+def _serve(path, infer):
+    server = ParsingServer(path, Batcher(max_batch=1, max_wait_ms=0, infer=infer).start())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_parsing_server_batches_requests_from_several_clients(tmp_path):
+    batches = []
+
+    def infer(model, pixels):
+        if model != "bisenet_resnet18":
+            raise RuntimeError("model unavailable")
+        batches.append(len(pixels))
+        return pixels[..., 0] // 10
+
+    path = str(tmp_path / "parsing.sock")
+    server = ParsingServer(path, Batcher(max_batch=4, max_wait_ms=200, infer=infer).start())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = ParsingClient(path)
+        images = [np.full((16, 16, 3), 10 * value, dtype=np.uint8) for value in range(4)]
+        masks = [None] * len(images)
+
+        def call(index):
+            masks[index] = client.predict(images[index], "bisenet_resnet18")
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(len(images))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [mask.tolist() for mask in masks] == [np.full((16, 16), value).tolist() for value in range(4)]
+        assert max(batches) > 1 and sum(batches) == 4
+        with pytest.raises(ParsingServerError):
+            client.predict(images[0], "bisenet_resnet34")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_parsing_client_reports_a_missing_server(tmp_path):
+    client = ParsingClient(str(tmp_path / "missing.sock"))
+    with pytest.raises(OSError):
+        client.predict(np.zeros((8, 8, 3), dtype=np.uint8), "bisenet_resnet18")
+    assert not client.available()
+
+
+def test_a_slow_server_is_neither_retried_nor_marked_down(tmp_path, monkeypatch):
+    calls = []
+
+    def infer(model, pixels):
+        calls.append(model)
+        if len(calls) > 1:
+            time.sleep(0.5)
+        return pixels[..., 0]
+
+    monkeypatch.setattr(parsing_client, "REQUEST_TIMEOUT_S", 0.2)
+    server = _serve(str(tmp_path / "parsing.sock"), infer)
+    try:
+        client = ParsingClient(server.server_address)
+        image = np.zeros((8, 8, 3), dtype=np.uint8)
+        client.predict(image, "bisenet_resnet18")
+        with pytest.raises(ParsingTimeoutError):
+            client.predict(image, "bisenet_resnet18")
+        assert client.available()
+        time.sleep(0.5)
+        assert len(calls) == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_server_rejects_oversized_inputs(tmp_path):
+    server = _serve(str(tmp_path / "parsing.sock"), lambda model, pixels: pixels[..., 0])
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(server.server_address)
+            sock.sendall(REQUEST.pack(MAGIC, VERSION, MAX_INPUT_SIZE + 1, 4) + b"name")
+            magic, version, status, length = RESPONSE.unpack(sock.recv(RESPONSE.size))
+            assert status == STATUS_ERROR
+            assert b"outside" in sock.recv(length)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_server_rejects_unknown_model_names_and_keeps_the_connection(tmp_path):
+    server = _serve(str(tmp_path / "parsing.sock"), lambda model, pixels: pixels[..., 0])
+    pixels = np.full(4 * 4 * 3, 7, dtype=np.uint8).tobytes()
+
+    def request(sock, name):
+        sock.sendall(REQUEST.pack(MAGIC, VERSION, 4, len(name)) + name + pixels)
+        reply = bytearray(RESPONSE.size)
+        recv_into_exact(sock, memoryview(reply))
+        _, _, status, length = RESPONSE.unpack(reply)
+        body = bytearray(length)
+        recv_into_exact(sock, memoryview(body))
+        return status, bytes(body)
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(server.server_address)
+            assert request(sock, b"bisenet_resnet50") == (STATUS_ERROR, b"Unknown parsing model 'bisenet_resnet50'")
+            status, message = request(sock, b"bisenet\xff")
+            assert status == STATUS_ERROR and message.startswith(b"Unknown parsing model")
+            assert request(sock, b"bisenet_resnet18") == (STATUS_OK, bytes([7] * 16))
+    finally:
+        server.shutdown()
+        server.server_close()
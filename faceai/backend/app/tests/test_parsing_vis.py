@@ -0,0 +1,26 @@
+import cv2
+import numpy as np
+
+from app.services.parsing_vis import CLASS_NAMES, COLOR_LIST, SKIN_CLASS_ID, blend_mask, colorize_mask, legend_png_bytes
+
+
+def test_class_names_follow_the_model_labels():
+    assert len(CLASS_NAMES) == len(COLOR_LIST) == 19
+    # Tr is read from the top edge of the skin class; the scalp is class 17.
+    assert CLASS_NAMES[SKIN_CLASS_ID] == "skin"
+    assert CLASS_NAMES.index("hair") == 17
+
+
+def test_colorize_blend_and_legend_need_no_vendored_code():
+    mask = np.array([[0, SKIN_CLASS_ID], [18, 200]], dtype=np.uint8)
+    colored = colorize_mask(mask)
+    assert colored.shape == (2, 2, 3) and colored.dtype == np.uint8
+    assert colored[0, 1].tolist() == COLOR_LIST[SKIN_CLASS_ID]
+    assert colored[1, 1].tolist() == [0, 0, 0]
+
+    blended = blend_mask(np.full((2, 2, 3), 100, np.uint8), colored, alpha=0.5)
+    assert blended.dtype == np.uint8
+    assert blended[0, 0].tolist() == [50, 50, 50]
+
+    legend = cv2.imdecode(np.frombuffer(legend_png_bytes(), np.uint8), cv2.IMREAD_COLOR)
+    assert legend.shape[0] > 19 * 20
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.pipeline import StageGraph
+from app.utils.cancellation import ClientDisconnected, DeadlineExceeded, cancel_scope
+
+
+def _graph(fail: bool = False) -> StageGraph:
+    def slow(value):
+        time.sleep(0.02)
+        return value
+
+    def broken(_):
+        raise ValueError("side failed")
+
+    graph = StageGraph()
+    graph.add("front", lambda: slow(2))
+    graph.add("side", lambda: 3)
+    graph.add("side_points", broken if fail else (lambda side: side * 10), "side")
+    graph.add("total", lambda front, side: front + side, "front", "side_points")
+    return graph
+
+
+def test_graph_results_match_inline_and_pooled():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert _graph().run(executor) == _graph().run() == {"front": 2, "side": 3, "side_points": 30, "total": 32}
+
+        with pytest.raises(ValueError, match="side failed"):
+            _graph(fail=True).run(executor)
+
+    with pytest.raises(ValueError, match="unknown stage"):
+        StageGraph().add("total", lambda front: front, "front")
+
+
+def test_cancelled_request_stops_before_the_next_stage():
+    ran = []
+    graph = StageGraph()
+    graph.add("first", lambda: ran.append("first"))
+    graph.add("second", lambda _: ran.append("second"), "first")
+
+    with cancel_scope() as token:
+        graph.add("stop", lambda _: token.cancel(), "first")
+        graph.add("third", lambda *_: ran.append("third"), "second", "stop")
+        with pytest.raises(ClientDisconnected):
+            graph.run()
+
+    assert ran == ["first", "second"]
+
+    with cancel_scope(timeout_ms=1):
+        time.sleep(0.01)
+        with pytest.raises(DeadlineExceeded):
+            _graph().run()
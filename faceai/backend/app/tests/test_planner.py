@@ -0,0 +1,22 @@
+import pytest
+
+from app.services.planner import FULL_PLAN, plan_analysis
+
+
+def test_plan_prunes_views_and_trichion_from_requested_ids():
+    assert plan_analysis() is FULL_PLAN
+
+    widths = plan_analysis(measurement_ids=["ex-ex", "ch-ch"])
+    assert (widths.front, widths.side, widths.trichion) == (True, False, False)
+    assert widths.ratio_ids == ()
+    assert widths.artifacts == frozenset()
+
+    forehead = plan_analysis(measurement_ids=["tr-n"], ratio_ids=["mouth_to_nose_width"])
+    assert forehead.trichion
+    assert forehead.measurement_ids == ("tr-n", "ch-ch", "al-al")
+
+    side_only = plan_analysis(artifacts=["side_all"])
+    assert (side_only.front, side_only.side, side_only.trichion) == (False, True, False)
+
+    with pytest.raises(ValueError, match="Unknown ratios"):
+        plan_analysis(ratio_ids=["nope"])
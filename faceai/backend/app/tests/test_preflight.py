@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.config import get_settings
+from app.services.facemesh import _build_graph
+from app.services.pose import CHEEK_LEFT, CHEEK_RIGHT, CHIN, EYE_OUTER_LEFT, EYE_OUTER_RIGHT, FOREHEAD
+from app.services.preflight import assess
+
+
+def _coords() -> np.ndarray:
+    coords = np.zeros((468, 3), dtype=np.float32)
+    coords[:, :2] = np.random.default_rng(0).uniform(0.3, 0.7, size=(468, 2))
+    coords[CHEEK_RIGHT, :2] = (0.3, 0.5)
+    coords[CHEEK_LEFT, :2] = (0.7, 0.5)
+    coords[FOREHEAD, :2] = (0.5, 0.3)
+    coords[CHIN, :2] = (0.5, 0.7)
+    coords[EYE_OUTER_RIGHT, :2] = (0.4, 0.45)
+    coords[EYE_OUTER_LEFT, :2] = (0.6, 0.45)
+    return coords
+
+
+def _failed(report):
+    return [check.name for check in report.failures()]
+
+
+def test_preflight_flags_each_cheap_check():
+    tiles = np.indices((512, 512)).sum(axis=0) // 8 % 2
+    sharp = np.repeat((tiles * 120 + 60).astype(np.uint8)[:, :, None], 3, axis=2)
+    report = assess(sharp, _coords(), "front")
+    assert report.passed and report.warnings() == []
+    assert abs(report.pose.yaw) < 1e-6 and abs(report.pose.roll) < 1e-6
+
+    assert _failed(assess(np.full((512, 512, 3), 128, np.uint8), _coords())) == ["sharpness"]
+    assert "exposure" in _failed(assess(sharp // 4, _coords()))
+    assert _failed(assess(sharp[:256, :256], _coords())) == ["face_size"]
+    assert _failed(assess(sharp, _coords(), "side")) == ["pose"]
+    assert _failed(assess(sharp, None)) == ["face"]
+
+
+def test_unknown_preflight_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv("FACEAI_PREFLIGHT", "rejct")
+    get_settings.cache_clear()
+    try:
+        with pytest.raises(ValueError, match="FACEAI_PREFLIGHT"):
+            get_settings()
+        monkeypatch.setenv("FACEAI_PREFLIGHT", " Reject ")
+        assert get_settings().preflight == "reject"
+    finally:
+        monkeypatch.undo()
+        get_settings.cache_clear()
+
+
+def test_only_reject_mode_holds_side_work_and_parsing_for_preflight():
+    def deps(mode):
+        graph = _build_graph(b"", b"", None, None, "raster", preflight=mode)
+        return {name: graph._stages[name].deps for name in ("decode_side", "parsing")}
+
+    assert deps("off") == deps("warn") == {"decode_side": (), "parsing": ("decode_front",)}
+    assert deps("reject") == {"decode_side": ("preflight",), "parsing": ("decode_front", "preflight")}
+    assert "preflight" in _build_graph(b"", b"", None, None, "raster", preflight="warn")
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.delenv("FACEAI_ADMIN_TOKEN", raising=False)
+    monkeypatch.setenv("FACEAI_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("FACEAI_PROFILE_INTERVAL_MS", "1")
+    get_settings.cache_clear()
+    yield TestClient(app)
+    monkeypatch.undo()
+    get_settings.cache_clear()
+
+
+def test_profile_window_is_disabled_without_an_admin_token(client):
+    response = client.post("/api/admin/profile?seconds=0.1", headers={"X-Admin-Token": "anything"})
+    assert response.status_code == 403 and response.json()["detail"] == "Admin endpoints are disabled"
+
+
+def test_profile_window_rejects_missing_or_wrong_tokens(monkeypatch, client):
+    monkeypatch.setenv("FACEAI_ADMIN_TOKEN", "secret")
+    get_settings.cache_clear()
+
+    assert client.post("/api/admin/profile?seconds=0.1").status_code == 403
+    wrong = client.post("/api/admin/profile?seconds=0.1", headers={"X-Admin-Token": "secreT"})
+    assert wrong.status_code == 403 and wrong.json()["detail"] == "Invalid admin token"
+    assert client.post("/api/admin/profile?seconds=500", headers={"X-Admin-Token": "secret"}).status_code == 400
+
+
+def test_profile_window_writes_a_collapsed_stack_report(monkeypatch, client, tmp_path):
+    monkeypatch.setenv("FACEAI_ADMIN_TOKEN", "secret")
+    get_settings.cache_clear()
+
+    response = client.post("/api/admin/profile?seconds=0.2", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ok"] is True and body["seconds"] == 0.2
+    path = Path(body["path"])
+    assert path.parent == tmp_path and path.name.startswith("window-")
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert ":" in stack and int(count) > 0
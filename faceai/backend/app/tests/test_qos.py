@@ -0,0 +1,30 @@
+from dataclasses import replace
+
+from app.config import get_settings
+from app.services.qos import QosPolicy, degradation_for
+
+
+def test_policy_steps_through_cumulative_levels():
+    settings = replace(
+        get_settings(),
+        qos_max_level=4,
+        qos_queue_steps=(2, 4, 6, 8, 10),
+        qos_latency_steps_ms=(1000, 2000, 3000, 4000, 5000),
+    )
+    policy = QosPolicy(alpha=0.5)
+
+    assert policy.level(0, settings) == 0
+    assert policy.level(5, settings) == 2
+    assert policy.level(50, settings) == 4
+
+    policy.observe(3000.0)
+    policy.observe(1000.0)
+    assert policy.latency_ms == 2000.0
+    assert policy.level(0, settings) == 2
+
+    light = degradation_for(4, settings)
+    assert light.skip_debug_images and light.skip_mesh_renders
+    assert light.parsing_model == settings.qos_parsing_model
+    assert not light.measurements_only
+    assert len(light.warnings()) == 4
+    assert degradation_for(0, settings).warnings() == []
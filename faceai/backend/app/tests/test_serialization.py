@@ -0,0 +1,34 @@
+import json
+from pathlib import Path
+
+import orjson
+import pytest
+
+from app.services.facemesh import analyze_images
+from app.utils.serialization import dumps_model
+
+SAMPLES = Path(__file__).resolve().parents[2] / "model_cache/face_parsing/face-parsing-main/assets/images"
+
+
+@pytest.fixture(scope="module")
+def response():
+    return analyze_images((SAMPLES / "1.jpg").read_bytes(), (SAMPLES / "1112.jpg").read_bytes())
+
+
+def _same_json(model) -> None:
+    assert orjson.loads(dumps_model(model)) == json.loads(model.model_dump_json())
+
+
+def test_dumps_model_matches_pydantic_for_a_full_response(response):
+    assert response.annotated_images and all(value.startswith("data:") for value in response.annotated_images.values())
+    _same_json(response)
+
+
+def test_hostile_data_uris_are_escaped(response):
+    hostile = {
+        "quote": 'data:image/png;base64,"},"injected":"1',
+        "backslash": "data:text/plain,\\u0041\\",
+        "control": "data:text/plain,line\nbreak\x00",
+        "unicode": "data:text/plain,café",
+    }
+    _same_json(response.model_copy(update={"annotated_images": hostile}))
@@ -0,0 +1,28 @@
+import json
+import subprocess
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.config import get_settings
+from app.services import hairline
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def test_importing_the_app_defers_heavy_dependencies():
+    script = "import json, sys, app.main; print(json.dumps([m for m in ('torch', 'mediapipe') if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_lite_mode_never_loads_a_local_model(monkeypatch):
+    monkeypatch.setattr(hairline, "get_settings", lambda: replace(get_settings(), lite=True))
+    monkeypatch.setattr(hairline, "parsing_client", lambda: None)
+    assert not hairline.local_parsing_enabled()
+    assert hairline.preload_models() == []
+    with pytest.raises(RuntimeError, match="lite mode"):
+        hairline._predict_mask(np.zeros((64, 64, 3), dtype=np.uint8))
@@ -0,0 +1,94 @@
+import contextlib
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.services.hairline import FALLBACK_WARNINGS
+from app.services import video
+from app.services.pose import HeadPose
+from app.services.video import MeshPoint, analyze_video
+
+FRAMES = 10
+SHADE = 20
+
+
+def _write_video(path):
+    # Each frame is a flat grey whose shade encodes its index, so the stubs can tell frames apart.
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 64))
+    for index in range(FRAMES):
+        writer.write(np.full((64, 64, 3), index * SHADE, np.uint8))
+    writer.release()
+    return str(path)
+
+
+def _index(frame):
+    return int(round(float(frame.mean()) / SHADE))
+
+
+@pytest.fixture
+def stubbed(monkeypatch, tmp_path):
+    base = np.random.default_rng(0).uniform((0.3, 0.2), (0.7, 0.9), size=(468, 2))
+    calls = SimpleNamespace(parsed=[], shift_from=None, fail=False)
+
+    def extract(frame, face_mesh):
+        offset = 0.05 if calls.shift_from is not None and _index(frame) >= calls.shift_from else 0.0
+        return [SimpleNamespace(landmark=[MeshPoint(x + offset, y, 0.0) for x, y in base])], 468
+
+    def predict(frame):
+        calls.parsed.append(_index(frame))
+        if calls.fail:
+            raise RuntimeError("model unavailable")
+        return np.zeros(frame.shape[:2], np.uint8)
+
+    monkeypatch.setattr(video, "_create_face_mesh", lambda **_: contextlib.nullcontext())
+    monkeypatch.setattr(video, "_extract_landmarks", extract)
+    monkeypatch.setattr(video, "_predict_mask", predict)
+    monkeypatch.setattr(video, "estimate_head_pose", lambda *_: HeadPose(0.0, 0.0, 0.0))
+    calls.path = _write_video(tmp_path / "clip.avi")
+    return calls
+
+
+def test_parsing_is_reused_for_an_interval_of_processed_frames(stubbed):
+    response = analyze_video(stubbed.path, parsing_interval=4)
+    assert len(response.frames) == FRAMES
+    assert stubbed.parsed == [0, 4, 8]
+
+
+def test_parsing_interval_counts_frames_after_the_stride(stubbed):
+    response = analyze_video(stubbed.path, stride=2, parsing_interval=2)
+    assert [frame.index for frame in response.frames] == [0, 2, 4, 6, 8]
+    assert stubbed.parsed == [0, 4, 8]
+
+
+def test_parsing_reruns_when_the_face_moves(stubbed):
+    stubbed.shift_from = 5
+    analyze_video(stubbed.path, parsing_interval=100)
+    assert stubbed.parsed == [0, 5]
+
+
+def test_a_failed_model_is_not_retried(stubbed):
+    stubbed.fail = True
+    response = analyze_video(stubbed.path, parsing_interval=1)
+    assert stubbed.parsed == [0]
+    assert FALLBACK_WARNINGS["fallback_error"] in response.warnings
+
+
+def test_oversized_uploads_are_rejected(monkeypatch, stubbed):
+    monkeypatch.setenv("FACEAI_MAX_VIDEO_MB", "1")
+    get_settings.cache_clear()
+    try:
+        client = TestClient(app)
+        big = ("clip.avi", b"\0" * (1024 * 1024 + 1), "video/x-msvideo")
+        assert client.post("/api/analyze-video", files={"video": big}).status_code == 413
+        with open(stubbed.path, "rb") as handle:
+            small = ("clip.avi", handle.read(), "video/x-msvideo")
+        response = client.post("/api/analyze-video", files={"video": small})
+        assert response.status_code == 200 and len(response.json()["frames"]) == FRAMES
+    finally:
+        monkeypatch.undo()
+        get_settings.cache_clear()
@@ -0,0 +1,76 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from app.utils.metrics import CANCELLATIONS
+
+
+class RequestCancelled(Exception):
+    reason = "cancelled"
+
+
+class ClientDisconnected(RequestCancelled):
+    reason = "disconnected"
+
+
+class DeadlineExceeded(RequestCancelled):
+    reason = "deadline"
+
+
+class CancelToken:
+    def __init__(self, timeout_ms: Optional[int] = None) -> None:
+        self.deadline = time.perf_counter() + timeout_ms / 1000.0 if timeout_ms else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._counted = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = ClientDisconnected.reason) -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def remaining_ms(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return (self.deadline - time.perf_counter()) * 1000.0
+
+    def check(self, where: str) -> None:
+        if not self._event.is_set() and self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.cancel(DeadlineExceeded.reason)
+        if self._event.is_set():
+            if not self._counted:
+                # Parallel stages all notice the same cancellation; count it where it was first seen.
+                self._counted = True
+                CANCELLATIONS.labels(self.reason, where).inc()
+            if self.reason == DeadlineExceeded.reason:
+                raise DeadlineExceeded(f"Request deadline exceeded before {where}")
+            raise ClientDisconnected(f"Client disconnected before {where}")
+
+
+_CANCEL_TOKEN: ContextVar[Optional[CancelToken]] = ContextVar("faceai_cancel_token", default=None)
+
+
+@contextmanager
+def cancel_scope(timeout_ms: Optional[int] = None) -> Iterator[CancelToken]:
+    token = CancelToken(timeout_ms)
+    reset = _CANCEL_TOKEN.set(token)
+    try:
+        yield token
+    finally:
+        _CANCEL_TOKEN.reset(reset)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _CANCEL_TOKEN.get()
+
+
+def checkpoint(where: str) -> None:
+    token = _CANCEL_TOKEN.get()
+    if token is not None:
+        token.check(where)
@@ -0,0 +1,201 @@
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, List, Optional
+
+import cv2
+
+from app.config import Settings, get_settings
+from app.utils.cancellation import checkpoint, current_token
+from app.utils.memory import record_memory
+from app.utils.metrics import INFLIGHT, QUEUE_DEPTH
+from app.utils.profiler import maybe_profile
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_STAGE_EXECUTOR: Optional[ThreadPoolExecutor] = None
+# Local mirror of QUEUE_DEPTH for this worker; the gauge may be aggregated across processes.
+_WAITING = 0
+_WAITING_LOCK = threading.Lock()
+_SLOT_HANDLE = None
+_PLAN: Optional["ThreadPlan"] = None
+# The plan last applied to torch; torch is imported lazily, possibly after configure_threads has run.
+_TORCH_PLAN: Optional["ThreadPlan"] = None
+
+
+@dataclass
+class ThreadPlan:
+    worker_index: Optional[int]
+    cpus: Optional[List[int]]
+    worker_cores: int
+    max_concurrency: int
+    stage_threads: int
+    torch_threads: int
+    torch_interop_threads: int
+    cv2_threads: int
+    ort_threads: int
+
+    def describe(self) -> str:
+        pinned = f"cpus={self.cpus}" if self.cpus else "cpus=unpinned"
+        return (
+            f"worker={self.worker_index if self.worker_index is not None else '-'} {pinned} "
+            f"cores={self.worker_cores} concurrency={self.max_concurrency} stages={self.stage_threads} "
+            f"torch={self.torch_threads}/{self.torch_interop_threads} cv2={self.cv2_threads} "
+            f"ort={self.ort_threads} mediapipe=affinity"
+        )
+
+
+def plan_threads(settings: Settings, worker_index: Optional[int] = None, cpus: Optional[List[int]] = None) -> ThreadPlan:
+    worker_cores = max(1, settings.cpu_budget // settings.workers)
+    per_job = max(1, worker_cores // settings.max_concurrency)
+
+    assigned = None
+    if cpus and worker_index is not None:
+        start = worker_index * worker_cores
+        assigned = cpus[start : start + worker_cores] or None
+
+    torch_threads = settings.torch_threads or per_job
+    cv2_threads = settings.cv2_threads or per_job
+    ort_threads = settings.ort_threads or per_job
+    # Every stage thread may run a library op with its own per-job pool, so the shared stage pool is sized to keep
+    # stages x library threads within the worker's cores.
+    stage_threads = settings.stage_threads
+    if stage_threads is None:
+        stage_threads = max(1, worker_cores // max(torch_threads, cv2_threads, ort_threads))
+
+    return ThreadPlan(
+        worker_index=worker_index,
+        cpus=assigned,
+        worker_cores=worker_cores,
+        max_concurrency=settings.max_concurrency,
+        stage_threads=stage_threads,
+        torch_threads=torch_threads,
+        torch_interop_threads=settings.torch_interop_threads or 1,
+        cv2_threads=cv2_threads,
+        ort_threads=ort_threads,
+    )
+
+
+def _claim_worker_slot(workers: int) -> Optional[int]:
+    # uvicorn workers are not told their index; the first free lock file is ours for the process lifetime.
+    global _SLOT_HANDLE
+    try:
+        import fcntl
+    except ImportError:
+        return None
+
+    for index in range(workers):
+        handle = open(os.path.join(tempfile.gettempdir(), f"faceai-worker-{index}.lock"), "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _SLOT_HANDLE = handle
+        return index
+    return None
+
+
+def configure_threads(settings: Optional[Settings] = None) -> ThreadPlan:
+    global _PLAN
+    settings = settings or get_settings()
+    worker_index = None
+    cpus = None
+    if settings.pin_cpus and hasattr(os, "sched_setaffinity"):
+        worker_index = _claim_worker_slot(settings.workers)
+        cpus = sorted(os.sched_getaffinity(0))
+
+    plan = plan_threads(settings, worker_index, cpus)
+    if plan.cpus:
+        # Also bounds the MediaPipe/XNNPACK pool, which has no thread setting in the solutions API.
+        os.sched_setaffinity(0, plan.cpus)
+
+    cv2.setNumThreads(plan.cv2_threads)
+    _PLAN = plan
+    if "torch" in sys.modules:
+        configure_torch(sys.modules["torch"])
+
+    return plan
+
+
+def configure_torch(torch: Any) -> None:
+    # torch is imported on first use, so this runs from configure_threads and again from that first import.
+    global _TORCH_PLAN
+    plan = _PLAN
+    if plan is None or plan is _TORCH_PLAN:
+        return
+    _TORCH_PLAN = plan
+    torch.set_num_threads(plan.torch_threads)
+    try:
+        torch.set_num_interop_threads(plan.torch_interop_threads)
+    except RuntimeError:
+        # Only settable before the first parallel op; keep whatever is in place.
+        plan.torch_interop_threads = torch.get_num_interop_threads()
+
+
+def analysis_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=get_settings().max_concurrency, thread_name_prefix="analysis")
+    return _EXECUTOR
+
+
+def stage_executor() -> Optional[ThreadPoolExecutor]:
+    # Separate from the analysis pool: analyses block waiting on their stages, so sharing one pool could deadlock.
+    global _STAGE_EXECUTOR
+    if _STAGE_EXECUTOR is None:
+        threads = plan_threads(get_settings()).stage_threads
+        if threads <= 1:
+            return None
+        _STAGE_EXECUTOR = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="stage")
+    return _STAGE_EXECUTOR
+
+
+def _waiting(delta: int) -> None:
+    global _WAITING
+    with _WAITING_LOCK:
+        _WAITING += delta
+    if delta > 0:
+        QUEUE_DEPTH.inc(delta)
+    else:
+        QUEUE_DEPTH.dec(-delta)
+
+
+def queue_depth() -> int:
+    return _WAITING
+
+
+async def run_analysis(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    call = partial(func, *args, **kwargs)
+
+    def job() -> Any:
+        _waiting(-1)
+        # Drop work whose client left or whose deadline passed while it waited for a slot.
+        checkpoint("queue")
+        INFLIGHT.inc()
+        try:
+            with maybe_profile(getattr(func, "__name__", "analysis")):
+                return call()
+        finally:
+            INFLIGHT.dec()
+            # Throttled; keeps every worker's memory gauges fresh, not just the one that serves /metrics.
+            record_memory()
+
+    _waiting(1)
+    # Run in a copy of the caller's context so per-request timings follow the job onto the worker thread.
+    future = analysis_executor().submit(contextvars.copy_context().run, job)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        if future.cancel():
+            _waiting(-1)
+        else:
+            token = current_token()
+            if token is not None:
+                token.cancel()
+        raise
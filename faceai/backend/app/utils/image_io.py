@@ -4,19 +4,33 @@ from typing import Tuple
 import cv2
 import numpy as np
 
+from app.utils.metrics import annotate, stage
+
 
 def read_image(image_bytes: bytes) -> Tuple[np.ndarray, int, int]:
-    image_array = np.frombuffer(image_bytes, dtype=np.uint8)
-    image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+    with stage("decode"):
+        image_array = np.frombuffer(image_bytes, dtype=np.uint8)
+        image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
     if image is None:
         raise ValueError("Unable to decode image")
     height, width = image.shape[:2]
     return image, width, height
 
 
-def to_base64_png(image_bgr: np.ndarray) -> str:
-    success, buffer = cv2.imencode(".png", image_bgr)
-    if not success:
-        raise ValueError("Unable to encode image")
-    encoded = base64.b64encode(buffer.tobytes()).decode("utf-8")
-    return f"data:image/png;base64,{encoded}"
+def to_base64_png(image_bgr: np.ndarray, artifact: str = "image") -> str:
+    with stage(f"encode_{artifact}"):
+        success, buffer = cv2.imencode(".png", image_bgr)
+        if not success:
+            raise ValueError("Unable to encode image")
+        # b64encode reads the numpy buffer directly, no tobytes() copy.
+        encoded = "data:image/png;base64," + base64.b64encode(buffer).decode("ascii")
+    annotate(f"bytes_{artifact}", len(buffer))
+    return encoded
+
+
+def to_base64_svg(svg: str, artifact: str = "image") -> str:
+    with stage(f"encode_{artifact}"):
+        data = svg.encode("utf-8")
+        encoded = "data:image/svg+xml;base64," + base64.b64encode(data).decode("ascii")
+    annotate(f"bytes_{artifact}", len(data))
+    return encoded
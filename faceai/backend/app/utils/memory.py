@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from app.utils.metrics import WORKER_MEMORY_BYTES
+
+SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+SAMPLE_INTERVAL_S = 10.0
+
+_LAST_SAMPLE = 0.0
+_SAMPLE_LOCK = threading.Lock()
+
+
+def process_memory() -> Optional[Dict[str, int]]:
+    # uss: pages only this process maps; shared: pages also mapped by others (e.g. fork-inherited weights);
+    # pss: each shared page split evenly between the processes that map it.
+    try:
+        with open(SMAPS_ROLLUP, "r", encoding="ascii") as handle:
+            fields = {}
+            for line in handle:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def record_memory(force: bool = False) -> Optional[Dict[str, int]]:
+    global _LAST_SAMPLE
+    now = time.monotonic()
+    with _SAMPLE_LOCK:
+        if not force and now - _LAST_SAMPLE < SAMPLE_INTERVAL_S:
+            return None
+        _LAST_SAMPLE = now
+    memory = process_memory()
+    if memory is not None:
+        for kind, value in memory.items():
+            WORKER_MEMORY_BYTES.labels(kind).set(value)
+    return memory
+
+
+def describe_memory(memory: Optional[Dict[str, int]]) -> str:
+    if memory is None:
+        return "unavailable"
+    return f"pid={os.getpid()} " + " ".join(f"{kind}={value / 2**20:.0f}MiB" for kind, value in memory.items())
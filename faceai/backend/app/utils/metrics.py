@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "faceai_stage_seconds",
+    "Time spent in each analysis stage.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+ANALYZE_REQUESTS = Counter(
+    "faceai_analyze_requests_total",
+    "Analyze requests by outcome (ok, no_face, preflight, side_missing, fallback_tr, fallback_error, invalid, error, "
+    "disconnected, deadline).",
+    ["outcome"],
+)
+CANCELLATIONS = Counter(
+    "faceai_cancellations_total",
+    "Analyses abandoned for a disconnected client or a missed deadline, by where it was noticed (queue or stage).",
+    ["reason", "where"],
+)
+DEGRADED_REQUESTS = Counter(
+    "faceai_degraded_requests_total",
+    "Analyses served at reduced quality by the load-shedding policy, by level.",
+    ["level"],
+)
+PREFLIGHT_FAILURES = Counter(
+    "faceai_preflight_failures_total",
+    "Front images that failed a preflight quality check, by check.",
+    ["check"],
+)
+QUEUE_DEPTH = Gauge("faceai_analysis_queue_depth", "Analyses waiting for a free executor slot.", multiprocess_mode="livesum")
+INFLIGHT = Gauge("faceai_analysis_inflight", "Analyses currently running.", multiprocess_mode="livesum")
+MODEL_LOAD_SECONDS = Gauge("faceai_model_load_seconds", "Time taken to load each model.", ["model"], multiprocess_mode="max")
+PARSING_BACKEND = Counter(
+    "faceai_parsing_backend_total",
+    "Segmentation calls by where they ran: the parsing server (daemon) or in-process after it was unreachable (fallback).",
+    ["backend"],
+)
+TRICHION_TIER = Counter(
+    "faceai_trichion_tier_total",
+    "Automatic Tr estimates by the tier that produced them: the midline strip, hair segmentation or the geometric "
+    "fallback (geometric_error when segmentation failed).",
+    ["tier"],
+)
+PARSING_SERVER_REQUESTS = Counter("faceai_parsing_server_requests_total", "Parsing server requests by status.", ["status"])
+PARSING_SERVER_QUEUE_DEPTH = Gauge("faceai_parsing_server_queue_depth", "Parsing server requests waiting for a batch.")
+PARSING_SERVER_WAIT_SECONDS = Histogram(
+    "faceai_parsing_server_wait_seconds",
+    "Time parsing server requests wait before their batch starts.",
+    buckets=STAGE_BUCKETS,
+)
+PARSING_SERVER_BATCH_SIZE = Histogram(
+    "faceai_parsing_server_batch_size",
+    "Images per parsing server inference batch.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16),
+)
+WORKER_MEMORY_BYTES = Gauge(
+    "faceai_worker_memory_bytes",
+    "Memory of this worker process: rss, pss, uss (private) and shared pages.",
+    ["kind"],
+    multiprocess_mode="all",
+)
+MODEL_RESIDENT_BYTES = Gauge(
+    "faceai_model_resident_bytes",
+    "Weights held in memory by each segmentation model (0 once evicted).",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+MODEL_EVICTIONS = Counter("faceai_model_evictions_total", "Models dropped to stay within the model memory cap.", ["model"])
+MODEL_INFERENCE_SECONDS = Histogram(
+    "faceai_model_inference_seconds",
+    "Warm segmentation inference time per model (the first call after a load is excluded).",
+    ["model"],
+    buckets=STAGE_BUCKETS,
+)
+
+
+class RequestTimings:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.info: Dict[str, Union[str, int]] = {}
+        # Stages of one request may run on several threads at once.
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000.0, 2),
+            "stages_ms": {name: round(value, 2) for name, value in self.stages.items()},
+            "info": dict(self.info),
+        }
+
+    def server_timing(self) -> str:
+        entries = [f"{name};dur={value:.1f}" for name, value in self.stages.items()]
+        entries.extend(f'{name};desc="{value}"' for name, value in self.info.items())
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000.0:.1f}")
+        return ", ".join(entries)
+
+
+_REQUEST_TIMINGS: ContextVar[Optional[RequestTimings]] = ContextVar("faceai_request_timings", default=None)
+
+
+@contextmanager
+def request_timings() -> Iterator[RequestTimings]:
+    timings = RequestTimings()
+    token = _REQUEST_TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        _REQUEST_TIMINGS.reset(token)
+
+
+def annotate(name: str, value: Union[str, int]) -> None:
+    timings = _REQUEST_TIMINGS.get()
+    if timings is not None:
+        timings.info[name] = value
+
+
+def cached_call(name: str, func: Callable, *args: Any) -> Any:
+    # func is an lru_cache wrapper; records whether this call was served from the cache.
+    hits = func.cache_info().hits
+    result = func(*args)
+    annotate(f"cache_{name}", "hit" if func.cache_info().hits > hits else "miss")
+    return result
+
+
+# Bound children are cached so a stage costs one dict lookup and one observe().
+_STAGES: Dict[str, Histogram] = {}
+
+
+def _stage_histogram(name: str) -> Histogram:
+    child = _STAGES.get(name)
+    if child is None:
+        child = STAGE_SECONDS.labels(name)
+        _STAGES[name] = child
+    return child
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _stage_histogram(name).observe(elapsed)
+        timings = _REQUEST_TIMINGS.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def timed(name: str) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_outcome(outcome: str) -> None:
+    ANALYZE_REQUESTS.labels(outcome).inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    # With several uvicorn workers, PROMETHEUS_MULTIPROC_DIR makes every worker's samples visible from any of them.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
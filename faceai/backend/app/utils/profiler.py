@@ -0,0 +1,129 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator, Optional, Set
+
+from app.config import get_settings
+
+_REQUEST_COUNTER = itertools.count(1)
+_WRITE_LOCK = threading.Lock()
+# Threads currently working for the profiled request; stage threads join and leave as they pick up its work.
+_PROFILED_THREADS: ContextVar[Optional[Set[int]]] = ContextVar("faceai_profiled_threads", default=None)
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    # Samples Python stacks from a background thread; thread_ids=None samples every other thread.
+    def __init__(self, interval_s: float, thread_ids: Optional[Set[int]] = None) -> None:
+        self.interval_s = interval_s
+        self.thread_ids = thread_ids
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            if self.thread_ids is not None:
+                for thread_id in list(self.thread_ids):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        self.stacks[_collapse(frame)] += 1
+            else:
+                for thread_id, frame in frames.items():
+                    if thread_id != own:
+                        self.stacks[_collapse(frame)] += 1
+            self.samples += 1
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+
+def write_profile(name: str, stacks: Counter, elapsed_ms: float) -> Optional[Path]:
+    if not stacks:
+        return None
+    settings = get_settings()
+    directory = Path(settings.profile_dir)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = directory / f"{name}-{stamp}-{int(elapsed_ms)}ms-{os.getpid()}-{threading.get_ident()}.collapsed"
+    with _WRITE_LOCK:
+        directory.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as handle:
+            for stack, count in stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+        profiles = sorted(directory.glob("*.collapsed"), key=lambda item: item.stat().st_mtime)
+        for stale in profiles[: max(0, len(profiles) - settings.profile_keep)]:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+@contextmanager
+def maybe_profile(name: str) -> Iterator[None]:
+    settings = get_settings()
+    if not settings.profile_every_n and not settings.profile_slow_ms:
+        yield
+        return
+
+    sampled = bool(settings.profile_every_n) and next(_REQUEST_COUNTER) % settings.profile_every_n == 0
+    if not sampled and not settings.profile_slow_ms:
+        yield
+        return
+
+    threads = {threading.get_ident()}
+    token = _PROFILED_THREADS.set(threads)
+    sampler = StackSampler(settings.profile_interval_ms / 1000.0, thread_ids=threads).start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stacks = sampler.stop()
+        _PROFILED_THREADS.reset(token)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if sampled or elapsed_ms >= settings.profile_slow_ms:
+            write_profile(name, stacks, elapsed_ms)
+
+
+@contextmanager
+def profiled_thread() -> Iterator[None]:
+    threads = _PROFILED_THREADS.get()
+    if threads is None:
+        yield
+        return
+    ident = threading.get_ident()
+    threads.add(ident)
+    try:
+        yield
+    finally:
+        threads.discard(ident)
+
+
+def capture_window(seconds: float) -> Optional[Path]:
+    settings = get_settings()
+    sampler = StackSampler(settings.profile_interval_ms / 1000.0).start()
+    time.sleep(seconds)
+    stacks = sampler.stop()
+    return write_profile("window", stacks, seconds * 1000.0)
@@ -0,0 +1,41 @@
+import re
+from typing import Dict, Iterable, List
+
+import orjson
+from pydantic import BaseModel
+
+# Fields holding data: URIs produced by our own encoders (base64, pure ASCII, nothing to escape).
+DATA_URI_FIELDS = ("annotated_images",)
+# Only values made purely of these characters are copied verbatim; anything else goes through the encoder.
+_VERBATIM_DATA_URI = re.compile(r"data:[A-Za-z0-9+/=;,.:_-]*\Z")
+
+
+def _append_data_uris(parts: List[bytes], values: Dict[str, str]) -> None:
+    parts.append(b"{")
+    for position, (key, value) in enumerate(values.items()):
+        if position:
+            parts.append(b",")
+        parts.append(orjson.dumps(key))
+        if _VERBATIM_DATA_URI.match(value):
+            # Copied once into the body; the pattern check above is its only scan.
+            parts.extend((b':"', value.encode("ascii"), b'"'))
+        else:
+            parts.extend((b":", orjson.dumps(value)))
+    parts.append(b"}")
+
+
+def dumps_model(model: BaseModel, data_uri_fields: Iterable[str] = DATA_URI_FIELDS) -> bytes:
+    fields = type(model).model_fields
+    raw = {name for name in data_uri_fields if name in fields}
+    data = model.model_dump(exclude=raw)
+    parts: List[bytes] = [b"{"]
+    for position, name in enumerate(fields):
+        if position:
+            parts.append(b",")
+        parts.extend((orjson.dumps(name), b":"))
+        if name in raw:
+            _append_data_uris(parts, getattr(model, name))
+        else:
+            parts.append(orjson.dumps(data[name]))
+    parts.append(b"}")
+    return b"".join(parts)
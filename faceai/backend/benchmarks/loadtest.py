@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.samples import SAMPLE_FRONT, SAMPLE_SIDE, sample_bytes
+
+RSS_POLL_INTERVAL_S = 1.0
+
+
+def _parse_mix(value: str) -> List[Tuple[int, float]]:
+    # "512:1,1024:2" -> sizes with relative weights; a bare size has weight 1.
+    mix = []
+    for item in value.split(","):
+        if not item:
+            continue
+        size, _, weight = item.partition(":")
+        mix.append((int(size), float(weight or 1)))
+    return mix
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+
+def _local_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+async def _remote_rss(client: httpx.AsyncClient) -> Optional[int]:
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    for line in response.text.splitlines():
+        if line.startswith("process_resident_memory_bytes"):
+            return int(float(line.split()[-1]))
+    return None
+
+
+@asynccontextmanager
+async def _client(url: Optional[str], timeout: float) -> AsyncIterator[httpx.AsyncClient]:
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+            yield client
+        return
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://in-process", timeout=timeout) as client:
+            yield client
+
+
+class LoadRun:
+    def __init__(self, payloads: Dict[int, Tuple[bytes, bytes]], mix: List[Tuple[int, float]], params: Dict[str, str]) -> None:
+        self.payloads = payloads
+        self.sizes = [size for size, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.params = params
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.rss: List[Tuple[float, int]] = []
+        self.started = 0.0
+
+    async def send(self, client: httpx.AsyncClient, scheduled: float) -> None:
+        size = random.choices(self.sizes, weights=self.weights)[0]
+        front, side = self.payloads[size]
+        files = {
+            "front_image": ("front.jpg", front, "image/jpeg"),
+            "side_image": ("side.jpg", side, "image/jpeg"),
+        }
+        try:
+            response = await client.post("/api/analyze", files=files, data=self.params)
+            status = str(response.status_code)
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        # Latency counts from the scheduled arrival so queueing in the client is not hidden.
+        self.latencies.append((time.perf_counter() - scheduled) * 1000.0)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def poll_rss(self, client: httpx.AsyncClient, in_process: bool) -> None:
+        while True:
+            rss = _local_rss() if in_process else await _remote_rss(client)
+            if rss is not None:
+                self.rss.append((round(time.perf_counter() - self.started, 1), rss))
+            await asyncio.sleep(RSS_POLL_INTERVAL_S)
+
+    async def closed_loop(self, client: httpx.AsyncClient, concurrency: int, deadline: float, total: int) -> None:
+        sent = 0
+
+        async def worker() -> None:
+            nonlocal sent
+            while time.perf_counter() < deadline and (not total or sent < total):
+                sent += 1
+                await self.send(client, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, client: httpx.AsyncClient, concurrency: int, rate: float, deadline: float, total: int) -> None:
+        slots = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def limited(scheduled: float) -> None:
+            async with slots:
+                await self.send(client, scheduled)
+
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline and (not total or len(tasks) < total):
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            tasks.append(asyncio.create_task(limited(next_arrival)))
+            next_arrival += random.expovariate(rate)
+        await asyncio.gather(*tasks)
+
+    def report(self, elapsed: float) -> Dict:
+        count = len(self.latencies)
+        errors = sum(n for status, n in self.statuses.items() if status != "200")
+        return {
+            "requests": count,
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(count / elapsed, 3) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": _percentile(self.latencies, 0.50),
+                "p95": _percentile(self.latencies, 0.95),
+                "p99": _percentile(self.latencies, 0.99),
+                "max": round(max(self.latencies), 2) if self.latencies else None,
+            },
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "rate_503": round(self.statuses.get("503", 0) / count, 4) if count else 0.0,
+            "statuses": self.statuses,
+            "rss_bytes": self.rss,
+        }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    mix = _parse_mix(args.sizes)
+    payloads = {size: (sample_bytes(SAMPLE_FRONT, size), sample_bytes(SAMPLE_SIDE, size)) for size, _ in mix}
+    params = dict(item.split("=", 1) for item in args.param)
+    load = LoadRun(payloads, mix, params)
+
+    async with _client(args.url, args.timeout) as client:
+        load.started = time.perf_counter()
+        deadline = load.started + args.duration
+        poller = asyncio.create_task(load.poll_rss(client, in_process=not args.url))
+        try:
+            if args.rate > 0:
+                await load.open_loop(client, args.concurrency, args.rate, deadline, args.requests)
+            else:
+                await load.closed_loop(client, args.concurrency, deadline, args.requests)
+        finally:
+            poller.cancel()
+        elapsed = time.perf_counter() - load.started
+
+    report = load.report(elapsed)
+    report["config"] = {
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "duration_s": args.duration,
+        "sizes": args.sizes,
+        "params": params,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load generator for /api/analyze")
+    parser.add_argument("--url", help="target base URL, e.g. http://localhost:8000; omit to run the app in-process")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to generate load")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no limit)")
+    parser.add_argument("--sizes", default="1024", help="image size mix, e.g. 512:1,1024:2,2048:1")
+    parser.add_argument("--param", action="append", default=[], help="extra form field key=value (repeatable)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--save", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    latency = report["latency_ms"]
+    print(
+        f"{report['requests']} requests in {report['elapsed_s']} s: {report['throughput_rps']} req/s, "
+        f"p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} ms, "
+        f"errors={report['error_rate']:.2%} 503={report['rate_503']:.2%}",
+        file=sys.stderr,
+    )
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from pathlib import Path
+
+import cv2
+
+SAMPLE_DIR = Path(__file__).resolve().parents[1] / "model_cache" / "face_parsing" / "face-parsing-main" / "assets" / "images"
+SAMPLE_FRONT = "1.jpg"
+SAMPLE_SIDE = "1112.jpg"
+
+
+def sample_bytes(name: str, size: int) -> bytes:
+    image = cv2.imread(str(SAMPLE_DIR / name))
+    if image is None:
+        raise SystemExit(f"Sample image not found: {SAMPLE_DIR / name}")
+    image = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA if size < image.shape[1] else cv2.INTER_CUBIC)
+    success, buffer = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), 92])
+    if not success:
+        raise SystemExit("Unable to encode sample image")
+    return buffer.tobytes()
@@ -0,0 +1,49 @@
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+from app.models.schemas import AnalyzeResponse
+from app.services.facemesh import OVERLAY_MODES, analyze_images
+from app.utils.serialization import dumps_model
+from benchmarks.samples import SAMPLE_FRONT, SAMPLE_SIDE, sample_bytes
+from benchmarks.stages import _time
+
+
+def run(resolutions: List[int], modes: List[str], repeat: int) -> Dict:
+    results: Dict[str, Dict] = {}
+    for size in resolutions:
+        front_bytes = sample_bytes(SAMPLE_FRONT, size)
+        side_bytes = sample_bytes(SAMPLE_SIDE, size)
+        for mode in modes:
+            response = analyze_images(front_bytes, side_bytes, overlay_mode=mode)
+            fields = response.model_dump()
+            body_bytes = len(dumps_model(response))
+            cases = {
+                # What FastAPI did before: validate the nested models, then the default encoder.
+                "validated": lambda: AnalyzeResponse(**fields).model_dump_json().encode("utf-8"),
+                "model_dump_json": lambda: response.model_dump_json().encode("utf-8"),
+                "dumps_model": lambda: dumps_model(response),
+            }
+            for name, func in cases.items():
+                key = f"{name}@{mode}@{size}"
+                results[key] = _time(func, repeat)
+                results[key]["body_bytes"] = body_bytes
+                print(f"{key:34s} {results[key]['median_ms']:10.3f} ms  {body_bytes / 1e6:7.2f} MB", file=sys.stderr)
+    return {"results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time to bytes for AnalyzeResponse serialisation")
+    parser.add_argument("--resolutions", default="512,1024,2048")
+    parser.add_argument("--modes", default=",".join(OVERLAY_MODES))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    resolutions = [int(value) for value in args.resolutions.split(",") if value]
+    modes = [value for value in args.modes.split(",") if value]
+    print(json.dumps(run(resolutions, modes, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
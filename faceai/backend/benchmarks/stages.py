@@ -0,0 +1,156 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.services.facemesh import _extract_landmarks, _points_from_map, _select_best_face, analyze_images
+from app.services.hairline import _predict_mask, estimate_trichion
+from app.services.measurements import compute_measurements
+from app.services.overlay import draw_all_landmarks, draw_landmarks
+from app.utils.image_io import read_image, to_base64_png
+from app.utils.landmarks_map import load_landmark_map
+from benchmarks.samples import SAMPLE_FRONT, SAMPLE_SIDE, sample_bytes
+
+DEFAULT_RESOLUTIONS = (512, 1024, 2048)
+# Differences below this many milliseconds are treated as noise by --compare.
+NOISE_FLOOR_MS = 0.5
+
+
+def _time(func: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(samples[0], 3),
+        "p90_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.9))], 3),
+        "repeat": repeat,
+    }
+
+
+def _stages(size: int) -> Dict[str, Callable[[], object]]:
+    front_bytes = sample_bytes(SAMPLE_FRONT, size)
+    side_bytes = sample_bytes(SAMPLE_SIDE, size)
+    image, width, height = read_image(front_bytes)
+    faces, _ = _extract_landmarks(image)
+    if not faces:
+        raise SystemExit(f"No face detected in the {size}px sample")
+    landmarks = _select_best_face(faces, width, height).landmarks
+    points = _points_from_map(landmarks, load_landmark_map(), width, height)
+
+    try:
+        parsing: Optional[np.ndarray] = _predict_mask(image)
+    except Exception as exc:
+        print(f"predict_mask@{size} skipped: parsing model unavailable ({exc})", file=sys.stderr)
+        parsing = None
+
+    stages: Dict[str, Callable[[], object]] = {
+        "read_image": lambda: read_image(front_bytes),
+        "extract_landmarks": lambda: _extract_landmarks(image),
+        "estimate_trichion": lambda: estimate_trichion(image, dict(points), landmarks=landmarks, parsing=parsing, use_model=False),
+        "compute_measurements": lambda: compute_measurements(points, points),
+        "draw_landmarks": lambda: draw_landmarks(image.copy(), points),
+        "draw_all_landmarks": lambda: draw_all_landmarks(image.copy(), landmarks),
+        "to_base64_png": lambda: to_base64_png(image),
+        "analyze_images": lambda: analyze_images(front_bytes, side_bytes),
+    }
+    if parsing is not None:
+        stages["predict_mask"] = lambda: _predict_mask(image)
+    return stages
+
+
+def run(resolutions: List[int], repeat: int, only: Optional[List[str]]) -> Dict:
+    results: Dict[str, Dict[str, float]] = {}
+    for size in resolutions:
+        for name, func in _stages(size).items():
+            if only and name not in only:
+                continue
+            key = f"{name}@{size}"
+            results[key] = _time(func, repeat)
+            print(f"{key:32s} {results[key]['median_ms']:10.2f} ms", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "opencv": cv2.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: Dict, current: Dict, tolerance: float, selected: Optional[Callable[[str], bool]] = None
+) -> List[str]:
+    # Returns regressed keys plus baseline keys that the current run was asked for but did not produce.
+    regressions: List[str] = []
+    for key, result in current["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            continue
+        before = reference["median_ms"]
+        after = result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        status = "ok"
+        if after > before * (1.0 + tolerance) and after - before > NOISE_FLOOR_MS:
+            status = "REGRESSION"
+            regressions.append(key)
+        print(f"{key:32s} {before:10.2f} -> {after:10.2f} ms ({change:+.1%}) {status}")
+    for key, reference in baseline["results"].items():
+        if key in current["results"] or (selected is not None and not selected(key)):
+            continue
+        print(f"{key:32s} {reference['median_ms']:10.2f} -> {'-':>10s}    MISSING")
+        regressions.append(key)
+    return regressions
+
+
+def _selected(resolutions: List[int], only: Optional[List[str]]) -> Callable[[str], bool]:
+    def selected(key: str) -> bool:
+        name, _, size = key.rpartition("@")
+        return (only is None or name in only) and size.isdigit() and int(size) in resolutions
+
+    return selected
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stage-level benchmarks for the FaceAI pipeline")
+    parser.add_argument("--resolutions", default=",".join(str(r) for r in DEFAULT_RESOLUTIONS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stages", default="", help="comma-separated subset of stage names")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on regression or a missing stage")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown as a fraction (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    resolutions = [int(value) for value in args.resolutions.split(",") if value]
+    only = [value for value in args.stages.split(",") if value] or None
+    current = run(resolutions, args.repeat, only)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(current, indent=2), encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(baseline, current, args.tolerance, _selected(resolutions, only))
+        if regressions:
+            summary = f"{len(regressions)} stage(s) regressed beyond {args.tolerance:.0%} or missing"
+            print(f"{summary}: {', '.join(regressions)}")
+            sys.exit(1)
+    if not args.save and not args.compare:
+        print(json.dumps(current, indent=2))
+
+
+if __name__ == "__main__":
+    main()
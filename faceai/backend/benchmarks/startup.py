@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.stages import compare
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ("torch", "mediapipe", "PIL")
+
+# Each case runs in a fresh interpreter so nothing is already imported.
+CASES: Dict[str, str] = {
+    "import_app": "import app.main",
+    "import_facemesh": "import app.services.facemesh",
+    "import_hairline": "import app.services.hairline",
+    "first_face_mesh": "from app.services.facemesh import _create_face_mesh\n_create_face_mesh().close()",
+    "import_torch": "import torch",
+    "import_mediapipe": "import mediapipe",
+}
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+{code}
+elapsed = (time.perf_counter() - started) * 1000.0
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _run_case(code: str, env: Dict[str, str]) -> Optional[Dict]:
+    script = CHILD.format(code=code, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(repeat: int, only: Optional[List[str]], lite: bool) -> Dict:
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    if lite:
+        env["FACEAI_LITE"] = "1"
+    results: Dict[str, Dict] = {}
+    for name, code in CASES.items():
+        if only and name not in only:
+            continue
+        runs = [_run_case(code, env) for _ in range(repeat)]
+        if any(run is None for run in runs):
+            print(f"{name:20s} failed (module not installed?)", file=sys.stderr)
+            continue
+        samples = sorted(run["ms"] for run in runs)
+        results[name] = {
+            "median_ms": round(statistics.median(samples), 3),
+            "min_ms": round(samples[0], 3),
+            "repeat": repeat,
+            "loaded": runs[0]["loaded"],
+        }
+        loaded = ", ".join(runs[0]["loaded"]) or "-"
+        print(f"{name:20s} {results[name]['median_ms']:10.1f} ms  heavy: {loaded}", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "lite": lite,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import and cold-start cost of the FaceAI backend")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", default="", help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--lite", action="store_true", help="run the cases with FACEAI_LITE=1")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on regression or a missing case")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown as a fraction (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    only = [value for value in args.cases.split(",") if value] or None
+    current = run(args.repeat, only, args.lite)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(current, indent=2), encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(baseline, current, args.tolerance, lambda key: only is None or key in only)
+        if regressions:
+            summary = f"{len(regressions)} case(s) regressed beyond {args.tolerance:.0%} or missing"
+            print(f"{summary}: {', '.join(regressions)}")
+            sys.exit(1)
+    if not args.save and not args.compare:
+        print(json.dumps(current, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# gunicorn -c gunicorn.conf.py app.main:app
+#
+# The app (torch, MediaPipe, the segmentation weights) is loaded once in the master and shared copy-on-write by
+# every worker. The cyclic GC is kept away from those objects so that it never dirties (un-shares) their pages.
+import gc
+import os
+
+from app.config import get_settings
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = get_settings().workers
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Model downloads on a cold cache can take a while.
+timeout = 120
+
+# Collections between here and fork would only touch objects that are about to be frozen.
+gc.disable()
+
+
+def when_ready(server):
+    # The app itself imports these lazily; loading them here keeps them in the pages every worker shares.
+    import mediapipe  # noqa: F401
+
+    if get_settings().preload_models:
+        from app.services.hairline import preload_models
+
+        server.log.info("FaceAI preloaded models: %s", ", ".join(preload_models()) or "none")
+    gc.collect()
+    # Moves everything allocated so far into a generation the collector never scans.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,36 @@
+import argparse
+from typing import Optional, Sequence
+
+import torch
+
+from app.services.hairline import _build_model
+from app.services.model_registry import VARIANTS, get_variant
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    fused = [name for name, variant in VARIANTS.items() if variant.fused]
+    parser = argparse.ArgumentParser(description="Export a fused-input parsing model (uint8 NHWC BGR) to ONNX.")
+    parser.add_argument("--model", default=fused[0], choices=fused)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args(argv)
+
+    variant = get_variant(args.model)
+    model = _build_model(variant)[0].cpu()
+    sample = torch.zeros((1, variant.input_size, variant.input_size, 3), dtype=torch.uint8)
+    torch.onnx.export(
+        model,
+        (sample,),
+        args.output,
+        export_params=True,
+        opset_version=args.opset,
+        do_constant_folding=True,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "batch_size"}, "output": {0: "batch_size"}},
+    )
+    print(f"Wrote {args.output} ({variant.name}, input uint8 [N, {variant.input_size}, {variant.input_size}, 3] BGR)")
+
+
+if __name__ == "__main__":
+    main()
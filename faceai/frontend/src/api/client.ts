@@ -36,6 +36,33 @@ export type AnalyzeResponse = {
     [key: string]: string | undefined;
   };
   warnings: string[];
+  timings?: {
+    total_ms: number;
+    stages_ms: Record<string, number>;
+    info: Record<string, string | number>;
+  } | null;
+};
+
+export type CompactAnalyzeResponse = {
+  ok: boolean;
+  format: "compact";
+  all_landmarks_count: number;
+  gender: string | null;
+  landmarks: {
+    label: string[];
+    index: Array<number | null>;
+    x: Array<number | null>;
+    y: Array<number | null>;
+    nx: Array<number | null>;
+    ny: Array<number | null>;
+    nz: Array<number | null>;
+  };
+  // data is base64 of count x 3 little-endian float32: new Float32Array(bytes.buffer).
+  meshes: Record<"front" | "side", { count: number; width: number; height: number; dtype: string; data: string } | null>;
+  measurements: { columns: string[]; rows: Array<Array<string | number | null>> };
+  ratios: { columns: string[]; rows: Array<Array<string | number | null>> };
+  warnings: string[];
+  timings?: AnalyzeResponse["timings"];
 };
 
 export async function analyzeImages(
@@ -67,3 +94,34 @@ export async function analyzeImages(
 
   return res.json();
 }
+
+export type PreflightResponse = {
+  ok: boolean;
+  passed: boolean;
+  view: "front" | "side";
+  width: number;
+  height: number;
+  checks: Array<{ name: string; passed: boolean; value: number | null }>;
+  yaw: number | null;
+  pitch: number | null;
+  roll: number | null;
+  warnings: string[];
+};
+
+export async function preflightImage(image: File, view: "front" | "side"): Promise<PreflightResponse> {
+  const form = new FormData();
+  form.append("image", image);
+  form.append("view", view);
+
+  const res = await fetch(`${API_URL}/api/preflight`, {
+    method: "POST",
+    body: form,
+  });
+
+  if (!res.ok) {
+    const detail = await res.text();
+    throw new Error(detail || "Preflight failed");
+  }
+
+  return res.json();
+}